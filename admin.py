@@ -0,0 +1,345 @@
+"""Vues de l'administration : articles, médias, frise, ressources, cache et mesures.
+
+Ce module n'est importé qu'à la première requête d'administration : un
+worker qui ne sert que les pages publiques ne le charge jamais. Les règles
+d'URL sont déclarées par app.py (ROUTES_ADMIN) et enregistrées par
+create_app(), pour que url_for() les connaisse dès le démarrage ; chaque
+vue l'est sous le nom de sa fonction.
+"""
+from datetime import datetime
+import os
+import tempfile
+
+from flask import current_app, render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context
+from werkzeug.http import parse_content_range_header
+from werkzeug.utils import secure_filename
+
+from app import (db, Article, Media, Timeline, Ressource, CATEGORIES, ARTICLES_ADMIN_PAR_PAGE,
+                 actualiser_similaires, allowed_file, avancer_generation, cache_pages, carte, creer_media,
+                 demarrage, enregistrer_upload, fichier_reference, login_required, mesures,
+                 precharger_images, regenerer_flux, slug_disponible)
+from contenu import slugify
+import images
+import stockage
+
+
+def admin_login():
+    if request.method == 'POST':
+        if (request.form.get('username') == 'admin' and
+            request.form.get('password') == 'robot2024'):  # Changez ce mot de passe !
+            session['admin'] = True
+            return redirect(url_for('admin_dashboard'))
+        flash('Identifiants incorrects', 'danger')
+    return render_template('admin/login.html')
+
+def admin_logout():
+    session.pop('admin', None)
+    return redirect(url_for('index'))
+
+@login_required
+def admin_dashboard():
+    nb_articles, nb_publies = db.session.execute(db.select(
+        db.func.count(), db.func.count().filter(Article.publie==True))).one()
+    nb_medias = Media.query.count()
+    articles_recents = Article.query.options(*carte(etiquettes=False))\
+        .order_by(Article.date_creation.desc()).limit(5).all()
+    return render_template('admin/dashboard.html',
+        nb_articles=nb_articles, nb_publies=nb_publies,
+        nb_medias=nb_medias, articles_recents=articles_recents,
+        cache=cache_pages.stats())
+
+@login_required
+def admin_cache():
+    return jsonify(cache_pages.stats())
+
+def admin_metrics():
+    # Session admin, ou jeton pour un collecteur Prometheus qui ne peut pas se connecter
+    jeton = current_app.config['MESURES_JETON']
+    autorise = session.get('admin') or (
+        jeton and request.headers.get('Authorization', '') == f'Bearer {jeton}')
+    if not autorise:
+        return redirect(url_for('admin_login'))
+    if not current_app.config['MESURES_ACTIVES']:
+        return 'Mesures désactivées (MESURES_ACTIVES)', 404
+    return Response(mesures.exposer() + demarrage.exposer(), mimetype='text/plain; version=0.0.4')
+
+@login_required
+def admin_vider_cache():
+    cache_pages.stockage.clear()
+    flash('Cache des pages vidé', 'info')
+    return redirect(url_for('admin_dashboard'))
+
+@login_required
+def admin_articles():
+    filtres = {
+        'q': request.args.get('q', '').strip(),
+        'categorie': request.args.get('categorie', ''),
+        'statut': request.args.get('statut', ''),
+    }
+    requete = db.select(Article).options(*carte(etiquettes=False))
+    if filtres['q']:
+        like = f"%{filtres['q']}%"
+        requete = requete.where(Article.titre.like(like) | Article.slug.like(like))
+    if filtres['categorie']:
+        requete = requete.where(Article.categorie == filtres['categorie'])
+    if filtres['statut'] in ('publie', 'brouillon'):
+        requete = requete.where(Article.publie == (filtres['statut'] == 'publie'))
+    articles = db.paginate(requete.order_by(Article.date_creation.desc(), Article.id.desc()),
+                           page=request.args.get('page', 1, type=int),
+                           per_page=ARTICLES_ADMIN_PAR_PAGE, error_out=False)
+    return render_template('admin/articles.html', articles=articles, filtres=filtres, categories=CATEGORIES)
+
+@login_required
+def admin_nouvel_article():
+    if request.method == 'POST':
+        titre = request.form.get('titre', '').strip()
+        if not titre:
+            flash('Le titre est requis', 'danger')
+            return render_template('admin/article_form.html', categories=CATEGORIES)
+        
+        slug = slug_disponible(slugify(titre))
+
+        # Gestion image couverture
+        image_couverture = None
+        if 'image_couverture' in request.files:
+            f = request.files['image_couverture']
+            if f and f.filename and allowed_file(f.filename):
+                image_couverture = enregistrer_upload(f).nom_fichier
+
+        publie = 'publie' in request.form
+        art = Article(
+            titre=titre,
+            slug=slug,
+            contenu=request.form.get('contenu', ''),
+            resume=request.form.get('resume', ''),
+            image_couverture=image_couverture,
+            categorie=request.form.get('categorie', 'journal'),
+            jour=request.form.get('jour') or None,
+            tags=request.form.get('tags', ''),
+            publie=publie,
+            date_publication=datetime.utcnow() if publie else None,
+        )
+        db.session.add(art)
+        art.preparer()
+        db.session.commit()
+        actualiser_similaires(art.id)
+        cache_pages.invalider('articles')
+        if art.publie:
+            regenerer_flux(art.categorie)
+        flash('Article créé avec succès !', 'success')
+        return redirect(url_for('admin_articles'))
+
+    return render_template('admin/article_form.html', article=None, categories=CATEGORIES)
+
+@login_required
+def admin_modifier_article(id):
+    art = Article.query.get_or_404(id)
+    if request.method == 'POST':
+        ancienne_categorie = art.categorie
+        art.titre = request.form.get('titre', '').strip()
+        art.contenu = request.form.get('contenu', '')
+        art.resume = request.form.get('resume', '')
+        art.categorie = request.form.get('categorie', 'journal')
+        art.jour = request.form.get('jour') or None
+        art.tags = request.form.get('tags', '')
+        
+        if 'image_couverture' in request.files:
+            f = request.files['image_couverture']
+            if f and f.filename and allowed_file(f.filename):
+                art.image_couverture = enregistrer_upload(f).nom_fichier
+
+        etait_publie = art.publie
+        art.publie = 'publie' in request.form
+        if art.publie and not etait_publie:
+            art.date_publication = datetime.utcnow()
+        elif etait_publie and not art.publie:
+            avancer_generation('articles')
+
+        art.preparer()
+        db.session.commit()
+        actualiser_similaires(art.id)
+        cache_pages.invalider('articles')
+        if art.publie or etait_publie:
+            regenerer_flux(ancienne_categorie, art.categorie)
+        flash('Article mis à jour !', 'success')
+        return redirect(url_for('admin_articles'))
+    
+    return render_template('admin/article_form.html', article=art, categories=CATEGORIES)
+
+@login_required
+def admin_supprimer_article(id):
+    art = Article.query.get_or_404(id)
+    etait_publie, categorie = art.publie, art.categorie
+    db.session.delete(art)
+    if etait_publie:
+        avancer_generation('articles')
+    db.session.commit()
+    actualiser_similaires(id)
+    cache_pages.invalider('articles')
+    if etait_publie:
+        regenerer_flux(categorie)
+    flash('Article supprimé', 'info')
+    return redirect(url_for('admin_articles'))
+
+@login_required
+def admin_importer_articles():
+    from archives import ErreurImport, importer
+    f = request.files.get('archive')
+    if not f or not f.filename.lower().endswith(('.zip', '.tar.gz', '.tgz', '.tar')):
+        flash('Archive .zip ou .tar.gz attendue', 'danger')
+        return redirect(url_for('admin_articles'))
+    with tempfile.TemporaryDirectory(prefix='robotblog-import-') as dossier:
+        chemin = os.path.join(dossier, secure_filename(f.filename) or 'archive')
+        with open(chemin, 'wb') as sortie:
+            stockage.copier_par_blocs(f.stream, sortie)
+        try:
+            bilan = importer(chemin, ignorer_existants='ignorer_existants' in request.form,
+                             afficher=current_app.logger.info)
+        except ErreurImport as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('admin_articles'))
+    cache_pages.invalider('articles')
+    if bilan['categories']:
+        regenerer_flux(*bilan['categories'])
+    flash(f"{bilan['importes']} article(s) importé(s), {bilan['ignores']} ignoré(s), "
+          f"{bilan['medias']} fichier(s)", 'success')
+    for fichier, erreur in bilan['erreurs'][:10]:
+        flash(f'{fichier} : {erreur}', 'danger')
+    return redirect(url_for('admin_articles'))
+
+@login_required
+def admin_exporter_articles():
+    from archives import flux_zip
+    nom = f"articles-{datetime.utcnow():%Y%m%d}.zip"
+    return Response(stream_with_context(flux_zip()), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename="{nom}"'})
+
+@login_required
+def admin_medias():
+    if request.method == 'POST':
+        if 'fichier' not in request.files:
+            flash('Aucun fichier sélectionné', 'danger')
+        else:
+            f = request.files['fichier']
+            if f and allowed_file(f.filename):
+                media = enregistrer_upload(f)
+                flash(f'Fichier "{media.nom_original}" uploadé !', 'success')
+    
+    medias = Media.query.order_by(Media.date_upload.desc()).all()
+    precharger_images(m.nom_fichier for m in medias)
+    return render_template('admin/medias.html', medias=medias)
+
+def televersements():
+    """Gestionnaire des uploads en plusieurs morceaux de l'application courante."""
+    config = current_app.config
+    return stockage.Televersements(
+        config['UPLOAD_FOLDER'], config['UPLOAD_TAILLE_MAX'], config['UPLOAD_PARTIELS_DUREE'])
+
+def _erreur_televersement(e):
+    if e.recu is None:
+        return jsonify(erreur=str(e)), 404 if 'inconnu' in str(e) else 400
+    return jsonify(erreur=str(e), recu=e.recu), 409
+
+@login_required
+def admin_creer_televersement():
+    donnees = request.get_json(silent=True) or {}
+    nom = str(donnees.get('nom', ''))
+    if not allowed_file(nom) or not secure_filename(nom):
+        return jsonify(erreur='Format non autorisé'), 400
+    try:
+        id = televersements().creer(nom, int(donnees.get('taille', 0)))
+    except (stockage.ErreurTeleversement, ValueError) as e:
+        return jsonify(erreur=str(e)), 400
+    return jsonify(id=id, recu=0), 201
+
+@login_required
+def admin_televersement(id):
+    """Reprise (GET), envoi d'un morceau avec Content-Range (PUT) ou abandon (DELETE)."""
+    try:
+        if request.method == 'DELETE':
+            televersements().abandonner(id)
+            return '', 204
+        if request.method == 'GET':
+            infos = televersements().etat(id)
+            return jsonify(recu=infos['recu'], taille=infos['taille'])
+        plage = parse_content_range_header(request.headers.get('Content-Range'))
+        if plage is None or plage.start is None:
+            return jsonify(erreur='En-tête Content-Range requis'), 400
+        infos = televersements().ajouter(id, plage.start, request.stream)
+        if infos['recu'] < infos['taille']:
+            return jsonify(recu=infos['recu'], taille=infos['taille'])
+        ext = infos['nom'].rsplit('.', 1)[1].lower()
+        nom_fichier, empreinte, taille, nom_original = televersements().terminer(id, ext)
+    except stockage.ErreurTeleversement as e:
+        return _erreur_televersement(e)
+    media = creer_media(nom_fichier, nom_original, empreinte, taille)
+    return jsonify(recu=taille, taille=taille, media={
+        'id': media.id, 'nom_fichier': media.nom_fichier,
+        'url': url_for('static', filename='uploads/' + media.nom_fichier)})
+
+@login_required
+def admin_supprimer_media(id):
+    media = Media.query.get_or_404(id)
+    # Le fichier (et ses variantes) n'est supprimé qu'avec sa dernière référence
+    if not fichier_reference(media.nom_fichier, sauf_media=media):
+        path = os.path.join(current_app.config['UPLOAD_FOLDER'], media.nom_fichier)
+        if os.path.exists(path):
+            os.remove(path)
+        images.supprimer_variantes(current_app.config['UPLOAD_FOLDER'], media.variantes)
+    db.session.delete(media)
+    avancer_generation('medias')
+    db.session.commit()
+    cache_pages.invalider('articles')
+    flash('Fichier supprimé', 'info')
+    return redirect(url_for('admin_medias'))
+
+@login_required
+def admin_timeline():
+    if request.method == 'POST':
+        etape = Timeline(
+            titre=request.form.get('titre', ''),
+            description=request.form.get('description', ''),
+            date_event=datetime.strptime(request.form.get('date_event'), '%Y-%m-%d') if request.form.get('date_event') else None,
+            statut=request.form.get('statut', 'planifie'),
+            icone=request.form.get('icone', '🔧'),
+        )
+        db.session.add(etape)
+        db.session.commit()
+        cache_pages.invalider('timeline')
+        flash('Étape ajoutée !', 'success')
+    etapes = Timeline.query.order_by(Timeline.date_event.asc()).all()
+    return render_template('admin/timeline.html', etapes=etapes)
+
+@login_required
+def admin_supprimer_etape(id):
+    etape = Timeline.query.get_or_404(id)
+    db.session.delete(etape)
+    db.session.commit()
+    cache_pages.invalider('timeline')
+    flash('Étape supprimée', 'info')
+    return redirect(url_for('admin_timeline'))
+
+@login_required
+def admin_ressources():
+    if request.method == 'POST':
+        r = Ressource(
+            titre=request.form.get('titre', ''),
+            url=request.form.get('url', ''),
+            description=request.form.get('description', ''),
+            categorie=request.form.get('categorie', 'outils'),
+            ordre=request.form.get('ordre', 0),
+        )
+        db.session.add(r)
+        db.session.commit()
+        cache_pages.invalider('ressources')
+        flash('Ressource ajoutée !', 'success')
+    ressources = Ressource.query.order_by(Ressource.categorie, Ressource.ordre).all()
+    return render_template('admin/ressources.html', ressources=ressources)
+
+@login_required
+def admin_supprimer_ressource(id):
+    r = Ressource.query.get_or_404(id)
+    db.session.delete(r)
+    db.session.commit()
+    cache_pages.invalider('ressources')
+    return redirect(url_for('admin_ressources'))
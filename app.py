@@ -1,23 +1,94 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, current_app, render_template, request, redirect, url_for, session, make_response, Response, send_file, g
+from flask.cli import AppGroup
 from flask_sqlalchemy import SQLAlchemy
+from itsdangerous import BadSignature, URLSafeSerializer
+import click
+from markupsafe import Markup, escape
+from collections import Counter
 from datetime import datetime
+from html import unescape
+import atexit
+import hashlib
 import os
 import re
-from werkzeug.utils import secure_filename
+import sys
+import threading
+import time
+from werkzeug.http import is_resource_modified
+from werkzeug.utils import import_string
 from functools import wraps
+from cache_pages import CachePages, CacheMemoire, CacheFichiers
+from mesures import Mesures
+from statiques import Statiques
+from demarrage import Demarrage
+import base_donnees
+from contenu import normaliser_tags, preparer as preparer_contenu, replier_accents, slug_libre, slugify
+import flux
+import images
+import similaires
+import stockage
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'votre-cle-secrete-changez-moi'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///robotblog.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'static', 'uploads')
-app.config['MAX_CONTENT_LENGTH'] = 32 * 1024 * 1024  # 32MB max
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'mp4', 'pdf'}
 
-db = SQLAlchemy(app)
+# Extensions créées sans application : create_app() les branche sur la sienne
+demarrage = Demarrage()
+db = SQLAlchemy(session_options={'class_': base_donnees.SessionLecture})
+cache_pages = CachePages()  # stockage choisi par create_app(), selon CACHE_PAGES_DOSSIER
+mesures = Mesures()
+statiques = Statiques()
+cli = AppGroup('robotblog')  # commandes ajoutées à celles de flask par create_app()
 
 # ─── MODELES ──────────────────────────────────────────────
+article_tag = db.Table('article_tag',
+    db.Column('article_id', db.Integer, db.ForeignKey('article.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_article_tag_tag', 'tag_id', 'article_id'))
+
+
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    nom = db.Column(db.String(100), nullable=False)
+    slug = db.Column(db.String(120), unique=True, nullable=False)
+
+    @classmethod
+    def obtenir(cls, noms):
+        """Tags correspondant aux noms donnés, créés s'ils n'existent pas encore."""
+        voulus = {slugify(nom): nom for nom in noms}
+        requete = db.select(cls).where(cls.slug.in_(voulus))
+        with db.session.no_autoflush:
+            connus = {t.slug: t for t in db.session.scalars(requete)}
+            if len(connus) < len(voulus):
+                cls.inserer(db.session.connection(), {s: n for s, n in voulus.items() if s not in connus})
+                connus = {t.slug: t for t in db.session.scalars(requete)}
+        return [connus[slug] for slug in voulus]
+
+    @classmethod
+    def identifiants(cls, conn, noms):
+        """{slug: id} des tags nommés, créés au besoin ; pour les écritures sans ORM."""
+        voulus = {slugify(nom): nom for nom in noms}
+        requete = db.select(cls.slug, cls.id).where(cls.slug.in_(voulus))
+        ids = dict(conn.execute(requete).all())
+        if len(ids) < len(voulus):
+            cls.inserer(conn, {s: n for s, n in voulus.items() if s not in ids})
+            ids = dict(conn.execute(requete).all())
+        return ids
+
+    @classmethod
+    def inserer(cls, conn, voulus):
+        # Un tag créé entre-temps par une requête concurrente est ignoré ici, puis relu
+        base_donnees.inserer_sans_doublons(
+            conn, cls.__table__, [{'nom': nom, 'slug': slug} for slug, nom in voulus.items()], ['slug'])
+
+
 class Article(db.Model):
+    # Index taillés pour les requêtes des pages publiques (voir flask audit-requetes)
+    __table_args__ = (
+        db.Index('ix_article_publie_date', 'publie', 'date_publication'),
+        db.Index('ix_article_publie_categorie_date', 'publie', 'categorie', 'date_publication'),
+        db.Index('ix_article_publie_jour', 'publie', 'jour', 'date_publication'),
+        db.Index('ix_article_date_creation', 'date_creation'),
+        db.Index('ix_article_publie_modification', 'publie', 'date_modification'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     titre = db.Column(db.String(200), nullable=False)
     slug = db.Column(db.String(220), unique=True, nullable=False)
@@ -29,25 +100,79 @@ class Article(db.Model):
     publie = db.Column(db.Boolean, default=False)
     date_creation = db.Column(db.DateTime, default=datetime.utcnow)
     date_publication = db.Column(db.DateTime)
-    tags = db.Column(db.String(300))  # tags séparés par virgule
+    date_modification = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    tags = db.Column(db.String(300))  # tags séparés par virgule, tels que saisis
     vues = db.Column(db.Integer, default=0)
+    # Champs dérivés du contenu, calculés par preparer() à l'enregistrement
+    contenu_html = db.Column(db.Text)  # HTML nettoyé, affiché tel quel
+    chapo = db.Column(db.String(500))  # resume, ou début du texte s'il est vide
+    extrait = db.Column(db.String(200))  # chapo raccourci pour les cartes
+    nb_mots = db.Column(db.Integer)
+    temps_lecture = db.Column(db.Integer)  # minutes
+    table_matieres = db.Column(db.JSON)  # [{'id', 'titre'}] des <h2>
+    termes = db.deferred(db.Column(db.JSON))  # {terme: poids} pour les articles similaires
+    etiquettes = db.relationship(Tag, secondary=article_tag, lazy='selectin')
+
+    CHAMPS_DERIVES = ('contenu_html', 'chapo', 'extrait', 'nb_mots', 'temps_lecture', 'table_matieres')
+
+    def preparer(self):
+        """Calcule les champs dérivés ; à appeler après chaque modification du contenu, du résumé ou des tags."""
+        derives = preparer_contenu(self.contenu, self.resume)
+        for champ in self.CHAMPS_DERIVES:
+            setattr(self, champ, derives[champ])
+        noms = normaliser_tags(self.tags)
+        self.tags = ', '.join(noms)
+        self.etiquettes = Tag.obtenir(noms)
+        self.termes = similaires.termes(self.titre, self.tags, derives['texte'])
 
-    def get_tags_list(self):
-        if self.tags:
-            return [t.strip() for t in self.tags.split(',')]
-        return []
+
+class ArticleSimilaire(db.Model):
+    # Clé (article_id, rang) : les voisins d'un article se lisent dans l'ordre de l'index
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id', ondelete='CASCADE'), primary_key=True)
+    rang = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    voisin_id = db.Column(db.Integer, db.ForeignKey('article.id', ondelete='CASCADE'), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+
+
+# Index TF-IDF gardé en base : un enregistrement ne recalcule que le vecteur de
+# l'article modifié. Pas de clé étrangère, l'article supprimé doit encore y
+# être retrouvé pour être retiré des fréquences.
+class TermeSimilarite(db.Model):
+    # Nombre d'articles publiés contenant le terme
+    terme = db.Column(db.Text, primary_key=True)
+    documents = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DocumentSimilarite(db.Model):
+    # Termes comptés dans TermeSimilarite pour l'article
+    article_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    termes = db.Column(db.JSON, nullable=False)
+
+
+class VecteurSimilarite(db.Model):
+    # Vecteur normalisé de chaque article, lu terme par terme comme un index inversé
+    __table_args__ = (db.Index('ix_vecteur_similarite_terme', 'terme', 'article_id', 'poids'),)
+    article_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    terme = db.Column(db.Text, primary_key=True)
+    poids = db.Column(db.Float, nullable=False)
 
 
 class Media(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    nom_fichier = db.Column(db.String(300), nullable=False)
+    nom_fichier = db.Column(db.String(300), nullable=False, index=True)
     nom_original = db.Column(db.String(300))
     type_media = db.Column(db.String(50))  # image, video, pdf
     taille = db.Column(db.Integer)
-    date_upload = db.Column(db.DateTime, default=datetime.utcnow)
+    date_upload = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    largeur = db.Column(db.Integer)
+    hauteur = db.Column(db.Integer)
+    variantes = db.Column(db.JSON(none_as_null=True))  # [{'fichier', 'largeur', 'format'}], None tant qu'elles ne sont pas prêtes
+    placeholder = db.Column(db.Text)  # data URI floutée
+    empreinte = db.Column(db.String(64), index=True)  # SHA-256 du contenu, partagé par les doublons
 
 
 class Ressource(db.Model):
+    __table_args__ = (db.Index('ix_ressource_categorie_ordre', 'categorie', 'ordre'),)
     id = db.Column(db.Integer, primary_key=True)
     titre = db.Column(db.String(200), nullable=False)
     url = db.Column(db.String(500))
@@ -60,27 +185,73 @@ class Timeline(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     titre = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    date_event = db.Column(db.DateTime)
+    date_event = db.Column(db.DateTime, index=True)
     statut = db.Column(db.String(50), default='en-cours')  # complete, en-cours, planifie
     icone = db.Column(db.String(50), default='🔧')
 
 
-# ─── HELPERS ──────────────────────────────────────────────
-def slugify(text):
-    text = text.lower()
-    text = re.sub(r'[àáâãäå]', 'a', text)
-    text = re.sub(r'[èéêë]', 'e', text)
-    text = re.sub(r'[ìíîï]', 'i', text)
-    text = re.sub(r'[òóôõö]', 'o', text)
-    text = re.sub(r'[ùúûü]', 'u', text)
-    text = re.sub(r'[ç]', 'c', text)
-    text = re.sub(r'[^a-z0-9\s-]', '', text)
-    text = re.sub(r'[\s-]+', '-', text).strip('-')
-    return text
+class Generation(db.Model):
+    # Compteur des données sans date de modification propre ('medias' : variantes
+    # prêtes, fichiers supprimés ; 'articles' : articles retirés du site, qui ne
+    # laissent aucune date), commun à tous les workers
+    etiquette = db.Column(db.String(50), primary_key=True)
+    valeur = db.Column(db.Integer, nullable=False, default=0)
+    date = db.Column(db.DateTime)
+
+
+demarrage.marquer('modeles')
 
+# ─── HELPERS ──────────────────────────────────────────────
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def enregistrer_upload(f):
+    """Enregistre un fichier uploadé (FileStorage) par blocs et crée sa ligne Media."""
+    ext = f.filename.rsplit('.', 1)[1].lower()
+    nom_fichier, empreinte, taille = stockage.stocker_flux(current_app.config['UPLOAD_FOLDER'], f.stream, ext)
+    return creer_media(nom_fichier, f.filename, empreinte, taille)
+
+def creer_media(nom_fichier, nom_original, empreinte, taille):
+    """Crée la ligne Media d'un fichier rangé par stockage ; les doublons partagent fichier et variantes."""
+    ext = nom_fichier.rsplit('.', 1)[1].lower()
+    type_media = 'image' if ext in {'png','jpg','jpeg','gif','webp'} else \
+                 'video' if ext == 'mp4' else 'pdf'
+    media = Media(
+        nom_fichier=nom_fichier,
+        nom_original=nom_original,
+        type_media=type_media,
+        taille=taille,
+        empreinte=empreinte,
+    )
+    existant = Media.query.filter_by(empreinte=empreinte).order_by(Media.variantes.is_(None)).first()
+    if existant and os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], existant.nom_fichier)):
+        # Contenu déjà connu, parfois sous un ancien nom horodaté : on réutilise ce fichier
+        if existant.nom_fichier != nom_fichier and not fichier_reference(nom_fichier):
+            os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], nom_fichier))
+        media.nom_fichier = existant.nom_fichier
+        media.largeur, media.hauteur = existant.largeur, existant.hauteur
+        media.variantes, media.placeholder = existant.variantes, existant.placeholder
+    db.session.add(media)
+    db.session.commit()
+    if media.variantes is None and images.traitable(media.nom_fichier):
+        images.en_arriere_plan(traiter_variantes, current_app._get_current_object(), media.id,
+                               workers=current_app.config['IMAGES_WORKERS'])
+    return media
+
+def fichier_reference(nom_fichier, sauf_media=None):
+    """Nombre de références à un fichier de uploads/ : lignes Media et couvertures d'articles."""
+    medias = Media.query.filter(Media.nom_fichier == nom_fichier)
+    if sauf_media is not None:
+        medias = medias.filter(Media.id != sauf_media.id)
+    return medias.count() + Article.query.filter_by(image_couverture=nom_fichier).count()
+
+def slug_disponible(base):
+    """base, ou base-N s'il est pris : une seule requête, quel que soit le nombre de collisions."""
+    # Bornes plutôt que LIKE 'base-%' : l'index unique sur slug sert ('.' suit '-')
+    pris = db.session.scalars(db.select(Article.slug).where(
+        (Article.slug == base) | ((Article.slug > base + '-') & (Article.slug < base + '.'))))
+    return slug_libre(base, set(pris))
+
 def login_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -99,58 +270,906 @@ CATEGORIES = {
     'reflexion': 'Réflexions',
     'ressources': 'Ressources',
 }
+ARTICLES_PAR_PAGE = 9
+ARTICLES_ADMIN_PAR_PAGE = 25
+
+# Colonnes affichées par les listes d'articles : ni contenu, ni HTML, ni termes.
+# raiseload : un template qui lirait une autre colonne échoue au lieu de
+# recharger chaque article par une requête séparée.
+COLONNES_CARTE = (
+    Article.id, Article.titre, Article.slug, Article.chapo, Article.extrait,
+    Article.image_couverture, Article.categorie, Article.jour, Article.publie,
+    Article.date_creation, Article.date_publication, Article.vues, Article.temps_lecture,
+)
+
+def carte(etiquettes=True):
+    """Options de chargement des cartes d'articles (listes publiques et admin)."""
+    options = [db.load_only(*COLONNES_CARTE, raiseload=True)]
+    if not etiquettes:
+        options.append(db.lazyload(Article.etiquettes))
+    return options
+
+# ─── RECHERCHE PLEIN TEXTE ────────────────────────────────
+# Table FTS5 (SQLite) contenant titre, texte brut et tags de chaque article,
+# tenue à jour par les événements du modèle. Le tokenizer unicode61 replie les
+# accents comme replier_accents()/slugify() ; les requêtes sont repliées pareil.
+article_fts = db.table('article_fts',
+    db.column('rowid'), db.column('titre'), db.column('texte'), db.column('tags'))
+FTS_POIDS = (10.0, 1.0, 5.0)  # bm25 : titre, texte, tags
+_fts_actif = set()  # URL des bases où la table existe
+
+def html_en_texte(html):
+    texte = re.sub(r'<(script|style)\b.*?</\1>', ' ', html or '', flags=re.S | re.I)
+    texte = re.sub(r'<[^>]+>', ' ', texte)
+    return re.sub(r'\s+', ' ', unescape(texte)).strip()
+
+def index_recherche_actif(connection):
+    if connection.dialect.name != 'sqlite':
+        return False
+    cle = str(connection.engine.url)
+    # Seule la présence est retenue : la table peut être créée par `flask migrer`
+    # pendant que ce worker tourne, ses écritures doivent alors la tenir à jour
+    if cle not in _fts_actif:
+        if not _table_fts(connection):
+            return False
+        _fts_actif.add(cle)
+    return True
+
+def _table_fts(connection):
+    return connection.execute(db.text("SELECT 1 FROM sqlite_master WHERE name = 'article_fts'")).first() is not None
+
+def _indexer(connection, id, titre, contenu, tags):
+    connection.execute(article_fts.delete().where(article_fts.c.rowid == id))
+    connection.execute(article_fts.insert().values(
+        rowid=id, titre=titre, texte=html_en_texte(contenu), tags=tags or ''))
+
+def creer_index_recherche(conn):
+    """Crée l'index FTS5 s'il n'existe pas encore et y indexe les articles existants."""
+    if conn.dialect.name != 'sqlite':
+        return False
+    if not _table_fts(conn):
+        conn.execute(db.text(
+            "CREATE VIRTUAL TABLE article_fts USING fts5("
+            "titre, texte, tags, tokenize = 'unicode61 remove_diacritics 2')"))
+        reindexer_articles(conn)
+    return True
+
+def reindexer_articles(conn):
+    conn.execute(article_fts.delete())
+    lignes = conn.execute(db.select(
+        Article.id, Article.titre, Article.contenu, Article.tags)).all()
+    for ligne in lignes:
+        _indexer(conn, *ligne)
+    return len(lignes)
+
+@db.event.listens_for(Article, 'after_insert')
+@db.event.listens_for(Article, 'after_update')
+def _indexer_article(mapper, connection, target):
+    etat = db.inspect(target)
+    modifie = any(etat.attrs[c].history.has_changes() for c in ('titre', 'contenu', 'tags'))
+    if (modifie or etat.attrs.id.history.has_changes()) and index_recherche_actif(connection):
+        _indexer(connection, target.id, target.titre, target.contenu, target.tags)
+
+@db.event.listens_for(Article, 'after_delete')
+def _desindexer_article(mapper, connection, target):
+    if index_recherche_actif(connection):
+        connection.execute(article_fts.delete().where(article_fts.c.rowid == target.id))
+
+def requete_fts(q):
+    # Chaque mot devient un préfixe entre guillemets : pas d'injection de syntaxe FTS5
+    return ' '.join(f'"{mot}"*' for mot in re.findall(r'\w+', replier_accents(q)))
+
+def _surligner(extrait):
+    return Markup(str(escape(extrait)).replace('\x02', '<mark>').replace('\x03', '</mark>'))
+
+def rechercher_articles(q, page=1, per_page=10):
+    """Retourne (pagination, extraits par id d'article) classés par pertinence BM25."""
+    requete = requete_fts(q)
+    stmt = db.select(Article).options(*carte()).where(Article.publie==True)
+    if not index_recherche_actif(db.session.connection()):
+        like = f'%{q}%'
+        stmt = stmt.where(
+            (Article.titre.ilike(like)) | (Article.contenu.ilike(like)) | (Article.tags.ilike(like))
+        ).order_by(Article.date_publication.desc())
+        return db.paginate(stmt, page=page, per_page=per_page, error_out=False), {}
+    if not requete:
+        return db.paginate(stmt.where(db.false()), page=page, per_page=per_page, error_out=False), {}
+    fts = db.literal_column('article_fts')
+    correspond = fts.op('MATCH')(requete)
+    stmt = stmt.join(article_fts, article_fts.c.rowid == Article.id)\
+        .where(correspond).order_by(db.func.bm25(fts, *FTS_POIDS))
+    articles = db.paginate(stmt, page=page, per_page=per_page, error_out=False)
+    extraits = {}
+    ids = [a.id for a in articles.items]
+    if ids:
+        lignes = db.session.execute(db.select(
+            article_fts.c.rowid, db.func.snippet(fts, -1, '\x02', '\x03', '…', 24)
+        ).where(correspond, article_fts.c.rowid.in_(ids)))
+        extraits = {id: _surligner(extrait) for id, extrait in lignes}
+    return articles, extraits
+
+@cli.command('reindexer')
+def reindexer_command():
+    """Reconstruit l'index de recherche plein texte."""
+    with db.engine.begin() as conn:
+        if not creer_index_recherche(conn):
+            print('Index FTS5 indisponible (base non SQLite) : recherche LIKE utilisée.')
+            return
+        print(f'{reindexer_articles(conn)} article(s) indexé(s).')
+
+# ─── COMPTEUR DE VUES ─────────────────────────────────────
+class CompteurVues:
+    """Vues d'articles accumulées en mémoire puis écrites par lots.
+
+    Chaque worker garde son propre tampon et l'écriture ajoute les incréments
+    (vues = vues + n) : plusieurs processus peuvent vider leur tampon sans
+    s'écraser. Le tampon est vidé toutes les VUES_FLUSH_INTERVALLE secondes
+    par un thread de fond, et à l'arrêt du processus.
+    """
+    def __init__(self, app=None):
+        self.app = app
+        self._reinitialiser()
+        os.register_at_fork(after_in_child=self._reinitialiser)
+        atexit.register(self.vider)
+
+    def init_app(self, app):
+        # Le thread de fond et l'écriture à l'arrêt ont besoin de l'application hors requête
+        self.app = app
+
+    def _reinitialiser(self):
+        # Un worker forké n'hérite ni du thread ni des vues du processus parent
+        self._verrou = threading.Lock()
+        self._tampon = Counter()
+        self._thread = None
+
+    def incrementer(self, article_id):
+        if not self.app.config['VUES_FLUSH_INTERVALLE']:
+            db.session.execute(self._requete({article_id: 1}))
+            db.session.commit()
+            return
+        with self._verrou:
+            self._tampon[article_id] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._boucle, name='compteur-vues', daemon=True)
+                self._thread.start()
+
+    def en_attente(self, article_id):
+        with self._verrou:
+            return self._tampon.get(article_id, 0)
+
+    def vider(self):
+        """Écrit les vues en attente en un seul UPDATE ; retourne le nombre de vues écrites."""
+        with self._verrou:
+            tampon, self._tampon = self._tampon, Counter()
+        if not tampon:
+            return 0
+        try:
+            with self.app.app_context(), db.engine.begin() as conn:
+                conn.execute(self._requete(tampon))
+        except Exception:
+            with self._verrou:
+                self._tampon.update(tampon)
+            raise
+        return sum(tampon.values())
+
+    def _requete(self, tampon):
+        # date_modification est reprise telle quelle : une vue ne modifie pas le contenu
+        return db.update(Article).where(Article.id.in_(list(tampon))).values(
+            vues=db.func.coalesce(Article.vues, 0) + db.case(tampon, value=Article.id, else_=0),
+            date_modification=Article.date_modification)
+
+    def _boucle(self):
+        while True:
+            time.sleep(self.app.config['VUES_FLUSH_INTERVALLE'] or 1)
+            try:
+                self.vider()
+            except Exception:
+                self.app.logger.exception('Écriture des vues en attente impossible')
+
+compteur_vues = CompteurVues()
+
+# ─── ARTICLES SIMILAIRES ──────────────────────────────────
+# Les k plus proches voisins (TF-IDF, voir similaires.py) de chaque article
+# publié sont rangés dans article_similaire. Fréquences des termes et vecteurs
+# sont gardés en base : enregistrer un article met à jour les fréquences de
+# ses termes, recalcule son seul vecteur, puis sa liste et celles où il entre
+# ou dont il sort, en lisant les vecteurs voisins par l'index sur le terme.
+# Les autres vecteurs gardent les poids IDF de leur dernier calcul jusqu'au
+# prochain `flask calculer-similaires`.
+def _index_similarite(conn):
+    lignes = conn.execute(db.select(Article.id, Article.termes).where(Article.publie==True))
+    return similaires.Index({id: termes or {} for id, termes in lignes})
+
+def _ecrire_voisins(conn, id, voisins):
+    conn.execute(db.delete(ArticleSimilaire).where(ArticleSimilaire.article_id == id))
+    if voisins:
+        conn.execute(db.insert(ArticleSimilaire), [
+            {'article_id': id, 'rang': rang, 'voisin_id': voisin, 'score': score}
+            for rang, (score, voisin) in enumerate(voisins)])
+
+def _ecrire_vecteur(conn, id, vecteur):
+    if vecteur:
+        conn.execute(db.insert(VecteurSimilarite), [
+            {'article_id': id, 'terme': terme, 'poids': poids} for terme, poids in vecteur.items()])
+
+def recalculer_similaires(conn):
+    """Recalcule fréquences, vecteurs et toutes les listes ; retourne le nombre d'articles traités."""
+    index = _index_similarite(conn)
+    for modele in (TermeSimilarite, DocumentSimilarite, VecteurSimilarite, ArticleSimilaire):
+        conn.execute(db.delete(modele))
+    if index.frequences:
+        conn.execute(db.insert(TermeSimilarite), [
+            {'terme': terme, 'documents': df} for terme, df in index.frequences.items()])
+        lignes = conn.execute(db.select(Article.id, Article.termes).where(Article.publie==True))
+        conn.execute(db.insert(DocumentSimilarite), [
+            {'article_id': id, 'termes': sorted(termes or {})} for id, termes in lignes])
+    for id in index:
+        _ecrire_vecteur(conn, id, index.vecteurs[id])
+        _ecrire_voisins(conn, id, index.voisins(id, current_app.config['SIMILAIRES_NOMBRE']))
+    return len(index)
+
+def _compter_termes(conn, termes, pas):
+    """Ajoute pas aux fréquences des termes donnés."""
+    if not termes:
+        return
+    if pas > 0:
+        base_donnees.inserer_sans_doublons(
+            conn, TermeSimilarite.__table__, [{'terme': t, 'documents': 0} for t in termes], ['terme'])
+    conn.execute(db.update(TermeSimilarite).where(TermeSimilarite.terme.in_(termes))
+                 .values(documents=TermeSimilarite.documents + pas))
+    if pas < 0:
+        conn.execute(db.delete(TermeSimilarite).where(
+            TermeSimilarite.terme.in_(termes), TermeSimilarite.documents <= 0))
+
+def _similarites(conn, id, vecteur, k=None):
+    """Articles gardés dont le cosinus avec vecteur atteint le SEUIL : {id: score}, les k meilleurs si k.
+
+    Produits et sommes sont faits par la base, terme par terme via l'index.
+    """
+    if not vecteur:
+        return {}
+    requete = db.union_all(*(db.select(db.literal(terme, db.Text).label('terme'), db.literal(poids).label('poids'))
+                             for terme, poids in vecteur.items())).cte('requete')
+    score = db.func.sum(VecteurSimilarite.poids * requete.c.poids)
+    requete = (db.select(VecteurSimilarite.article_id, score)
+               .join(requete, requete.c.terme == VecteurSimilarite.terme)
+               .where(VecteurSimilarite.article_id != id)
+               .group_by(VecteurSimilarite.article_id).having(score >= similaires.SEUIL))
+    if k:
+        requete = requete.order_by(score.desc(), VecteurSimilarite.article_id.desc()).limit(k)
+    return dict(conn.execute(requete).all())
+
+def _vecteur(conn, id):
+    return dict(conn.execute(db.select(VecteurSimilarite.terme, VecteurSimilarite.poids)
+                             .where(VecteurSimilarite.article_id == id)).all())
+
+def actualiser_similaires(article_id):
+    """Met à jour l'index et les listes touchées par l'enregistrement ou la suppression d'un article."""
+    k = current_app.config['SIMILAIRES_NOMBRE']
+    with db.engine.begin() as conn:
+        # Retire l'ancienne version de l'article, puis compte la nouvelle s'il est publié
+        anciens = conn.execute(db.select(DocumentSimilarite.termes)
+                               .where(DocumentSimilarite.article_id == article_id)).scalar()
+        if anciens is not None:
+            _compter_termes(conn, anciens, -1)
+            conn.execute(db.delete(DocumentSimilarite).where(DocumentSimilarite.article_id == article_id))
+            conn.execute(db.delete(VecteurSimilarite).where(VecteurSimilarite.article_id == article_id))
+        ligne = conn.execute(db.select(Article.termes)
+                             .where(Article.id == article_id, Article.publie==True)).first()
+        vecteur = {}
+        if ligne is not None:
+            sac = ligne.termes or {}
+            _compter_termes(conn, list(sac), 1)
+            conn.execute(db.insert(DocumentSimilarite).values(article_id=article_id, termes=sorted(sac)))
+            n = conn.execute(db.select(db.func.count()).select_from(DocumentSimilarite)).scalar()
+            frequences = dict(conn.execute(db.select(TermeSimilarite.terme, TermeSimilarite.documents)
+                                           .where(TermeSimilarite.terme.in_(list(sac)))).all()) if sac else {}
+            vecteur = similaires.vecteur(sac, {t: similaires.idf(n, df) for t, df in frequences.items()})
+            _ecrire_vecteur(conn, article_id, vecteur)
+        scores = _similarites(conn, article_id, vecteur)
+        _ecrire_voisins(conn, article_id, similaires.plus_proches(scores, k))
+        # Les autres vecteurs ne changent pas : dans leurs listes, seul le score de
+        # l'article enregistré bouge. Listes qui le contenaient : il a pu changer,
+        # être dépublié ou supprimé
+        a_revoir = set(conn.execute(db.select(ArticleSimilaire.article_id).where(
+            ArticleSimilaire.voisin_id == article_id)).scalars())
+        # Il entre dans les listes incomplètes et dans celles dont il bat le moins proche
+        if scores:
+            seuils = dict(conn.execute(db.select(
+                ArticleSimilaire.article_id, db.func.min(ArticleSimilaire.score)
+            ).where(ArticleSimilaire.article_id.in_(list(scores))).group_by(ArticleSimilaire.article_id)
+             .having(db.func.count() >= k)).all())
+            a_revoir |= {id for id, s in scores.items() if s > seuils.get(id, 0)}
+        a_revoir = list(a_revoir - {article_id})
+        listes = {}
+        if a_revoir:
+            for id, voisin, score in conn.execute(db.select(
+                    ArticleSimilaire.article_id, ArticleSimilaire.voisin_id, ArticleSimilaire.score)
+                    .where(ArticleSimilaire.article_id.in_(a_revoir))):
+                listes.setdefault(id, {})[voisin] = score
+        for id in a_revoir:
+            liste = listes.get(id, {})
+            avant = similaires.plus_proches(liste, k)
+            if liste.pop(article_id, None) is not None and len(avant) >= k \
+                    and scores.get(id, 0) < avant[-1][0]:
+                # Il recule dans une liste complète : un article qui n'y figurait pas peut le dépasser
+                voisins = similaires.plus_proches(_similarites(conn, id, _vecteur(conn, id), k), k)
+            else:
+                if id in scores:
+                    liste[article_id] = scores[id]
+                voisins = similaires.plus_proches(liste, k)
+            if voisins != avant:
+                _ecrire_voisins(conn, id, voisins)
+
+def articles_similaires(art):
+    return db.session.scalars(db.select(Article).options(*carte(etiquettes=False))
+        .join(ArticleSimilaire, ArticleSimilaire.voisin_id == Article.id)
+        .where(ArticleSimilaire.article_id == art.id, Article.publie==True)
+        .order_by(ArticleSimilaire.rang)).all()
+
+# ─── MIGRATIONS ───────────────────────────────────────────
+# db.create_all() ne modifie pas les tables existantes : chaque évolution du
+# schéma est une migration, appliquée une seule fois aux bases déjà en place.
+# Elles doivent rester idempotentes, car une base neuve reçoit déjà le schéma
+# complet via create_all() avant qu'elles ne tournent.
+schema_version = db.Table('schema_version', db.Column('version', db.Integer, nullable=False))
+MIGRATIONS = []
+
+def migration(fonction):
+    MIGRATIONS.append(fonction)
+    return fonction
+
+def _ajouter_colonnes(conn, table):
+    """Ajoute à une table existante les colonnes et index du modèle qui lui manquent."""
+    existantes = {c['name'] for c in db.inspect(conn).get_columns(table.name)}
+    for colonne in table.columns:
+        if colonne.name not in existantes:
+            conn.execute(db.text(
+                f'ALTER TABLE {table.name} ADD COLUMN {colonne.name} {colonne.type.compile(conn.dialect)}'))
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+@migration
+def _index_requetes_publiques(conn):
+    for table in (Article.__table__, Media.__table__, Ressource.__table__, Timeline.__table__):
+        _ajouter_colonnes(conn, table)
+
+@migration
+def _variantes_medias(conn):
+    _ajouter_colonnes(conn, Media.__table__)
+
+@migration
+def _empreintes_medias(conn):
+    _ajouter_colonnes(conn, Media.__table__)
+
+@migration
+def _date_modification_articles(conn):
+    _ajouter_colonnes(conn, Article.__table__)
+    conn.execute(db.update(Article).where(Article.date_modification.is_(None)).values(
+        date_modification=db.func.coalesce(Article.date_publication, Article.date_creation)))
+
+@migration
+def _contenu_prepare(conn):
+    _ajouter_colonnes(conn, Article.__table__)
+    preparer_articles(conn)
+
+def preparer_articles(conn):
+    """Recalcule les champs dérivés et les tags de tous les articles ; retourne leur nombre.
+
+    Requêtes explicites plutôt que le modèle : une migration ne doit pas
+    dépendre des colonnes qu'ajouteront les suivantes.
+    """
+    lignes = conn.execute(db.select(
+        Article.id, Article.titre, Article.contenu, Article.resume, Article.tags)).all()
+    conn.execute(article_tag.delete())
+    for id, titre, contenu, resume, chaine in lignes:
+        derives = preparer_contenu(contenu, resume)
+        noms = normaliser_tags(chaine)
+        conn.execute(db.update(Article).where(Article.id == id).values(
+            tags=', '.join(noms), termes=similaires.termes(titre, ', '.join(noms), derives['texte']),
+            **{champ: derives[champ] for champ in Article.CHAMPS_DERIVES}))
+        if noms:
+            conn.execute(article_tag.insert(), [
+                {'article_id': id, 'tag_id': tag_id} for tag_id in Tag.identifiants(conn, noms).values()])
+    return len(lignes)
+
+@migration
+def _articles_similaires(conn):
+    _ajouter_colonnes(conn, Article.__table__)
+    preparer_articles(conn)
+    recalculer_similaires(conn)
+
+@migration
+def _generations(conn):
+    Generation.__table__.create(conn, checkfirst=True)
+    if conn.execute(db.select(Generation.etiquette).where(Generation.etiquette == 'medias')).first() is None:
+        conn.execute(db.insert(Generation).values(etiquette='medias', valeur=0))
+
+@migration
+def _index_recherche(conn):
+    creer_index_recherche(conn)
+
+@migration
+def _generation_articles(conn):
+    if conn.execute(db.select(Generation.etiquette).where(Generation.etiquette == 'articles')).first() is None:
+        conn.execute(db.insert(Generation).values(etiquette='articles', valeur=0))
+
+@migration
+def _index_similarite_persistant(conn):
+    for modele in (TermeSimilarite, DocumentSimilarite, VecteurSimilarite):
+        modele.__table__.create(conn, checkfirst=True)
+    recalculer_similaires(conn)
+
+def migrer():
+    """Applique les migrations en attente ; retourne leur nombre."""
+    with db.engine.begin() as conn:
+        version = conn.execute(db.select(schema_version.c.version)).scalar()
+        if version is None:
+            conn.execute(schema_version.insert().values(version=0))
+            version = 0
+        for fonction in MIGRATIONS[version:]:
+            fonction(conn)
+        conn.execute(schema_version.update().values(version=len(MIGRATIONS)))
+    return len(MIGRATIONS) - version
+
+def init_db():
+    db.create_all()
+    migrer()
+
+@cli.command('init-db')
+def init_db_command():
+    """Crée les tables, applique les migrations et crée l'index de recherche."""
+    init_db()
+    print('Base initialisée.')
+
+@cli.command('migrer')
+def migrer_command():
+    """Met à jour le schéma d'une base existante."""
+    db.create_all()
+    print(f'{migrer()} migration(s) appliquée(s).')
+
+@cli.command('preparer-articles')
+def preparer_articles_command():
+    """Recalcule HTML nettoyé, résumés, temps de lecture, tables des matières et tags."""
+    with db.engine.begin() as conn:
+        nb = preparer_articles(conn)
+        recalculer_similaires(conn)
+    cache_pages.invalider('articles')
+    print(f'{nb} article(s) préparé(s).')
+
+@cli.command('calculer-similaires')
+def calculer_similaires_command():
+    """Recalcule les articles liés de tous les articles publiés."""
+    with db.engine.begin() as conn:
+        nb = recalculer_similaires(conn)
+    cache_pages.invalider('articles')
+    print(f'Articles liés calculés pour {nb} article(s).')
+
+@cli.command('audit-requetes')
+def audit_requetes_command():
+    """Vérifie par EXPLAIN QUERY PLAN que les pages publiques n'utilisent que des index."""
+    from audit_requetes import auditer
+    if not auditer():
+        raise SystemExit(1)
+
+@cli.command('exporter')
+@click.argument('dossier')
+@click.option('--complet', is_flag=True, help='Re-rend toutes les pages, pas seulement celles touchées.')
+@click.option('--url-base', default='http://localhost/', help='URL publique du site (liens de partage).')
+def exporter_command(dossier, complet, url_base):
+    """Exporte le blog public en HTML statique dans DOSSIER."""
+    from export_statique import exporter
+    bilan = exporter(dossier, url_base=url_base, complet=complet)
+    print(f"{bilan['rendues']} page(s) rendue(s), {bilan['copies']} fichier(s) copié(s), "
+          f"{bilan['supprimees']} page(s) supprimée(s) ; {bilan['flux']} flux Atom et le sitemap écrits.")
+
+@cli.command('importer-articles')
+@click.argument('source')
+@click.option('--ignorer-existants', is_flag=True, help='Saute les fichiers dont le slug existe déjà.')
+@click.option('--url-base', default='http://localhost/', help='URL publique du site (flux Atom).')
+def importer_articles_command(source, ignorer_existants, url_base):
+    """Importe les articles Markdown/HTML d'un dossier ou d'une archive .zip / .tar.gz."""
+    from archives import importer
+    bilan = importer(source, ignorer_existants=ignorer_existants)
+    cache_pages.invalider('articles')
+    if bilan['categories']:
+        with current_app.test_request_context(base_url=url_base):
+            regenerer_flux(*bilan['categories'])
+    for fichier, erreur in bilan['erreurs']:
+        print(f'  {fichier} : {erreur}')
+    print(f"{bilan['importes']} article(s) importé(s), {bilan['ignores']} ignoré(s), "
+          f"{bilan['medias']} fichier(s), {len(bilan['erreurs'])} erreur(s).")
+
+@cli.command('exporter-articles')
+@click.argument('destination')
+def exporter_articles_command(destination):
+    """Exporte tous les articles en HTML à en-tête, dans un dossier ou une archive .zip."""
+    from archives import exporter_dossier, flux_zip
+    if destination.endswith('.zip'):
+        with open(destination, 'wb') as f:
+            for morceau in flux_zip():
+                f.write(morceau)
+        print(f'Archive {destination} écrite.')
+    else:
+        articles, medias = exporter_dossier(destination)
+        print(f'{articles} article(s) et {medias} fichier(s) exportés dans {destination}.')
+
+# ─── IMAGES RESPONSIVES ───────────────────────────────────
+# nom_fichier -> ImageResponsive, ou None sans variantes prêtes (pas de Media, GIF,
+# Pillow absent, traitement en cours) ; vidé quand la génération 'medias' change
+_images = {}
+_images_generation = [None]
+
+def traiter_variantes(app, media_id):
+    # Appelée hors requête, par le pool d'images : l'application est passée explicitement
+    with app.app_context():
+        media = db.session.get(Media, media_id)
+        if media is None:
+            return
+        try:
+            resultat = images.generer_variantes(app.config['UPLOAD_FOLDER'], media.nom_fichier)
+        except Exception:
+            app.logger.exception('Variantes impossibles pour %s', media.nom_fichier)
+            return
+        media.largeur = resultat['largeur']
+        media.hauteur = resultat['hauteur']
+        media.variantes = resultat['variantes']
+        media.placeholder = resultat['placeholder']
+        avancer_generation('medias')
+        db.session.commit()
+        cache_pages.invalider('articles')
+
+def precharger_images(noms):
+    """Charge en une requête les variantes des fichiers noms pas encore connus du worker."""
+    valeur, _ = generation('medias')
+    if _images_generation[0] != valeur:
+        # Variantes prêtes ou fichier supprimé, ici ou dans un autre worker
+        _images.clear()
+        _images_generation[0] = valeur
+    manquants = {nom for nom in noms if nom and nom not in _images}
+    if not manquants:
+        return
+    trouves = {nom: images.ImageResponsive(nom, *autres) for nom, *autres in db.session.execute(db.select(
+        Media.nom_fichier, Media.largeur, Media.hauteur, Media.variantes, Media.placeholder
+    ).where(Media.nom_fichier.in_(manquants), Media.variantes.isnot(None)))}
+    _images.update({nom: trouves.get(nom) for nom in manquants})
+
+def image_responsive(nom_fichier):
+    """Variantes d'un fichier de uploads/, ou None si elles n'existent pas (encore)."""
+    if not nom_fichier:
+        return None
+    precharger_images([nom_fichier])
+    return _images.get(nom_fichier)
+
+@cli.command('calculer-empreintes')
+def calculer_empreintes_command():
+    """Calcule l'empreinte des médias uploadés avant le stockage par contenu."""
+    medias = Media.query.filter(Media.empreinte.is_(None)).all()
+    for media in medias:
+        chemin = os.path.join(current_app.config['UPLOAD_FOLDER'], media.nom_fichier)
+        if os.path.exists(chemin):
+            media.empreinte = stockage.empreinte_fichier(chemin)
+    db.session.commit()
+    print(f'{len(medias)} média(s) traité(s).')
+
+@cli.command('generer-variantes')
+@click.option('--toutes', is_flag=True, help='Régénère aussi les images qui ont déjà leurs variantes.')
+def generer_variantes_command(toutes):
+    """Génère les variantes des images déjà uploadées."""
+    requete = db.select(Media.id, Media.nom_fichier).where(Media.type_media == 'image')
+    if not toutes:
+        requete = requete.where(Media.variantes.is_(None))
+    ids = [id for id, nom in db.session.execute(requete) if images.traitable(nom)]
+    for id in ids:
+        traiter_variantes(current_app._get_current_object(), id)
+    print(f'{len(ids)} image(s) traitée(s).')
+
+# ─── CACHE HTTP ───────────────────────────────────────────
+# Les pages publiques portent un ETag et un Last-Modified calculés à partir de
+# la version du contenu, avant tout rendu : une revalidation (If-None-Match /
+# If-Modified-Since) reçoit un 304 sans requête de rendu ni template.
+def _version_gabarits(app):
+    # Change à chaque déploiement qui touche l'application ou les templates
+    dossier = os.path.join(app.root_path, app.template_folder)
+    fichiers = [os.path.abspath(__file__)] + [
+        os.path.join(racine, nom) for racine, _, noms in os.walk(dossier) for nom in noms]
+    # Les pages citent les feuilles de style par leur empreinte
+    if os.path.exists(statiques.chemin_manifeste):
+        fichiers.append(statiques.chemin_manifeste)
+    return hashlib.sha1(repr(sorted((f, os.path.getmtime(f)) for f in fichiers)).encode()).hexdigest()
+
+def avancer_generation(etiquette):
+    """Incrémente une Generation dans la transaction en cours ; validée avec elle."""
+    db.session.execute(db.update(Generation).where(Generation.etiquette == etiquette).values(
+        valeur=Generation.valeur + 1, date=datetime.utcnow()))
+
+def generation(etiquette):
+    """(valeur, date) d'une Generation, lue une seule fois par requête."""
+    generations = g.setdefault('generations', {})
+    if etiquette not in generations:
+        ligne = db.session.execute(db.select(Generation.valeur, Generation.date)
+                                   .where(Generation.etiquette == etiquette)).first()
+        generations[etiquette] = tuple(ligne) if ligne else (0, None)
+    return generations[etiquette]
+
+def version_contenu(etiquette):
+    """Version des données d'une étiquette du cache des pages : {'cle', 'modif'}.
+
+    Recalculée à chaque requête, par un agrégat couvert par un index : gardée
+    dans un cache propre au worker, elle survivrait aux écritures des autres.
+    """
+    if etiquette == 'articles':
+        nb, modif = db.session.execute(db.select(
+            db.func.count(), db.func.max(Article.date_modification)
+        ).where(Article.publie==True)).one()
+        # Un article supprimé ou dépublié sort de l'agrégat sans en avancer la date
+        retraits, date_retraits = generation('articles')
+        # Les pages d'articles affichent srcset et placeholder des images : variantes comprises
+        medias, date_medias = generation('medias')
+        return {'cle': f'{etiquette}:{nb}:{modif}:{retraits}:{medias}',
+                'modif': max(filter(None, (modif, date_retraits, date_medias)), default=None)}
+    # Étapes et ressources ne sont jamais modifiées, seulement ajoutées ou supprimées
+    modele = {'timeline': Timeline, 'ressources': Ressource}[etiquette]
+    nb, dernier = db.session.execute(db.select(db.func.count(), db.func.max(modele.id))).one()
+    return {'cle': f'{etiquette}:{nb}:{dernier}', 'modif': None}
+
+def validateurs(*etiquettes):
+    """(ETag, Last-Modified) de la page demandée, selon la version de ses données."""
+    versions = [version_contenu(e) for e in etiquettes]
+    source = '|'.join([current_app.extensions['version_gabarits'], request.full_path, str(bool(session.get('admin')))]
+                      + [v['cle'] for v in versions])
+    dates = [v['modif'] for v in versions if v['modif']]
+    return hashlib.sha1(source.encode()).hexdigest(), max(dates) if dates else None
+
+def reponse_conditionnelle(contenu, etag, modif):
+    """Réponse portant les validateurs ; contenu None donne un 304."""
+    reponse = Response(status=304) if contenu is None else make_response(contenu)
+    # Faible : il désigne une version du contenu, pas des octets, et reste le même
+    # quel que soit l'encodage (gzip ou non) de la réponse
+    reponse.set_etag(etag, weak=True)
+    if modif:
+        reponse.last_modified = modif
+    reponse.cache_control.no_cache = True
+    return reponse
+
+def non_modifie(etag, modif):
+    return not is_resource_modified(request.environ, etag=etag, last_modified=modif)
+
+def conditionnel(*etiquettes):
+    """Décorateur : répond 304 avant d'appeler la vue si le client a la version courante."""
+    def decorateur(vue):
+        @wraps(vue)
+        def decorated(*args, **kwargs):
+            if session.get('_flashes'):
+                return vue(*args, **kwargs)
+            etag, modif = validateurs(*etiquettes)
+            if non_modifie(etag, modif):
+                return reponse_conditionnelle(None, etag, modif)
+            return reponse_conditionnelle(vue(*args, **kwargs), etag, modif)
+        return decorated
+    return decorateur
+
+def cache_uploads(reponse):
+    # Les noms de fichiers uploadés (horodatés ou par contenu) ne changent jamais de contenu
+    if request.endpoint == 'static' and request.view_args.get('filename', '').startswith('uploads/') \
+            and reponse.status_code in (200, 206, 304):
+        reponse.cache_control.no_cache = None
+        reponse.cache_control.public = True
+        reponse.cache_control.max_age = 365 * 24 * 3600
+        reponse.cache_control.immutable = True
+    return reponse
+
+@cli.command('construire-statiques')
+@click.option('--polices', is_flag=True, help='Télécharge d\'abord les polices depuis Google Fonts.')
+def construire_statiques_command(polices):
+    """Minifie, empreinte et précompresse les feuilles de style et les polices."""
+    if polices:
+        statiques.telecharger_polices()
+    manifeste = statiques.construire()
+    feuilles = statiques.manquants(polices=False)
+    if feuilles:
+        raise click.ClickException(f"introuvable(s) : {', '.join(feuilles)}")
+    polices_absentes = sorted(set(statiques.manquants()) - set(feuilles))
+    if polices_absentes:
+        click.echo(f"Attention, polices absentes : {', '.join(polices_absentes)} ; remplacées par une police "
+                   "système, téléchargez-les par `flask construire-statiques --polices`", err=True)
+    print(f'{len(manifeste)} fichier(s) dans le manifeste ; redémarrez les workers pour l\'utiliser.')
+
+# ─── PAGINATION PAR CURSEUR ───────────────────────────────
+# Pagination par clé (keyset) : la page suivante est lue à partir de la clé de
+# tri du dernier article affiché, ce qui suit l'index au lieu de sauter OFFSET
+# lignes, et ne demande aucun COUNT. Les clés voyagent dans un curseur signé.
+def _curseurs():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='pagination')
+
+class PageCurseur:
+    def __init__(self, items, curseur_precedent=None, curseur_suivant=None, total=None):
+        self.items = items
+        self.curseur_precedent = curseur_precedent
+        self.curseur_suivant = curseur_suivant
+        self.total = total
+
+    @property
+    def has_prev(self):
+        return self.curseur_precedent is not None
+
+    @property
+    def has_next(self):
+        return self.curseur_suivant is not None
+
+def encoder_curseur(objet, cles):
+    valeurs = [getattr(objet, c.key) for c in cles]
+    return _curseurs().dumps([v.isoformat() if isinstance(v, datetime) else v for v in valeurs])
+
+def decoder_curseur(jeton, cles):
+    if not jeton:
+        return None
+    try:
+        valeurs = _curseurs().loads(jeton)
+        if len(valeurs) != len(cles):
+            return None
+        return tuple(datetime.fromisoformat(v) if v is not None and isinstance(c.type, db.DateTime) else v
+                     for c, v in zip(cles, valeurs))
+    except (BadSignature, TypeError, ValueError):
+        return None
+
+def paginer_par_curseur(requete, cles, par_page=ARTICLES_PAR_PAGE, total=None):
+    """Pagine requete (un select d'articles) selon ?apres= / ?avant=.
+
+    cles : colonnes du tri décroissant, la dernière étant unique (id). La
+    première peut être NULL : ces lignes viennent en dernier, lues dans un
+    segment à part, sur toutes les bases, comme avec ORDER BY ... DESC NULLS
+    LAST dans le mode par pages. Les autres clés ne doivent pas être NULL.
+    """
+    premiere, reste = cles[0], cles[1:]
+
+    def segment(nulle, apres, croissant, limite):
+        if limite <= 0:
+            return []
+        colonnes = reste if nulle else cles
+        q = requete.where(premiere.is_(None) if nulle else premiere.isnot(None))
+        if apres is not None:
+            cle = db.tuple_(*colonnes)
+            q = q.where(cle > apres if croissant else cle < apres)
+        q = q.order_by(*[c.asc() if croissant else c.desc() for c in colonnes]).limit(limite)
+        return db.session.execute(q).scalars().all()
+
+    avant = decoder_curseur(request.args.get('avant'), cles)
+    if avant is not None:
+        # Page précédente : on remonte le tri, puis on remet les lignes dans l'ordre
+        if avant[0] is None:
+            items = segment(True, avant[1:], True, par_page + 1)
+        else:
+            items = []
+        items += segment(False, avant if avant[0] is not None else None, True, par_page + 1 - len(items))
+        plus = len(items) > par_page
+        items = items[:par_page][::-1]
+        return PageCurseur(items,
+            encoder_curseur(items[0], cles) if plus and items else None,
+            encoder_curseur(items[-1], cles) if items else None, total)
+
+    apres = decoder_curseur(request.args.get('apres'), cles)
+    if apres is None or apres[0] is not None:
+        items = segment(False, apres, False, par_page + 1)
+        items += segment(True, None, False, par_page + 1 - len(items))
+    else:
+        items = segment(True, apres[1:], False, par_page + 1)
+    plus = len(items) > par_page
+    items = items[:par_page]
+    return PageCurseur(items,
+        encoder_curseur(items[0], cles) if apres is not None and items else None,
+        encoder_curseur(items[-1], cles) if plus else None, total)
+
+def total_en_cache(nom, requete):
+    """COUNT(*) de requete, gardé dans le cache des pages jusqu'à la prochaine écriture d'article."""
+    if not current_app.config['PAGINATION_TOTAL']:
+        return None
+    return cache_pages.obtenir(('total', nom), ('articles',), lambda: db.session.scalar(
+        requete.with_only_columns(db.func.count(), maintain_column_froms=True)), compter=False)
 
 # ─── ROUTES PUBLIQUES ─────────────────────────────────────
-@app.route('/')
+# Déclarées par @route, comme les migrations par @migration, puis enregistrées
+# par create_app() sous le nom de leur fonction.
+ROUTES = []
+
+def route(regle, **options):
+    def decorateur(vue):
+        ROUTES.append((regle, vue, options))
+        return vue
+    return decorateur
+
+@route('/')
+@conditionnel('articles')
+@cache_pages.page('articles')
 def index():
-    articles_recents = Article.query.filter_by(publie=True)\
+    articles_recents = Article.query.options(*carte()).filter_by(publie=True)\
         .order_by(Article.date_publication.desc()).limit(6).all()
+    precharger_images(a.image_couverture for a in articles_recents)
     dernier_jour = db.session.query(db.func.max(Article.jour))\
         .filter(Article.publie==True).scalar() or 0
-    nb_articles = Article.query.filter_by(publie=True).count()
+    nb_articles = db.session.query(db.func.count(Article.id))\
+        .filter(Article.publie==True).scalar()
     return render_template('index.html',
         articles=articles_recents,
         dernier_jour=dernier_jour,
         nb_articles=nb_articles,
         categories=CATEGORIES)
 
-@app.route('/journal')
-def journal():
-    page = request.args.get('page', 1, type=int)
-    articles = Article.query.filter_by(publie=True)\
-        .order_by(Article.jour.desc(), Article.date_publication.desc())\
-        .paginate(page=page, per_page=9, error_out=False)
+@route('/journal')
+@route('/journal/page/<int:page>')
+@conditionnel('articles')
+@cache_pages.page('articles')
+def journal(page=None):
+    page = page or request.args.get('page', type=int)
+    if page or current_app.config['PAGINATION_MODE'] != 'curseur':
+        articles = Article.query.options(*carte()).filter_by(publie=True)\
+            .order_by(Article.jour.desc().nulls_last(), Article.date_publication.desc(), Article.id.desc())\
+            .paginate(page=page or 1, per_page=ARTICLES_PAR_PAGE, error_out=False)
+    else:
+        requete = db.select(Article).options(*carte()).filter_by(publie=True)
+        articles = paginer_par_curseur(requete, (Article.jour, Article.date_publication, Article.id),
+                                       total=total_en_cache('journal', requete))
+    precharger_images(a.image_couverture for a in articles.items)
     return render_template('journal.html', articles=articles, categories=CATEGORIES)
 
-@app.route('/categorie/<cat>')
-def categorie(cat):
-    page = request.args.get('page', 1, type=int)
-    articles = Article.query.filter_by(publie=True, categorie=cat)\
-        .order_by(Article.date_publication.desc())\
-        .paginate(page=page, per_page=9, error_out=False)
+@route('/categorie/<cat>')
+@route('/categorie/<cat>/page/<int:page>')
+@conditionnel('articles')
+@cache_pages.page('articles')
+def categorie(cat, page=None):
+    page = page or request.args.get('page', type=int)
+    if page or current_app.config['PAGINATION_MODE'] != 'curseur':
+        articles = Article.query.options(*carte()).filter_by(publie=True, categorie=cat)\
+            .order_by(Article.date_publication.desc().nulls_last(), Article.id.desc())\
+            .paginate(page=page or 1, per_page=ARTICLES_PAR_PAGE, error_out=False)
+    else:
+        requete = db.select(Article).options(*carte()).filter_by(publie=True, categorie=cat)
+        articles = paginer_par_curseur(requete, (Article.date_publication, Article.id),
+                                       total=total_en_cache(('categorie', cat), requete))
+    precharger_images(a.image_couverture for a in articles.items)
     nom_cat = CATEGORIES.get(cat, cat)
     return render_template('categorie.html', articles=articles, cat=cat, nom_cat=nom_cat, categories=CATEGORIES)
 
-@app.route('/article/<slug>')
+@route('/article/<slug>')
 def article(slug):
-    art = Article.query.filter_by(slug=slug, publie=True).first_or_404()
-    art.vues += 1
-    db.session.commit()
+    # Le HTML source n'est pas affiché : seul contenu_html, préparé à l'enregistrement
+    art = Article.query.options(db.defer(Article.contenu, raiseload=True))\
+        .filter_by(slug=slug, publie=True).first_or_404()
+    compteur_vues.incrementer(art.id)
+    if session.get('_flashes'):
+        return _rendre_article(art)
+    # Une revalidation compte comme une lecture ; le nombre de vues affiché
+    # n'entre pas dans l'ETag et peut donc retarder, comme dans le cache des pages
+    etag, modif = validateurs('articles')
+    if non_modifie(etag, modif):
+        return reponse_conditionnelle(None, etag, modif)
+    if not cache_pages.utilisable():
+        return reponse_conditionnelle(_rendre_article(art), etag, modif)
+    return reponse_conditionnelle(
+        cache_pages.obtenir(('article', slug), ('articles',), lambda: _rendre_article(art)), etag, modif)
+
+def _rendre_article(art):
+    vues = (art.vues or 0) + compteur_vues.en_attente(art.id)
     # Articles précédent/suivant
-    precedent = Article.query.filter(
+    precedent = Article.query.options(*carte(etiquettes=False)).filter(
         Article.publie==True, Article.jour < art.jour
     ).order_by(Article.jour.desc()).first() if art.jour else None
-    suivant = Article.query.filter(
+    suivant = Article.query.options(*carte(etiquettes=False)).filter(
         Article.publie==True, Article.jour > art.jour
     ).order_by(Article.jour.asc()).first() if art.jour else None
-    return render_template('article.html', article=art, precedent=precedent, suivant=suivant)
+    return render_template('article.html', article=art, vues=vues, precedent=precedent, suivant=suivant,
+                           similaires=articles_similaires(art))
 
-@app.route('/timeline')
+@route('/timeline')
+@conditionnel('timeline')
+@cache_pages.page('timeline')
 def timeline():
     etapes = Timeline.query.order_by(Timeline.date_event.asc()).all()
     return render_template('timeline.html', etapes=etapes)
 
-@app.route('/ressources')
+@route('/ressources')
+@conditionnel('ressources')
+@cache_pages.page('ressources')
 def ressources():
     toutes = Ressource.query.order_by(Ressource.categorie, Ressource.ordre).all()
     par_cat = {}
@@ -158,243 +1177,191 @@ def ressources():
         par_cat.setdefault(r.categorie, []).append(r)
     return render_template('ressources.html', ressources_par_cat=par_cat)
 
-@app.route('/a-propos')
+@route('/a-propos')
+@conditionnel()
+@cache_pages.page()
 def a_propos():
     return render_template('a_propos.html')
 
-@app.route('/recherche')
+@route('/recherche')
 def recherche():
-    q = request.args.get('q', '')
-    articles = []
+    q = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    articles, extraits = None, {}
     if q:
-        like = f'%{q}%'
-        articles = Article.query.filter(
-            Article.publie==True,
-            (Article.titre.like(like)) | (Article.contenu.like(like)) | (Article.tags.like(like))
-        ).order_by(Article.date_publication.desc()).all()
-    return render_template('recherche.html', articles=articles, q=q)
+        articles, extraits = rechercher_articles(q, page)
+        precharger_images(a.image_couverture for a in articles.items)
+    return render_template('recherche.html', articles=articles, extraits=extraits, q=q)
+
+# ─── FLUX ET SITEMAP ──────────────────────────────────────
+# Fichiers XML construits à l'avance dans FLUX_DOSSIER, partagés par les
+# workers. Les vues d'administration reconstruisent, après chaque écriture
+# touchant un article publié, le flux global, ceux des catégories concernées et
+# le sitemap ; les routes ne font que servir le fichier (construit à la demande
+# s'il manque) avec ETag et Last-Modified.
+FLUX_ARTICLES = 20
+
+def _chemin_flux(nom, dossier=None):
+    return os.path.join(dossier or current_app.config['FLUX_DOSSIER'], nom)
+
+def construire_flux(cat=None, chemin=None):
+    """Écrit le flux Atom global ou d'une catégorie, dans FLUX_DOSSIER sauf chemin donné."""
+    requete = db.select(Article).options(db.defer(Article.contenu)).where(Article.publie==True)
+    if cat:
+        requete = requete.where(Article.categorie == cat)
+    articles = db.session.scalars(
+        requete.order_by(Article.date_publication.desc()).limit(FLUX_ARTICLES)).all()
+    entrees = [{
+        'titre': a.titre,
+        'lien': url_for('article', slug=a.slug, _external=True),
+        'publie': a.date_publication or a.date_creation,
+        'modifie': a.date_modification or a.date_publication or a.date_creation,
+        'resume': a.chapo,
+        'contenu_html': a.contenu_html,
+        'categories': [t.nom for t in a.etiquettes],
+    } for a in articles]
+    mis_a_jour = max((e['modifie'] for e in entrees), default=datetime.utcnow())
+    flux.ecrire(chemin or _chemin_flux(f'feed-{cat}.xml' if cat else 'feed.xml'), flux.atom(
+        f'RobotJournal – {CATEGORIES[cat]}' if cat else 'RobotJournal',
+        url_for('categorie', cat=cat, _external=True) if cat else url_for('index', _external=True),
+        url_for('flux_atom', cat=cat, _external=True), entrees, mis_a_jour, current_app.config['FLUX_AUTEUR']))
+
+def _urls_sitemap():
+    modifs = dict(db.session.execute(db.select(
+        Article.categorie, db.func.max(Article.date_modification)
+    ).where(Article.publie==True).group_by(Article.categorie)).all())
+    derniere = max(filter(None, modifs.values()), default=None)
+    yield url_for('index', _external=True), derniere
+    yield url_for('journal', _external=True), derniere
+    for vue in ('timeline', 'ressources', 'a_propos'):
+        yield url_for(vue, _external=True), None
+    for cat in CATEGORIES:
+        yield url_for('categorie', cat=cat, _external=True), modifs.get(cat)
+    lignes = db.session.execute(db.select(Article.slug, Article.date_modification)
+        .where(Article.publie==True).order_by(Article.date_publication.desc())
+        .execution_options(yield_per=1000))
+    for slug, modif in lignes:
+        yield url_for('article', slug=slug, _external=True), modif
+
+def construire_sitemap(dossier=None):
+    """Écrit sitemap.xml, ou un index et des sitemap-N.xml au-delà de LIMITE_SITEMAP URLs."""
+    urls = _urls_sitemap()
+    blocs = []
+    while True:
+        bloc = [u for u, _ in zip(urls, range(flux.LIMITE_SITEMAP))]
+        if not bloc:
+            break
+        blocs.append(bloc)
+    if len(blocs) <= 1:
+        flux.ecrire(_chemin_flux('sitemap.xml', dossier), flux.sitemap(blocs[0] if blocs else []))
+    else:
+        for n, bloc in enumerate(blocs, 1):
+            flux.ecrire(_chemin_flux(f'sitemap-{n}.xml', dossier), flux.sitemap(bloc))
+        flux.ecrire(_chemin_flux('sitemap.xml', dossier), flux.index_sitemaps(
+            url_for('sitemap_partiel', n=n, _external=True) for n in range(1, len(blocs) + 1)))
+    # Morceaux d'un sitemap plus long que l'actuel
+    n = len(blocs) + 1 if len(blocs) > 1 else 1
+    while os.path.exists(_chemin_flux(f'sitemap-{n}.xml', dossier)):
+        os.remove(_chemin_flux(f'sitemap-{n}.xml', dossier))
+        n += 1
+
+def regenerer_flux(*categories):
+    """Reconstruit le flux global, ceux des catégories données et le sitemap."""
+    try:
+        construire_flux()
+        for cat in CATEGORIES.keys() & set(categories):
+            construire_flux(cat)
+        construire_sitemap()
+    except Exception:
+        # L'article est enregistré : on retombe sur une construction à la prochaine lecture
+        current_app.logger.exception('Reconstruction des flux impossible')
+        for nom in ['feed.xml', 'sitemap.xml'] + [f'feed-{cat}.xml' for cat in categories]:
+            if os.path.exists(_chemin_flux(nom)):
+                os.remove(_chemin_flux(nom))
+
+def _servir_flux(nom, construire, mimetype):
+    chemin = _chemin_flux(nom)
+    if not os.path.exists(chemin):
+        construire()
+    return send_file(chemin, mimetype=mimetype, conditional=True)
+
+@route('/feed.xml')
+@route('/categorie/<cat>/feed.xml')
+def flux_atom(cat=None):
+    if cat is not None and cat not in CATEGORIES:
+        return 'Catégorie inconnue', 404
+    return _servir_flux(f'feed-{cat}.xml' if cat else 'feed.xml',
+                        lambda: construire_flux(cat), 'application/atom+xml')
+
+@route('/sitemap.xml')
+def sitemap():
+    return _servir_flux('sitemap.xml', construire_sitemap, 'application/xml')
+
+@route('/sitemap-<int:n>.xml')
+def sitemap_partiel(n):
+    if not os.path.exists(_chemin_flux(f'sitemap-{n}.xml')):
+        return 'Sitemap inconnu', 404
+    return _servir_flux(f'sitemap-{n}.xml', construire_sitemap, 'application/xml')
+
+@cli.command('regenerer-flux')
+@click.option('--url-base', default='http://localhost/', help='URL publique du site.')
+def regenerer_flux_command(url_base):
+    """Reconstruit tous les flux Atom et le sitemap."""
+    with current_app.test_request_context(base_url=url_base):
+        regenerer_flux(*CATEGORIES)
+    print('Flux et sitemap reconstruits.')
 
 # ─── ADMINISTRATION ────────────────────────────────────────
-@app.route('/admin/login', methods=['GET', 'POST'])
-def admin_login():
-    if request.method == 'POST':
-        if (request.form.get('username') == 'admin' and
-            request.form.get('password') == 'robot2024'):  # Changez ce mot de passe !
-            session['admin'] = True
-            return redirect(url_for('admin_dashboard'))
-        flash('Identifiants incorrects', 'danger')
-    return render_template('admin/login.html')
-
-@app.route('/admin/logout')
-def admin_logout():
-    session.pop('admin', None)
-    return redirect(url_for('index'))
-
-@app.route('/admin')
-@login_required
-def admin_dashboard():
-    nb_articles = Article.query.count()
-    nb_publies = Article.query.filter_by(publie=True).count()
-    nb_medias = Media.query.count()
-    articles_recents = Article.query.order_by(Article.date_creation.desc()).limit(5).all()
-    return render_template('admin/dashboard.html',
-        nb_articles=nb_articles, nb_publies=nb_publies,
-        nb_medias=nb_medias, articles_recents=articles_recents)
-
-@app.route('/admin/articles')
-@login_required
-def admin_articles():
-    articles = Article.query.order_by(Article.date_creation.desc()).all()
-    return render_template('admin/articles.html', articles=articles, categories=CATEGORIES)
-
-@app.route('/admin/article/nouveau', methods=['GET', 'POST'])
-@login_required
-def admin_nouvel_article():
-    if request.method == 'POST':
-        titre = request.form.get('titre', '').strip()
-        if not titre:
-            flash('Le titre est requis', 'danger')
-            return render_template('admin/article_form.html', categories=CATEGORIES)
-        
-        slug_base = slugify(titre)
-        slug = slug_base
-        counter = 1
-        while Article.query.filter_by(slug=slug).first():
-            slug = f"{slug_base}-{counter}"
-            counter += 1
-
-        # Gestion image couverture
-        image_couverture = None
-        if 'image_couverture' in request.files:
-            f = request.files['image_couverture']
-            if f and f.filename and allowed_file(f.filename):
-                fname = secure_filename(f.filename)
-                fname = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{fname}"
-                f.save(os.path.join(app.config['UPLOAD_FOLDER'], fname))
-                image_couverture = fname
-
-        publie = 'publie' in request.form
-        art = Article(
-            titre=titre,
-            slug=slug,
-            contenu=request.form.get('contenu', ''),
-            resume=request.form.get('resume', ''),
-            image_couverture=image_couverture,
-            categorie=request.form.get('categorie', 'journal'),
-            jour=request.form.get('jour') or None,
-            tags=request.form.get('tags', ''),
-            publie=publie,
-            date_publication=datetime.utcnow() if publie else None,
-        )
-        db.session.add(art)
-        db.session.commit()
-        flash('Article créé avec succès !', 'success')
-        return redirect(url_for('admin_articles'))
-
-    return render_template('admin/article_form.html', article=None, categories=CATEGORIES)
-
-@app.route('/admin/article/<int:id>/modifier', methods=['GET', 'POST'])
-@login_required
-def admin_modifier_article(id):
-    art = Article.query.get_or_404(id)
-    if request.method == 'POST':
-        art.titre = request.form.get('titre', '').strip()
-        art.contenu = request.form.get('contenu', '')
-        art.resume = request.form.get('resume', '')
-        art.categorie = request.form.get('categorie', 'journal')
-        art.jour = request.form.get('jour') or None
-        art.tags = request.form.get('tags', '')
-        
-        if 'image_couverture' in request.files:
-            f = request.files['image_couverture']
-            if f and f.filename and allowed_file(f.filename):
-                fname = secure_filename(f.filename)
-                fname = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{fname}"
-                f.save(os.path.join(app.config['UPLOAD_FOLDER'], fname))
-                art.image_couverture = fname
-
-        etait_publie = art.publie
-        art.publie = 'publie' in request.form
-        if art.publie and not etait_publie:
-            art.date_publication = datetime.utcnow()
-        
-        db.session.commit()
-        flash('Article mis à jour !', 'success')
-        return redirect(url_for('admin_articles'))
-    
-    return render_template('admin/article_form.html', article=art, categories=CATEGORIES)
-
-@app.route('/admin/article/<int:id>/supprimer', methods=['POST'])
-@login_required
-def admin_supprimer_article(id):
-    art = Article.query.get_or_404(id)
-    db.session.delete(art)
-    db.session.commit()
-    flash('Article supprimé', 'info')
-    return redirect(url_for('admin_articles'))
-
-@app.route('/admin/medias', methods=['GET', 'POST'])
-@login_required
-def admin_medias():
-    if request.method == 'POST':
-        if 'fichier' not in request.files:
-            flash('Aucun fichier sélectionné', 'danger')
-        else:
-            f = request.files['fichier']
-            if f and allowed_file(f.filename):
-                nom_original = f.filename
-                fname = secure_filename(f.filename)
-                fname = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{fname}"
-                path = os.path.join(app.config['UPLOAD_FOLDER'], fname)
-                f.save(path)
-                ext = fname.rsplit('.', 1)[1].lower()
-                type_media = 'image' if ext in {'png','jpg','jpeg','gif','webp'} else \
-                             'video' if ext == 'mp4' else 'pdf'
-                media = Media(
-                    nom_fichier=fname,
-                    nom_original=nom_original,
-                    type_media=type_media,
-                    taille=os.path.getsize(path)
-                )
-                db.session.add(media)
-                db.session.commit()
-                flash(f'Fichier "{nom_original}" uploadé !', 'success')
-    
-    medias = Media.query.order_by(Media.date_upload.desc()).all()
-    return render_template('admin/medias.html', medias=medias)
-
-@app.route('/admin/medias/<int:id>/supprimer', methods=['POST'])
-@login_required
-def admin_supprimer_media(id):
-    media = Media.query.get_or_404(id)
-    path = os.path.join(app.config['UPLOAD_FOLDER'], media.nom_fichier)
-    if os.path.exists(path):
-        os.remove(path)
-    db.session.delete(media)
-    db.session.commit()
-    flash('Fichier supprimé', 'info')
-    return redirect(url_for('admin_medias'))
-
-@app.route('/admin/timeline', methods=['GET', 'POST'])
-@login_required
-def admin_timeline():
-    if request.method == 'POST':
-        etape = Timeline(
-            titre=request.form.get('titre', ''),
-            description=request.form.get('description', ''),
-            date_event=datetime.strptime(request.form.get('date_event'), '%Y-%m-%d') if request.form.get('date_event') else None,
-            statut=request.form.get('statut', 'planifie'),
-            icone=request.form.get('icone', '🔧'),
-        )
-        db.session.add(etape)
-        db.session.commit()
-        flash('Étape ajoutée !', 'success')
-    etapes = Timeline.query.order_by(Timeline.date_event.asc()).all()
-    return render_template('admin/timeline.html', etapes=etapes)
+# Les vues sont dans admin.py, importé à la première requête d'administration
+# (voir VueParesseuse) : les règles sont déclarées ici pour que url_for() les
+# connaisse dès le démarrage, sous le nom de leur fonction.
+ROUTES_ADMIN = [
+    ('/admin/login',                         'admin_login',               ['GET', 'POST']),
+    ('/admin/logout',                        'admin_logout',              ['GET']),
+    ('/admin',                               'admin_dashboard',           ['GET']),
+    ('/admin/cache',                         'admin_cache',               ['GET']),
+    ('/admin/metrics',                       'admin_metrics',             ['GET']),
+    ('/admin/cache/vider',                   'admin_vider_cache',         ['POST']),
+    ('/admin/articles',                      'admin_articles',            ['GET']),
+    ('/admin/article/nouveau',               'admin_nouvel_article',      ['GET', 'POST']),
+    ('/admin/article/<int:id>/modifier',     'admin_modifier_article',    ['GET', 'POST']),
+    ('/admin/article/<int:id>/supprimer',    'admin_supprimer_article',   ['POST']),
+    ('/admin/articles/import',               'admin_importer_articles',   ['POST']),
+    ('/admin/articles/export.zip',           'admin_exporter_articles',   ['GET']),
+    ('/admin/medias',                        'admin_medias',              ['GET', 'POST']),
+    ('/admin/medias/televersements',         'admin_creer_televersement', ['POST']),
+    ('/admin/medias/televersements/<id>',    'admin_televersement',       ['GET', 'PUT', 'DELETE']),
+    ('/admin/medias/<int:id>/supprimer',     'admin_supprimer_media',     ['POST']),
+    ('/admin/timeline',                      'admin_timeline',            ['GET', 'POST']),
+    ('/admin/timeline/<int:id>/supprimer',   'admin_supprimer_etape',     ['POST']),
+    ('/admin/ressources',                    'admin_ressources',          ['GET', 'POST']),
+    ('/admin/ressources/<int:id>/supprimer', 'admin_supprimer_ressource', ['POST']),
+]
 
-@app.route('/admin/timeline/<int:id>/supprimer', methods=['POST'])
-@login_required
-def admin_supprimer_etape(id):
-    etape = Timeline.query.get_or_404(id)
-    db.session.delete(etape)
-    db.session.commit()
-    flash('Étape supprimée', 'info')
-    return redirect(url_for('admin_timeline'))
-
-@app.route('/admin/ressources', methods=['GET', 'POST'])
-@login_required
-def admin_ressources():
-    if request.method == 'POST':
-        r = Ressource(
-            titre=request.form.get('titre', ''),
-            url=request.form.get('url', ''),
-            description=request.form.get('description', ''),
-            categorie=request.form.get('categorie', 'outils'),
-            ordre=request.form.get('ordre', 0),
-        )
-        db.session.add(r)
-        db.session.commit()
-        flash('Ressource ajoutée !', 'success')
-    ressources = Ressource.query.order_by(Ressource.categorie, Ressource.ordre).all()
-    return render_template('admin/ressources.html', ressources=ressources)
-
-@app.route('/admin/ressources/<int:id>/supprimer', methods=['POST'])
-@login_required
-def admin_supprimer_ressource(id):
-    r = Ressource.query.get_or_404(id)
-    db.session.delete(r)
-    db.session.commit()
-    return redirect(url_for('admin_ressources'))
+class VueParesseuse:
+    """Vue désignée par son chemin (module.fonction), importée au premier appel."""
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self.vue = None
+
+    def __call__(self, **valeurs):
+        if self.vue is None:
+            self.vue = import_string(self.chemin)
+        return self.vue(**valeurs)
+
+@cli.command('nettoyer-televersements')
+def nettoyer_televersements_command():
+    """Supprime les uploads en plusieurs morceaux abandonnés (voir UPLOAD_PARTIELS_DUREE)."""
+    from admin import televersements
+    print(f'{televersements().nettoyer()} fichier(s) partiel(s) supprimé(s).')
 
 # Filtre Jinja pour formater les dates
-@app.template_filter('date_fr')
 def date_fr(dt):
     if not dt:
         return ''
     mois = ['jan','fév','mar','avr','mai','juin','juil','août','sep','oct','nov','déc']
     return f"{dt.day} {mois[dt.month-1]} {dt.year}"
 
-@app.template_filter('taille_fichier')
 def taille_fichier(taille):
     if taille < 1024:
         return f"{taille} o"
@@ -402,10 +1369,118 @@ def taille_fichier(taille):
         return f"{taille//1024} Ko"
     return f"{taille//(1024*1024)} Mo"
 
+# ─── DÉMARRAGE ────────────────────────────────────────────
+def create_app(config=None):
+    """Fabrique de l'application, en phases chronométrées (voir demarrage.py).
+
+    Importer ce module ne construit rien : modèles, vues et commandes y sont
+    déclarés, et create_app() les branche sur une application neuve. Les vues
+    d'administration n'y sont qu'enregistrées ; admin.py n'est importé qu'à la
+    première requête qui en a besoin. config complète la configuration par
+    défaut (tests, bancs de mesure). `flask --app app` appelle create_app().
+    """
+    with demarrage.phase('configuration'):
+        app = Flask(__name__)
+        app.config['SECRET_KEY'] = 'votre-cle-secrete-changez-moi'
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('ROBOTBLOG_DATABASE_URI', 'sqlite:///robotblog.db')
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        app.config['BASE_PROFIL'] = os.environ.get('ROBOTBLOG_BASE_PROFIL', 'developpement')  # ou 'production' (voir base_donnees.py)
+        app.config['BASE_LECTURE'] = os.environ.get('ROBOTBLOG_DATABASE_LECTURE_URI')  # réplique ou même fichier SQLite ; sinon tout sur la base principale
+        app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'static', 'uploads')
+        app.config['MAX_CONTENT_LENGTH'] = 32 * 1024 * 1024  # 32MB max par requête
+        app.config['UPLOAD_TAILLE_MAX'] = 2 * 1024 * 1024 * 1024  # 2Go pour un upload en plusieurs morceaux
+        app.config['UPLOAD_PARTIELS_DUREE'] = 24 * 3600  # secondes sans morceau avant qu'un upload interrompu soit supprimé
+        app.config['VUES_FLUSH_INTERVALLE'] = 10  # secondes ; 0 = écriture à chaque lecture
+        app.config['CACHE_PAGES_TAILLE'] = 512  # nombre de pages gardées
+        app.config['CACHE_PAGES_TTL'] = 300  # secondes
+        app.config['CACHE_PAGES_DOSSIER'] = os.environ.get('ROBOTBLOG_CACHE_DOSSIER', os.path.join(app.instance_path, 'cache')
+            if app.config['BASE_PROFIL'] == 'production' else '')  # partagé entre workers (défaut en production) ; '' = LRU en mémoire, pour un seul worker
+        app.config['PAGINATION_MODE'] = 'curseur'  # 'curseur' (keyset) ou 'pages' (OFFSET) ; ?page=N reste accepté
+        app.config['PAGINATION_TOTAL'] = True  # affiche le nombre total d'articles (COUNT mis en cache)
+        app.config['IMAGES_WORKERS'] = 2  # threads de génération des variantes d'images
+        app.config['SIMILAIRES_NOMBRE'] = 4  # articles liés précalculés par article
+        app.config['FLUX_DOSSIER'] = os.path.join(app.instance_path, 'flux')  # feed.xml et sitemap.xml construits à l'avance
+        app.config['FLUX_AUTEUR'] = os.environ.get('ROBOTBLOG_AUTEUR', 'RobotJournal')  # <author> des flux Atom, obligatoire
+        app.config['MESURES_ACTIVES'] = os.environ.get('ROBOTBLOG_MESURES') == '1'  # histogrammes servis par /admin/metrics
+        app.config['MESURES_SEUIL_LENT'] = 1.0  # secondes ; requêtes plus lentes journalisées, 0 = jamais
+        app.config['MESURES_JETON'] = os.environ.get('ROBOTBLOG_MESURES_JETON')  # Authorization: Bearer pour Prometheus
+        app.config['MESURES_PROFILS'] = os.path.join(app.instance_path, 'profils')  # profils des requêtes ?profiler=1
+        app.config['STATIQUES_EMPREINTES'] = True  # CSS et polices par URL empreintée (flask construire-statiques)
+        app.config['STATIQUES_EXIGEES'] = os.environ.get('ROBOTBLOG_STATIQUES_EXIGEES') == '1'  # le worker refuse de démarrer sans CSS construites (polices absentes : simple avertissement)
+        app.config['COMPRESSION_ACTIVE'] = True  # gzip des réponses HTML/XML/JSON si le client l'accepte
+        app.config['COMPRESSION_NIVEAU'] = 6  # 1 (rapide) à 9 (compact)
+        app.config['COMPRESSION_TAILLE_MIN'] = 500  # octets ; en dessous, la compression ne rapporte rien
+        app.config['GABARITS_CACHE_DOSSIER'] = os.environ.get('ROBOTBLOG_GABARITS_CACHE', os.path.join(app.instance_path, 'gabarits'))  # bytecode Jinja partagé par les workers ; '' = désactivé
+        app.config['PRECHAUFFAGE'] = os.environ.get('ROBOTBLOG_PRECHAUFFAGE') == '1'  # preparer_worker() compile, connecte et rend avant la première requête
+        app.config['PRECHAUFFAGE_PAGES'] = ('/', '/journal')  # pages rendues d'avance ; pas d'article, qui compterait une vue
+        app.config['PRECHAUFFAGE_CONNEXIONS'] = 2  # connexions ouvertes d'avance par moteur (dans la limite du pool)
+        app.config['PRECHAUFFAGE_URL_BASE'] = os.environ.get('ROBOTBLOG_URL_BASE', 'http://localhost/')  # hôte des pages mises en cache
+        app.config.update(config or {})
+
+    with demarrage.phase('extensions'):
+        demarrage.init_app(app)
+        base_donnees.configurer(app)
+        db.init_app(app)
+        base_donnees.installer(app, db)
+        cache_pages.stockage = (
+            CacheFichiers(app.config['CACHE_PAGES_DOSSIER'], app.config['CACHE_PAGES_TAILLE'], app.config['CACHE_PAGES_TTL'])
+            if app.config['CACHE_PAGES_DOSSIER'] else
+            CacheMemoire(app.config['CACHE_PAGES_TAILLE'], app.config['CACHE_PAGES_TTL']))
+        mesures.init_app(app)
+        statiques.init_app(app)
+        compteur_vues.init_app(app)
+        app.extensions['version_gabarits'] = _version_gabarits(app)
+
+    with demarrage.phase('routes'):
+        for regle, vue, options in ROUTES:
+            app.add_url_rule(regle, view_func=vue, **options)
+        for regle, nom, methodes in ROUTES_ADMIN:
+            app.add_url_rule(regle, nom, VueParesseuse(f'admin.{nom}'), methods=methodes)
+        app.after_request(cache_uploads)
+        app.add_template_global(image_responsive)
+        app.add_template_filter(date_fr)
+        app.add_template_filter(taille_fichier)
+        for commande in cli.commands.values():
+            app.cli.add_command(commande)
+    return app
+
+def preparer_worker(app, prechauffer=None):
+    """Prépare pour un worker WSGI une application de create_app() et la retourne (voir wsgi.py).
+
+    Vérifie les statiques, fait si PRECHAUFFAGE le travail d'une première
+    requête, et journalise la durée de chaque phase.
+    """
+    if app.config['STATIQUES_EXIGEES']:
+        feuilles = statiques.manquants(polices=False)
+        if feuilles:
+            raise RuntimeError(f"Statiques non construites ({', '.join(feuilles)}) : "
+                               "lancez `flask --app app construire-statiques` avant de démarrer")
+        polices_absentes = sorted(set(statiques.manquants()) - set(feuilles))
+        if polices_absentes:
+            app.logger.warning('Polices absentes, remplacées par une police système : %s',
+                               ', '.join(polices_absentes))
+    if prechauffer is None:
+        prechauffer = app.config['PRECHAUFFAGE']
+    if prechauffer:
+        with demarrage.phase('gabarits'):
+            demarrage.compiler_gabarits(app)
+        with demarrage.phase('connexions'):
+            demarrage.ouvrir_connexions(app, db, app.config['PRECHAUFFAGE_CONNEXIONS'])
+        with demarrage.phase('pages'):
+            statuts = demarrage.rendre_pages(app, app.config['PRECHAUFFAGE_PAGES'], app.config['PRECHAUFFAGE_URL_BASE'])
+        for url, statut in statuts.items():
+            if statut != 200:
+                app.logger.warning('Préchauffage : %s a répondu %s', url, statut)
+    app.logger.info('Worker %s prêt en %s', os.getpid(), demarrage.rapport())
+    return app
+
 if __name__ == '__main__':
+    # admin.py fait « from app import … » : sans cet alias, il chargerait une seconde copie de ce module
+    sys.modules.setdefault('app', sys.modules[__name__])
+    app = create_app()
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     with app.app_context():
-        db.create_all()
+        init_db()
         # Données de démo si la DB est vide
         if Article.query.count() == 0:
             demo = Article(
@@ -434,6 +1509,7 @@ if __name__ == '__main__':
                 date_publication=datetime.utcnow(),
             )
             db.session.add(demo)
+            demo.preparer()
 
             etapes = [
                 Timeline(titre="Lancement du projet", description="Définition des objectifs et recherche documentaire", statut="complete", icone="🚀", date_event=datetime(2024,1,1)),
@@ -0,0 +1,389 @@
+"""Import et export d'articles en fichiers Markdown ou HTML à en-tête.
+
+    flask --app app importer-articles SOURCE [--ignorer-existants] [--url-base https://mon-blog.fr/]
+    flask --app app exporter-articles DESTINATION
+
+Un article est un fichier .md ou .html précédé d'un en-tête « clé: valeur » :
+
+    ---
+    titre: Jour 12 – Calibration des servos
+    jour: 12
+    categorie: mecanique
+    tags: servomoteur, calibration
+    date_publication: 2024-03-02T10:00:00
+    image_couverture: medias/servo.jpg
+    ---
+    <p>Corps de l'article…</p>
+
+La source de l'import est un dossier ou une archive .zip / .tar.gz. Les
+fichiers qu'un article cite par un chemin relatif (images du corps,
+couverture) sont copiés dans les uploads en parallèle et les liens réécrits.
+Les articles sont lus et insérés par lots, une transaction par lot, avec les
+champs dérivés, les tags et l'index de recherche ; les slugs sont résolus
+contre l'ensemble des slugs existants, chargé une fois. Les articles liés
+sont mis à jour une seule fois, à la fin.
+
+L'export écrit le même format (un .html par article, ses fichiers dans
+medias/), dans un dossier ou une archive .zip produite au fil de l'eau, ce
+qui permet de l'envoyer en réponse HTTP sans la construire d'abord.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import unquote
+import os
+import re
+import tarfile
+import tempfile
+import zipfile
+
+from flask import current_app
+
+from app import (db, Article, Media, Tag, article_tag, allowed_file, images, stockage, similaires,
+                 traiter_variantes, preparer_contenu, normaliser_tags, slugify, slug_libre,
+                 index_recherche_actif, _indexer, recalculer_similaires, actualiser_similaires)
+from contenu import markdown_en_html
+
+LOT = 200  # articles par transaction
+MEDIAS_WORKERS = 4  # copies de fichiers en parallèle
+ACTUALISATION_MAX = 10  # au-delà, les articles liés sont tous recalculés d'un coup
+DOSSIER_MEDIAS = 'medias'
+EXTENSIONS = {'.md': 'markdown', '.markdown': 'markdown', '.html': 'html', '.htm': 'html'}
+CHAMPS = ('titre', 'slug', 'jour', 'categorie', 'tags', 'publie', 'date_creation', 'date_publication',
+          'date_modification', 'resume', 'image_couverture')
+VRAI = {'oui', 'true', 'vrai', 'yes', '1'}
+
+_ENTETE = re.compile(r'﻿?---[ \t]*\r?\n(.*?)\r?\n---[ \t]*(?:\r?\n|$)', re.S)
+_REFERENCE = re.compile(r'''(\b(?:src|href|poster)\s*=\s*)(["'])([^"']+)\2''', re.I)
+_UPLOAD = re.compile(r'''/static/uploads/([^"'\s?#)]+)''')
+
+
+class ErreurImport(ValueError):
+    pass
+
+
+# ─── Format ───
+def lire_entete(texte):
+    """(champs, corps) d'un fichier ; sans en-tête, champs est vide."""
+    m = _ENTETE.match(texte)
+    if not m:
+        return {}, texte.lstrip('﻿')
+    champs = {}
+    for ligne in m.group(1).splitlines():
+        cle, separateur, valeur = ligne.partition(':')
+        if not separateur or ligne.lstrip().startswith('#'):
+            continue
+        valeur = valeur.strip()
+        if len(valeur) >= 2 and valeur[0] == valeur[-1] and valeur[0] in '"\'':
+            valeur = valeur[1:-1]
+        elif valeur.startswith('[') and valeur.endswith(']'):  # liste YAML sur une ligne
+            valeur = ', '.join(v.strip(' "\'') for v in valeur[1:-1].split(','))
+        champs[cle.strip().lower()] = valeur
+    return champs, texte[m.end():]
+
+
+def ecrire_entete(champs):
+    lignes = ['---']
+    for cle in CHAMPS:
+        valeur = champs.get(cle)
+        if valeur is None or valeur == '':
+            continue
+        if isinstance(valeur, bool):
+            valeur = 'oui' if valeur else 'non'
+        elif isinstance(valeur, datetime):
+            valeur = valeur.isoformat(timespec='seconds')
+        valeur = ' '.join(str(valeur).split())
+        if valeur[0] in '"\'[' or valeur[-1] in '"\'':
+            valeur = f'"{valeur}"'
+        lignes.append(f'{cle}: {valeur}')
+    return '\n'.join(lignes + ['---', ''])
+
+
+def _date(valeur):
+    if not valeur:
+        return None
+    date = datetime.fromisoformat(valeur.replace('Z', '+00:00'))
+    # Les dates sont stockées en UTC naïf, comme datetime.utcnow()
+    return date.astimezone(timezone.utc).replace(tzinfo=None) if date.tzinfo else date
+
+
+def _champs_article(champs, corps, format_source):
+    titre = ' '.join(champs.get('titre', '').split())[:200]
+    if not titre:
+        raise ErreurImport('titre manquant')
+    try:
+        jour = int(champs['jour']) if champs.get('jour') else None
+        dates = {c: _date(champs.get(c)) for c in ('date_creation', 'date_publication', 'date_modification')}
+    except ValueError as e:
+        raise ErreurImport(str(e)) from None
+    publie = champs['publie'].lower() in VRAI if champs.get('publie') else True
+    creation = dates['date_creation'] or dates['date_publication'] or datetime.utcnow()
+    publication = (dates['date_publication'] or creation) if publie else dates['date_publication']
+    return {
+        'titre': titre,
+        'slug': (slugify(champs.get('slug') or titre) or 'article')[:220],
+        'contenu': markdown_en_html(corps) if format_source == 'markdown' else corps.strip(),
+        'resume': ' '.join(champs.get('resume', '').split())[:500],
+        'image_couverture': champs.get('image_couverture') or None,
+        'categorie': champs.get('categorie') or 'journal',
+        'jour': jour,
+        'tags': champs.get('tags', ''),
+        'publie': publie,
+        'date_creation': creation,
+        'date_publication': publication,
+        'date_modification': dates['date_modification'] or publication or creation,
+        'vues': 0,
+    }
+
+
+# ─── Import ───
+@contextmanager
+def _ouvrir(source):
+    """Dossier de la source ; une archive est d'abord extraite dans un dossier temporaire."""
+    if os.path.isdir(source):
+        yield source
+        return
+    with tempfile.TemporaryDirectory(prefix='robotblog-import-') as dossier:
+        if zipfile.is_zipfile(source):
+            with zipfile.ZipFile(source) as archive:
+                archive.extractall(dossier)
+        elif tarfile.is_tarfile(source):
+            with tarfile.open(source) as archive:
+                archive.extractall(dossier, filter='data')
+        else:
+            raise ErreurImport(f'{source} : dossier, archive .zip ou .tar.gz attendu')
+        yield dossier
+
+
+def _fichiers(racine):
+    for dossier, sous_dossiers, noms in os.walk(racine):
+        sous_dossiers[:] = sorted(d for d in sous_dossiers if not d.startswith(('.', '__')))
+        for nom in sorted(noms):
+            if os.path.splitext(nom)[1].lower() in EXTENSIONS and not nom.startswith('.'):
+                yield os.path.join(dossier, nom)
+
+
+def _lire(racine, chemin):
+    """(champs d'article, {référence relative: chemin du fichier cité})."""
+    with open(chemin, encoding='utf-8') as f:
+        champs, corps = lire_entete(f.read())
+    article = _champs_article(champs, corps, EXTENSIONS[os.path.splitext(chemin)[1].lower()])
+    fichiers = {}
+    references = [m.group(3) for m in _REFERENCE.finditer(article['contenu'])]
+    if article['image_couverture']:
+        references.append(article['image_couverture'])
+    for reference in references:
+        if re.match(r'^([a-z][a-z0-9+.-]*:|/|#)', reference, re.I) or not allowed_file(reference):
+            continue
+        cible = os.path.normpath(os.path.join(os.path.dirname(chemin), unquote(reference)))
+        if os.path.commonpath([racine, cible]) == racine and os.path.isfile(cible):
+            fichiers[reference] = cible
+    return article, fichiers
+
+
+def _copier(chemin):
+    ext = chemin.rsplit('.', 1)[1].lower()
+    with open(chemin, 'rb') as f:
+        return stockage.stocker_flux(current_app.config['UPLOAD_FOLDER'], f, ext)
+
+
+def _ranger_medias(conn, chemins, copies, pool):
+    """Copie les fichiers pas encore importés et crée leurs lignes Media ; retourne les ids à traiter."""
+    nouveaux = sorted(set(chemins) - copies.keys())
+    if not nouveaux:
+        return []
+    stockes = dict(zip(nouveaux, pool.map(_copier, nouveaux)))
+    connus = dict(conn.execute(db.select(Media.empreinte, Media.nom_fichier).where(
+        Media.empreinte.in_({empreinte for _, empreinte, _ in stockes.values()}))).all())
+    dossier = current_app.config['UPLOAD_FOLDER']
+    lignes = {}
+    for chemin, (nom_fichier, empreinte, taille) in stockes.items():
+        existant = connus.get(empreinte)
+        if existant and os.path.exists(os.path.join(dossier, existant)):
+            # Contenu déjà connu, parfois sous un ancien nom horodaté : on réutilise ce fichier
+            if existant != nom_fichier and not conn.execute(db.select(Media.id).where(
+                    Media.nom_fichier == nom_fichier).limit(1)).first():
+                os.remove(os.path.join(dossier, nom_fichier))
+            copies[chemin] = existant
+            continue
+        copies[chemin] = nom_fichier
+        ext = nom_fichier.rsplit('.', 1)[1].lower()
+        lignes.setdefault(empreinte, {
+            'nom_fichier': nom_fichier, 'nom_original': os.path.basename(chemin), 'taille': taille,
+            'type_media': 'image' if ext in {'png', 'jpg', 'jpeg', 'gif', 'webp'} else 'video' if ext == 'mp4' else 'pdf',
+            'empreinte': empreinte, 'date_upload': datetime.utcnow(),
+        })
+    if not lignes:
+        return []
+    crees = conn.execute(db.insert(Media).returning(Media.id, Media.nom_fichier, sort_by_parameter_order=True),
+                         list(lignes.values())).all()
+    return [id for id, nom in crees if images.traitable(nom)]
+
+
+def _reecrire(article, fichiers, copies):
+    def remplacer(m):
+        if m.group(3) not in fichiers:
+            return m.group(0)
+        return f'{m.group(1)}{m.group(2)}/static/uploads/{copies[fichiers[m.group(3)]]}{m.group(2)}'
+    article['contenu'] = _REFERENCE.sub(remplacer, article['contenu'])
+    if article['image_couverture'] in fichiers:
+        article['image_couverture'] = copies[fichiers[article['image_couverture']]]
+
+
+def _inserer(conn, lot, index_actif):
+    """Insère un lot d'articles, leurs tags et leur entrée d'index ; comme preparer_articles()."""
+    lignes, noms_lot = [], []
+    for article in lot:
+        derives = preparer_contenu(article['contenu'], article['resume'])
+        noms = normaliser_tags(article['tags'])
+        article['tags'] = ', '.join(noms)
+        lignes.append({**article, 'termes': similaires.termes(article['titre'], article['tags'], derives['texte']),
+                       **{champ: derives[champ] for champ in Article.CHAMPS_DERIVES}})
+        noms_lot.append(noms)
+    ids = conn.execute(db.insert(Article).returning(Article.id, sort_by_parameter_order=True), lignes).scalars().all()
+    # Tags résolus à chaque lot, dans sa transaction : ceux que l'admin crée
+    # pendant un long import sont relus au lieu d'être insérés en double
+    tags = Tag.identifiants(conn, [nom for noms in noms_lot for nom in noms])
+    liens = []
+    for id, article, noms in zip(ids, lot, noms_lot):
+        liens.extend({'article_id': id, 'tag_id': tags[slugify(nom)]} for nom in noms)
+        if index_actif:
+            _indexer(conn, id, article['titre'], article['contenu'], article['tags'])
+    if liens:
+        conn.execute(article_tag.insert(), liens)
+    return ids
+
+
+def importer(source, ignorer_existants=False, afficher=print):
+    """Importe les articles de source ; retourne un bilan chiffré.
+
+    Un slug déjà pris reçoit un suffixe -N, comme dans l'admin ; avec
+    ignorer_existants, un fichier dont le slug existe déjà est sauté (pour
+    rejouer un import interrompu).
+    """
+    bilan = {'importes': 0, 'ignores': 0, 'medias': 0, 'erreurs': [], 'categories': set()}
+    with db.engine.connect() as conn:
+        pris = set(conn.execute(db.select(Article.slug)).scalars())
+    copies, a_traiter, ids = {}, [], []
+
+    def inserer(lot):
+        with db.engine.begin() as conn:
+            cites = {chemin for _, fichiers in lot for chemin in fichiers.values()}
+            a_traiter.extend(_ranger_medias(conn, cites, copies, pool))
+            for article, fichiers in lot:
+                _reecrire(article, fichiers, copies)
+            ids.extend(_inserer(conn, [article for article, _ in lot], index_recherche_actif(conn)))
+        bilan['importes'] += len(lot)
+        bilan['categories'].update(article['categorie'] for article, _ in lot if article['publie'])
+        afficher(f"  {bilan['importes']} article(s) importé(s)")
+
+    with _ouvrir(source) as racine, ThreadPoolExecutor(MEDIAS_WORKERS) as pool:
+        racine = os.path.abspath(racine)
+        lot = []
+        for chemin in _fichiers(racine):
+            try:
+                article, fichiers = _lire(racine, chemin)
+            except (ErreurImport, UnicodeDecodeError) as e:
+                bilan['erreurs'].append((os.path.relpath(chemin, racine), str(e)))
+                continue
+            if ignorer_existants and article['slug'] in pris:
+                bilan['ignores'] += 1
+                continue
+            article['slug'] = slug_libre(article['slug'], pris)
+            pris.add(article['slug'])
+            lot.append((article, fichiers))
+            if len(lot) >= LOT:
+                inserer(lot)
+                lot = []
+        if lot:
+            inserer(lot)
+
+    bilan['medias'] = len(set(copies.values()))
+    if len(ids) > ACTUALISATION_MAX:
+        with db.engine.begin() as conn:
+            recalculer_similaires(conn)
+    else:
+        for id in ids:
+            actualiser_similaires(id)
+    for id in a_traiter:
+        images.en_arriere_plan(traiter_variantes, current_app._get_current_object(), id,
+                               workers=current_app.config['IMAGES_WORKERS'])
+    return bilan
+
+
+# ─── Export ───
+def entrees():
+    """(chemin dans l'export, texte ou chemin du fichier à copier), article après article."""
+    dossier_uploads = current_app.config['UPLOAD_FOLDER']
+    vus = set()
+    requete = db.select(*(getattr(Article, c) for c in CHAMPS), Article.contenu)\
+        .order_by(Article.id).execution_options(yield_per=LOT)
+    for ligne in db.session.execute(requete):
+        champs = dict(zip(CHAMPS, ligne))
+        medias = set(_UPLOAD.findall(ligne.contenu))
+        if champs['image_couverture']:
+            medias.add(champs['image_couverture'])
+            champs['image_couverture'] = f"{DOSSIER_MEDIAS}/{champs['image_couverture']}"
+        corps = _UPLOAD.sub(lambda m: f'{DOSSIER_MEDIAS}/{m.group(1)}', ligne.contenu or '')
+        yield f"{champs['slug']}.html", ecrire_entete(champs) + corps + '\n'
+        for nom in sorted(medias - vus):
+            vus.add(nom)
+            chemin = os.path.join(dossier_uploads, *nom.split('/'))
+            if os.path.isfile(chemin):
+                yield f'{DOSSIER_MEDIAS}/{nom}', chemin
+
+
+def exporter_dossier(dossier):
+    """Écrit l'export dans dossier ; retourne (articles, fichiers copiés)."""
+    articles = medias = 0
+    for nom, contenu in entrees():
+        cible = os.path.join(dossier, *nom.split('/'))
+        os.makedirs(os.path.dirname(cible), exist_ok=True)
+        if nom.startswith(DOSSIER_MEDIAS + '/'):
+            with open(contenu, 'rb') as source, open(cible, 'wb') as sortie:
+                stockage.copier_par_blocs(source, sortie)
+            medias += 1
+        else:
+            with open(cible, 'w', encoding='utf-8') as f:
+                f.write(contenu)
+            articles += 1
+    return articles, medias
+
+
+class _Tampon:
+    """Fichier en écriture seule dont on retire le contenu au fur et à mesure."""
+    def __init__(self):
+        self.morceaux = []
+
+    def write(self, donnees):
+        self.morceaux.append(bytes(donnees))
+        return len(donnees)
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        donnees, self.morceaux = b''.join(self.morceaux), []
+        return donnees
+
+
+def flux_zip():
+    """L'export en archive .zip, morceau par morceau : jamais plus d'un bloc en mémoire."""
+    tampon = _Tampon()
+    # Sortie non repositionnable : zipfile écrit tailles et CRC après chaque fichier
+    with zipfile.ZipFile(tampon, 'w') as archive:
+        for nom, contenu in entrees():
+            if nom.startswith(DOSSIER_MEDIAS + '/'):
+                # Images et vidéos sont déjà compressées
+                info = zipfile.ZipInfo.from_file(contenu, nom)
+                info.compress_type = zipfile.ZIP_STORED
+                with open(contenu, 'rb') as source, archive.open(info, 'w', force_zip64=True) as sortie:
+                    for bloc in iter(lambda: source.read(stockage.TAILLE_BLOC), b''):
+                        sortie.write(bloc)
+                        yield tampon.vider()
+            else:
+                info = zipfile.ZipInfo(nom, datetime.utcnow().timetuple()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, contenu.encode('utf-8'))
+            yield tampon.vider()
+    yield tampon.vider()
@@ -0,0 +1,81 @@
+"""Audit des plans d'exécution des pages publiques.
+
+    flask --app app audit-requetes
+
+Chaque page publique est appelée avec le client de test, cache des pages
+coupé ; toutes les requêtes SELECT émises sont capturées puis passées à
+EXPLAIN QUERY PLAN. Une requête échoue l'audit si SQLite parcourt une table
+sans index (SCAN <table>) ou trie ses résultats dans un B-tree temporaire.
+Seule exception : le classement BM25 de la recherche, calculé par FTS5.
+"""
+import re
+
+from flask import current_app
+
+from app import db, Article, cache_pages, encoder_curseur
+
+TABLES = ('article', 'media', 'ressource', 'timeline')
+_SCAN_SANS_INDEX = re.compile(r'^SCAN (%s)\b(?!.*USING (COVERING )?INDEX)' % '|'.join(TABLES))
+
+
+def _routes():
+    routes = ['/', '/journal', '/journal/page/2', '/categorie/journal',
+              '/categorie/mecanique/page/2', '/timeline', '/ressources', '/recherche?q=robot']
+    art = Article.query.filter_by(publie=True).order_by(Article.jour.desc()).first()
+    if art:
+        routes.append(f'/article/{art.slug}')
+        curseur = encoder_curseur(art, (Article.jour, Article.date_publication, Article.id))
+        routes += [f'/journal?apres={curseur}', f'/journal?avant={curseur}']
+    return routes
+
+
+def _problemes(sql, plan):
+    problemes = [ligne for ligne in plan if _SCAN_SANS_INDEX.match(ligne)]
+    if 'article_fts' not in sql:
+        problemes += [ligne for ligne in plan if ligne.startswith('USE TEMP B-TREE')]
+    return problemes
+
+
+def auditer(afficher=print):
+    """Retourne True si toutes les requêtes des pages publiques utilisent un index."""
+    app = current_app._get_current_object()
+    if db.engine.dialect.name != 'sqlite':
+        afficher('Audit disponible uniquement pour SQLite.')
+        return True
+    capturees = []
+
+    def capturer(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and 'sqlite_master' not in statement:
+            capturees.append((statement, parameters))
+
+    cache_actif, cache_pages.actif = cache_pages.actif, False
+    ok = True
+    try:
+        with app.app_context():
+            routes = _routes()
+            db.event.listen(db.engine, 'before_cursor_execute', capturer)
+            try:
+                client = app.test_client()
+                requetes = {}
+                for route in routes:
+                    capturees.clear()
+                    client.get(route)
+                    requetes[route] = list(capturees)
+            finally:
+                db.event.remove(db.engine, 'before_cursor_execute', capturer)
+
+            with db.engine.connect() as conn:
+                for route, liste in requetes.items():
+                    afficher(f'{route}')
+                    for sql, parametres in liste:
+                        plan = [ligne[-1] for ligne in
+                                conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, parametres)]
+                        problemes = _problemes(sql, plan)
+                        ok = ok and not problemes
+                        afficher(f"  {'ÉCHEC' if problemes else 'ok   '} {' '.join(sql.split())[:90]}")
+                        for ligne in plan:
+                            afficher(f'        {ligne}')
+    finally:
+        cache_pages.actif = cache_actif
+    afficher('Audit réussi.' if ok else 'Audit en échec : requêtes sans index.')
+    return ok
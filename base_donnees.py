@@ -0,0 +1,115 @@
+"""Profils de connexion à la base : pragmas SQLite, pool et moteur de lecture.
+
+Le profil (BASE_PROFIL) règle chaque moteur SQLAlchemy. Sur SQLite, toute
+nouvelle connexion reçoit ses pragmas : journal WAL, où lecteurs et écrivain
+ne se bloquent plus ; busy_timeout, pour qu'une écriture attende le verrou au
+lieu d'échouer aussitôt sur « database is locked » ; synchronous=NORMAL, sûr
+en WAL ; tailles du cache de pages et du mmap. Les autres bases (PostgreSQL :
+postgresql://... dans ROBOTBLOG_DATABASE_URI) ne reçoivent que les réglages
+du pool, propre à chaque worker.
+
+Avec BASE_LECTURE, les SELECT des requêtes GET anonymes passent par un second
+moteur : une réplique en lecture, ou le même fichier SQLite, ouvert en
+query_only avec son propre pool. Les écritures, et tout ce que fait un
+administrateur, restent sur le moteur principal.
+"""
+from functools import partial
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+
+LECTURE = 'lecture'  # clé du moteur de lecture dans SQLALCHEMY_BINDS
+
+PROFILS = {
+    'developpement': {
+        'pragmas': {'journal_mode': 'wal', 'busy_timeout': 5000, 'synchronous': 'normal'},
+        'pool': {},
+    },
+    'production': {
+        'pragmas': {'journal_mode': 'wal', 'busy_timeout': 15000, 'synchronous': 'normal',
+                    'mmap_size': 256 * 1024 * 1024, 'cache_size': -64000, 'temp_store': 'memory'},
+        'pool': {'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 30,
+                 'pool_recycle': 3600, 'pool_pre_ping': True},
+    },
+}
+
+
+def _en_memoire(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def configurer(app):
+    """Complète la configuration de Flask-SQLAlchemy ; à appeler avant SQLAlchemy(app)."""
+    profil = PROFILS[app.config['BASE_PROFIL']]
+    # Une base SQLite en mémoire a un pool statique, sans réglages de taille
+    if not _en_memoire(app.config['SQLALCHEMY_DATABASE_URI']):
+        options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        for cle, valeur in profil['pool'].items():
+            options.setdefault(cle, valeur)
+    if app.config.get('BASE_LECTURE'):
+        uri = app.config['BASE_LECTURE']
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[LECTURE] = {
+            'url': uri, **({} if _en_memoire(uri) else profil['pool'])}
+
+
+def installer(app, db):
+    """Branche les pragmas sur les moteurs SQLite et le choix du moteur de lecture."""
+    pragmas = PROFILS[app.config['BASE_PROFIL']]['pragmas']
+    with app.app_context():
+        for cle, moteur in db.engines.items():
+            if moteur.dialect.name == 'sqlite':
+                event.listen(moteur, 'connect', partial(_appliquer_pragmas, pragmas, cle == LECTURE))
+        if LECTURE in db.engines:
+            app.before_request(_choisir_moteur)
+
+
+def _appliquer_pragmas(pragmas, lecture_seule, connexion, _):
+    curseur = connexion.cursor()
+    for nom, valeur in pragmas.items():
+        curseur.execute(f'PRAGMA {nom} = {valeur}')
+    if lecture_seule:
+        curseur.execute('PRAGMA query_only = 1')
+    curseur.close()
+
+
+def _choisir_moteur():
+    # Un visiteur qui consulte : ses SELECT peuvent lire une copie un peu en retard
+    # (les fichiers statiques ne lisent pas la session, qui ajouterait Vary: Cookie)
+    g.lecture_seule = (request.method in ('GET', 'HEAD') and request.endpoint != 'static'
+                       and not session.get('admin'))
+
+
+class SessionLecture(Session):
+    """Session qui envoie au moteur de lecture les SELECT des requêtes en lecture seule."""
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and getattr(clause, 'is_select', False)
+                and has_request_context() and g.get('lecture_seule')):
+            moteur = self._db.engines.get(LECTURE)
+            if moteur is not None:
+                return moteur
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def inserer_sans_doublons(connexion, table, lignes, index):
+    """INSERT de lignes qui ignore celles dont index (colonnes uniques) est déjà pris.
+
+    Pour les get-or-create concurrents : la ligne créée entre-temps par une
+    autre requête n'est pas une erreur, il suffit de la relire ensuite.
+    """
+    if not lignes:
+        return
+    dialecte = {'sqlite': sqlite, 'postgresql': postgresql}.get(connexion.dialect.name)
+    if dialecte is not None:
+        connexion.execute(dialecte.insert(table).on_conflict_do_nothing(index_elements=index), lignes)
+        return
+    for ligne in lignes:
+        try:
+            with connexion.begin_nested():
+                connexion.execute(table.insert(), ligne)
+        except IntegrityError:
+            pass
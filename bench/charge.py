@@ -0,0 +1,371 @@
+"""Test de charge de toutes les routes, publiques et d'administration.
+
+    python bench/charge.py [--articles 1000] [--base URI] [--requetes 200] [--threads 1]
+                           [--serveur] [--sans-cache] [--sortie res.json] [--comparer ancien.json]
+
+Sans --base, une base SQLite temporaire est remplie par bench/donnees.py.
+Chaque route est appelée --requetes fois (--ecritures pour les POST, qui
+modifient la base) par le client de test Flask, ou avec --serveur par HTTP
+sur un serveur WSGI local. Résultat, en JSON : débit, latences p50/p95/p99,
+requêtes SQL par appel et pic de mémoire allouée (tracemalloc, sur une passe
+séparée pour ne pas fausser les latences), par route. --comparer affiche
+l'écart avec un résultat précédent.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.parse
+import urllib.request
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.cookiejar import CookieJar
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+# Une image JPEG minimale pour les uploads
+JPEG = bytes.fromhex(
+    'ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909080a0c140d0c0b0b0c1912'
+    '130f141d1a1f1e1d1a1c1c20242e2720222c231c1c2837292c30313434341f27393d38323c2e333432ffc0000b080001'
+    '000101011100ffc4001f0000010501010101010100000000000000000102030405060708090a0bffc400b5100002010303'
+    '020403050504040000017d01020300041105122131410613516107227114328191a1082342b1c11552d1f02433627282'
+    '090a161718191a25262728292a3435363738393a434445464748494a535455565758595a636465666768696a7374757677'
+    '78797a838485868788898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3c4c5c6c7c8c9cad2'
+    'd3d4d5d6d7d8d9dae1e2e3e4e5e6e7e8e9eaf1f2f3f4f5f6f7f8f9faffda0008010100003f00fbd3ffd9')
+
+
+def _percentile(valeurs, p):
+    return valeurs[max(0, min(len(valeurs) - 1, math.ceil(p / 100 * len(valeurs)) - 1))]
+
+
+class ClientTest:
+    """Client de test Flask, un par thread : anonyme, ou connecté en admin
+    (les pages ne sont servies depuis le cache qu'aux visiteurs anonymes)."""
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def _client(self, admin):
+        clients = self._local.__dict__.setdefault('clients', {})
+        if admin not in clients:
+            clients[admin] = self.app.test_client()
+            if admin:
+                with clients[admin].session_transaction() as s:
+                    s['admin'] = True
+        return clients[admin]
+
+    def appeler(self, methode, chemin, donnees=None, fichiers=None, json_=None, entetes=None, admin=False):
+        if fichiers:
+            donnees = {**(donnees or {}), **{nom: (io.BytesIO(contenu), nom_fichier)
+                                             for nom, (nom_fichier, contenu) in fichiers.items()}}
+        r = self._client(admin).open(chemin, method=methode, data=donnees, json=json_, headers=entetes)
+        return r.status_code, r.get_data()
+
+
+class ClientHTTP:
+    """Même interface, par HTTP sur un serveur WSGI local (threadé)."""
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        self.serveur = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=self.serveur.serve_forever, daemon=True).start()
+        self.base = f'http://127.0.0.1:{self.serveur.server_port}'
+        self._local = threading.local()
+
+    class _SansRedirection(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    def _ouvreur(self, admin):
+        ouvreurs = self._local.__dict__.setdefault('ouvreurs', {})
+        if admin not in ouvreurs:
+            ouvreurs[admin] = urllib.request.build_opener(
+                urllib.request.HTTPCookieProcessor(CookieJar()), self._SansRedirection)
+            if admin:
+                try:
+                    ouvreurs[admin].open(urllib.request.Request(
+                        self.base + '/admin/login', method='POST',
+                        data=urllib.parse.urlencode({'username': 'admin', 'password': 'robot2024'}).encode()))
+                except urllib.error.HTTPError:  # 302 vers le tableau de bord, cookie posé
+                    pass
+        return ouvreurs[admin]
+
+    def appeler(self, methode, chemin, donnees=None, fichiers=None, json_=None, entetes=None, admin=False):
+        entetes = dict(entetes or {})
+        corps = donnees
+        if fichiers:
+            limite = 'bench' + os.urandom(8).hex()
+            parties = [f'--{limite}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode()
+                       for k, v in (donnees or {}).items()]
+            for nom, (nom_fichier, contenu) in fichiers.items():
+                parties.append(f'--{limite}\r\nContent-Disposition: form-data; name="{nom}"; '
+                               f'filename="{nom_fichier}"\r\n\r\n'.encode() + contenu + b'\r\n')
+            corps = b''.join(parties) + f'--{limite}--\r\n'.encode()
+            entetes['Content-Type'] = f'multipart/form-data; boundary={limite}'
+        elif json_ is not None:
+            corps = json.dumps(json_).encode()
+            entetes['Content-Type'] = 'application/json'
+        elif isinstance(donnees, dict):
+            corps = urllib.parse.urlencode(donnees).encode()
+        requete = urllib.request.Request(self.base + chemin, data=corps, method=methode, headers=entetes)
+        try:
+            with self._ouvreur(admin).open(requete) as r:
+                return r.status, r.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def scenarios(app):
+    """[(nom, méthode, fonction i -> (chemin, options d'appel), statuts attendus, écriture)]."""
+    from app import db, Article, Timeline, Ressource, Media, encoder_curseur
+    with app.app_context():
+        publies = db.session.execute(db.select(Article.id, Article.slug).where(Article.publie==True)
+                                     .order_by(Article.id).limit(500)).all()
+        art = db.session.execute(db.select(Article).where(Article.publie==True, Article.jour.isnot(None))
+                                 .order_by(Article.jour.desc()).offset(9)).scalars().first()
+        curseur = encoder_curseur(art, (Article.jour, Article.date_publication, Article.id)) if art else ''
+    slugs = [s for _, s in publies] or ['inexistant']
+    ids = [i for i, _ in publies] or [1]
+    mots = ['robot', 'servomoteur', 'équilibre', 'caméra', 'kalman', 'batterie lipo', 'marche bipède']
+
+    def formulaire(i):
+        return {'titre': f'Article de charge {i}', 'contenu': '<h2>Test</h2><p>' + 'mesure ' * 300 + '</p>',
+                'resume': '', 'categorie': 'tests', 'tags': 'charge, test', 'publie': 'on'}
+
+    def nouvel_article(i):
+        return '/admin/article/nouveau', {'donnees': formulaire(i)}
+
+    def supprimer_article(i):
+        with app.app_context():
+            id = db.session.scalar(db.select(Article.id).where(Article.titre.like('Article de charge %'))
+                                   .order_by(Article.id.desc()))
+        return f'/admin/article/{id or 0}/supprimer', {}
+
+    def dernier(modele, **filtre):
+        with app.app_context():
+            return db.session.scalar(db.select(modele.id).filter_by(**filtre).order_by(modele.id.desc())) or 0
+
+    def creer_televersement(i):
+        return '/admin/medias/televersements', {'json_': {'nom': f'charge-{i}.jpg', 'taille': len(JPEG)}}
+
+    def envoyer_morceau(i):
+        # Le téléversement à compléter est créé par executer(), juste avant le PUT
+        return '/admin/medias/televersements/<id>', {}
+
+    def archive(i):
+        tampon = io.BytesIO()
+        with zipfile.ZipFile(tampon, 'w') as z:
+            z.writestr(f'charge-{i}.md', f'---\ntitre: Article de charge importé {i}\ncategorie: tests\n'
+                                         f'tags: charge\n---\n## Test\n\n' + 'mesure ' * 300)
+        return '/admin/articles/import', {'fichiers': {'archive': (f'charge-{i}.zip', tampon.getvalue())}}
+
+    lecture, ecriture = {200}, {302}
+    return [
+        ('index', 'GET', lambda i: ('/', {}), lecture, False),
+        ('journal', 'GET', lambda i: ('/journal', {}), lecture, False),
+        ('journal_curseur', 'GET', lambda i: (f'/journal?apres={curseur}', {}), lecture, False),
+        ('journal_page', 'GET', lambda i: ('/journal/page/5', {}), lecture, False),
+        ('categorie', 'GET', lambda i: ('/categorie/mecanique', {}), lecture, False),
+        ('categorie_page', 'GET', lambda i: ('/categorie/mecanique/page/3', {}), lecture, False),
+        ('article', 'GET', lambda i: (f'/article/{slugs[i % len(slugs)]}', {}), lecture, False),
+        ('recherche', 'GET', lambda i: ('/recherche?' + urllib.parse.urlencode({'q': mots[i % len(mots)]}), {}), lecture, False),
+        ('timeline', 'GET', lambda i: ('/timeline', {}), lecture, False),
+        ('ressources', 'GET', lambda i: ('/ressources', {}), lecture, False),
+        ('a_propos', 'GET', lambda i: ('/a-propos', {}), lecture, False),
+        ('flux_atom', 'GET', lambda i: ('/feed.xml', {}), lecture, False),
+        ('flux_atom_categorie', 'GET', lambda i: ('/categorie/mecanique/feed.xml', {}), lecture, False),
+        ('sitemap', 'GET', lambda i: ('/sitemap.xml', {}), lecture, False),
+        ('admin_login', 'GET', lambda i: ('/admin/login', {}), lecture, False),
+        ('admin_dashboard', 'GET', lambda i: ('/admin', {}), lecture, False),
+        ('admin_articles', 'GET', lambda i: ('/admin/articles', {}), lecture, False),
+        ('admin_articles_filtres', 'GET', lambda i: ('/admin/articles?q=jour&statut=publie&page=2', {}), lecture, False),
+        ('admin_exporter_articles', 'GET', lambda i: ('/admin/articles/export.zip', {}), lecture, False),
+        ('admin_modifier_article', 'GET', lambda i: (f'/admin/article/{ids[i % len(ids)]}/modifier', {}), lecture, False),
+        ('admin_nouvel_article', 'GET', lambda i: ('/admin/article/nouveau', {}), lecture, False),
+        ('admin_medias', 'GET', lambda i: ('/admin/medias', {}), lecture, False),
+        ('admin_timeline', 'GET', lambda i: ('/admin/timeline', {}), lecture, False),
+        ('admin_ressources', 'GET', lambda i: ('/admin/ressources', {}), lecture, False),
+        ('admin_cache', 'GET', lambda i: ('/admin/cache', {}), lecture, False),
+        ('admin_metrics', 'GET', lambda i: ('/admin/metrics', {}), {200, 404}, False),
+        ('admin_nouvel_article', 'POST', nouvel_article, ecriture, True),
+        ('admin_modifier_article', 'POST', lambda i: (f'/admin/article/{ids[i % len(ids)]}/modifier',
+                                                      {'donnees': {**formulaire(i), 'titre': f'Modifié {i}'}}), ecriture, True),
+        ('admin_supprimer_article', 'POST', supprimer_article, ecriture, True),
+        ('admin_importer_articles', 'POST', archive, ecriture, True),
+        ('admin_timeline', 'POST', lambda i: ('/admin/timeline', {'donnees': {
+            'titre': f'Étape {i}', 'description': 'charge', 'date_event': '2024-06-01', 'statut': 'planifie'}}), lecture, True),
+        ('admin_supprimer_etape', 'POST', lambda i: (f'/admin/timeline/{dernier(Timeline)}/supprimer', {}), ecriture, True),
+        ('admin_ressources', 'POST', lambda i: ('/admin/ressources', {'donnees': {
+            'titre': f'Ressource {i}', 'url': 'https://exemple.org', 'categorie': 'outils'}}), lecture, True),
+        ('admin_supprimer_ressource', 'POST', lambda i: (f'/admin/ressources/{dernier(Ressource)}/supprimer', {}), ecriture, True),
+        ('admin_medias', 'POST', lambda i: ('/admin/medias', {'fichiers': {'fichier': (f'charge-{i}.jpg', JPEG + i.to_bytes(4, 'big'))}}), lecture, True),
+        ('admin_supprimer_media', 'POST', lambda i: (f'/admin/medias/{dernier(Media, type_media="image")}/supprimer', {}), ecriture, True),
+        ('admin_creer_televersement', 'POST', creer_televersement, {201}, True),
+        ('admin_televersement', 'PUT', envoyer_morceau, {200}, True),
+        ('admin_vider_cache', 'POST', lambda i: ('/admin/cache/vider', {}), ecriture, True),
+        ('admin_logout', 'GET', lambda i: ('/admin/logout', {}), ecriture, True),
+    ]
+
+
+def executer(client, scenario, nb, threads, compter_sql):
+    nom, methode, appel, attendus, _ = scenario
+    chemin_type = appel(0)[0]
+
+    def une(i):
+        if nom == 'admin_televersement':
+            # Chaque PUT complète un téléversement créé juste avant
+            statut, corps = client.appeler('POST', '/admin/medias/televersements', admin=True,
+                                           json_={'nom': f'morceau-{i}.jpg', 'taille': len(JPEG)})
+            id = json.loads(corps)['id']
+            chemin, options = f'/admin/medias/televersements/{id}', {
+                'donnees': JPEG, 'entetes': {'Content-Range': f'bytes 0-{len(JPEG) - 1}/{len(JPEG)}'}}
+        else:
+            chemin, options = appel(i)
+        t0 = time.perf_counter()
+        statut, _ = client.appeler(methode, chemin, admin=nom.startswith('admin_'), **options)
+        return time.perf_counter() - t0, statut
+
+    for i in range(min(3, nb)):  # échauffement : caches, imports paresseux
+        une(nb + i)
+    sql = compter_sql(None)
+    debut = time.perf_counter()
+    if threads > 1:
+        with ThreadPoolExecutor(threads) as pool:
+            resultats = list(pool.map(une, range(nb)))
+    else:
+        resultats = [une(i) for i in range(nb)]
+    duree = time.perf_counter() - debut
+    nb_sql = compter_sql(sql)
+
+    tracemalloc.start()
+    for i in range(min(10, nb)):
+        une(2 * nb + i)
+    pic = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latences = sorted(l for l, _ in resultats)
+    erreurs = sum(1 for _, s in resultats if s not in attendus)
+    return {
+        'route': nom, 'methode': methode, 'chemin': chemin_type,
+        'requetes': nb, 'erreurs': erreurs,
+        'debit_rps': round(nb / duree, 1),
+        'p50_ms': round(_percentile(latences, 50) * 1000, 2),
+        'p95_ms': round(_percentile(latences, 95) * 1000, 2),
+        'p99_ms': round(_percentile(latences, 99) * 1000, 2),
+        'max_ms': round(latences[-1] * 1000, 2),
+        'sql_par_requete': round(nb_sql / nb, 1),
+        'memoire_pic_ko': round(pic / 1024, 1),
+    }
+
+
+def comparer(ancien, nouveau, sortie=sys.stderr):
+    avant = {(r['route'], r['methode']): r for r in ancien['routes']}
+    print(f"{'route':38} {'p95 ms':>18} {'débit req/s':>20} {'mémoire Ko':>18}", file=sortie)
+    for r in nouveau['routes']:
+        a = avant.get((r['route'], r['methode']))
+        if a is None:
+            continue
+        def ecart(cle):
+            return f"{a[cle]:>7} → {r[cle]:<7}" + (f" ({(r[cle] - a[cle]) / a[cle]:+.0%})" if a[cle] else '')
+        print(f"{r['route'] + ' ' + r['methode']:38} {ecart('p95_ms'):>18} {ecart('debit_rps'):>20} "
+              f"{ecart('memoire_pic_ko'):>18}", file=sortie)
+
+
+def _version():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RACINE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--articles', type=int, default=1000, help='taille de la base temporaire')
+    parser.add_argument('--base', help='URI SQLAlchemy d\'une base existante (remplie si vide)')
+    parser.add_argument('--requetes', type=int, default=200, help='appels par route en lecture')
+    parser.add_argument('--ecritures', type=int, default=20, help='appels par route en écriture')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--serveur', action='store_true', help='HTTP sur un serveur WSGI local')
+    parser.add_argument('--sans-cache', action='store_true', help='désactive le cache des pages')
+    parser.add_argument('--routes', help='noms de routes à mesurer, séparés par des virgules')
+    parser.add_argument('--sortie', help='fichier JSON de résultats (sinon stdout)')
+    parser.add_argument('--comparer', help='résultat JSON précédent à comparer')
+    args = parser.parse_args()
+
+    dossier = tempfile.mkdtemp(prefix='robotblog-charge-')
+    os.environ['ROBOTBLOG_DATABASE_URI'] = args.base or 'sqlite:///' + os.path.join(dossier, 'charge.db')
+    from app import create_app, db, Article, cache_pages
+    from donnees import semer
+    # Les écritures (uploads, flux, profils) restent dans le dossier temporaire
+    app = create_app({'FLUX_DOSSIER': os.path.join(dossier, 'flux'),
+                      'MESURES_PROFILS': os.path.join(dossier, 'profils'),
+                      'UPLOAD_FOLDER': os.path.join(dossier, 'uploads')})
+    os.makedirs(app.config['UPLOAD_FOLDER'])
+    with app.app_context():
+        db.create_all()
+        vide = db.session.query(Article.id).first() is None
+    if vide:
+        semer(app, args.articles, afficher=lambda m: print(m, file=sys.stderr))
+    cache_pages.actif = not args.sans_cache
+
+    compteur = {'n': 0}
+    verrou = threading.Lock()
+
+    @db.event.listens_for(db.Engine, 'before_cursor_execute')
+    def _compter(*_):
+        with verrou:
+            compteur['n'] += 1
+
+    def compter_sql(depuis):
+        return compteur['n'] if depuis is None else compteur['n'] - depuis
+
+    client = ClientHTTP(app) if args.serveur else ClientTest(app)
+    choix = set(args.routes.split(',')) if args.routes else None
+    liste = [s for s in scenarios(app) if choix is None or s[0] in choix]
+    routes = []
+    for scenario in liste:
+        nb = args.ecritures if scenario[4] else args.requetes
+        print(f'{scenario[0]} {scenario[1]}…', file=sys.stderr)
+        routes.append(executer(client, scenario, nb, 1 if scenario[4] else args.threads, compter_sql))
+
+    couverts = {s[0] for s in liste}
+    with app.app_context():
+        nb_articles = db.session.query(db.func.count(Article.id)).scalar()
+        dialecte = db.engine.dialect.name
+    resultat = {
+        'version': _version(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'base': dialecte,
+        'articles': nb_articles,
+        'mode': 'serveur' if args.serveur else 'client',
+        'cache': not args.sans_cache,
+        'threads': args.threads,
+        'routes': routes,
+        'non_couverts': sorted(e for e in app.view_functions
+                               if e not in couverts and e not in ('static', 'sitemap_partiel')) if choix is None else [],
+    }
+    texte = json.dumps(resultat, ensure_ascii=False, indent=2)
+    if args.sortie:
+        with open(args.sortie, 'w') as f:
+            f.write(texte)
+    else:
+        print(texte)
+    if args.comparer:
+        with open(args.comparer) as f:
+            comparer(json.load(f), resultat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Stress de concurrence : lecteurs et écrivains sur la même base, en plusieurs processus.
+
+    python bench/concurrence.py [--workers 4] [--threads 4] [--duree 20] [--articles 500]
+                                [--profil production] [--lecture] [--temoin]
+
+Chaque worker est un processus, comme sous gunicorn, avec son propre pool.
+Ses threads enchaînent des requêtes : lectures anonymes (accueil, journal,
+article, recherche) et, pour une part --ecritures, modifications et créations
+d'articles par l'admin. Chaque vue d'article est écrite aussitôt
+(VUES_FLUSH_INTERVALLE = 0) pour multiplier les écritures concurrentes.
+Rapporte les erreurs par type, dont « database is locked », et les latences.
+--temoin rejoue le même scénario sans pragmas ni réglages de pool, pour
+comparaison ; --lecture ouvre le même fichier en lecture par un second moteur.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import Counter
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+sys.path.insert(0, os.path.join(RACINE, 'bench'))
+
+
+def _percentile(valeurs, p):
+    return valeurs[max(0, min(len(valeurs) - 1, round(p / 100 * len(valeurs)) - 1))] if valeurs else None
+
+
+def _preparer(profil, temoin):
+    if temoin:
+        import base_donnees
+        base_donnees.PROFILS['temoin'] = {'pragmas': {}, 'pool': {}}
+    from app import create_app
+    # PROPAGATE_EXCEPTIONS : l'exception remonte au client de test, qui la classe
+    return create_app({'VUES_FLUSH_INTERVALLE': 0, 'PROPAGATE_EXCEPTIONS': True})
+
+
+def travailleur(numero, args, depart, file):
+    from sqlalchemy.exc import OperationalError
+    app = _preparer(args.profil, args.temoin)
+    from app import db, Article
+    with app.app_context():
+        lignes = db.session.execute(db.select(Article.id, Article.slug).where(Article.publie==True)).all()
+    resultats = {'lectures': [], 'ecritures': [], 'erreurs': Counter(), 'traces': {}}
+    verrou = threading.Lock()
+
+    def boucle(graine):
+        alea = random.Random(graine)
+        visiteur, admin = app.test_client(), app.test_client()
+        with admin.session_transaction() as s:
+            s['admin'] = True
+        while time.time() < depart + args.duree:
+            id, slug = alea.choice(lignes)
+            ecriture = alea.random() < args.ecritures
+            t0 = time.perf_counter()
+            try:
+                if not ecriture:
+                    r = visiteur.get(alea.choice(['/', '/journal', f'/article/{slug}', f'/article/{slug}',
+                                                  '/recherche?q=' + alea.choice(['robot', 'servo', 'kalman'])]))
+                elif alea.random() < 0.7:
+                    r = admin.post(f'/admin/article/{id}/modifier', data={
+                        'titre': f'Article {id} modifié', 'contenu': f'<p>Version {alea.random()}</p>',
+                        'categorie': 'journal', 'tags': 'stress', 'publie': 'on'})
+                else:
+                    r = admin.post('/admin/article/nouveau', data={
+                        'titre': f'Stress {numero}-{graine}-{t0}', 'contenu': '<p>Nouveau</p>',
+                        'categorie': 'journal', 'publie': 'on'})
+                erreur, trace = (None if r.status_code < 500 else f'HTTP {r.status_code}'), None
+            except OperationalError as e:
+                erreur, trace = 'database is locked' if 'locked' in str(e) else type(e.orig).__name__, traceback.format_exc()
+            except Exception as e:
+                erreur, trace = type(e).__name__, traceback.format_exc()
+            duree = time.perf_counter() - t0
+            with verrou:
+                if erreur:
+                    resultats['erreurs'][erreur] += 1
+                    resultats['traces'].setdefault(erreur, trace)
+                else:
+                    resultats['ecritures' if ecriture else 'lectures'].append(duree)
+
+    while time.time() < depart:
+        time.sleep(0.01)
+    threads = [threading.Thread(target=boucle, args=(numero * 1000 + i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    file.put(resultats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4, help='processus')
+    parser.add_argument('--threads', type=int, default=4, help='threads par processus')
+    parser.add_argument('--duree', type=float, default=20, help='secondes')
+    parser.add_argument('--articles', type=int, default=500)
+    parser.add_argument('--ecritures', type=float, default=0.1, help='part des requêtes admin en écriture')
+    parser.add_argument('--profil', default='production')
+    parser.add_argument('--lecture', action='store_true', help='moteur de lecture sur le même fichier')
+    parser.add_argument('--temoin', action='store_true', help='sans pragmas ni réglages de pool')
+    args = parser.parse_args()
+
+    dossier = tempfile.mkdtemp(prefix='robotblog-concurrence-')
+    uri = 'sqlite:///' + os.path.join(dossier, 'concurrence.db')
+    # Hérité des processus workers
+    os.environ['ROBOTBLOG_DATABASE_URI'] = uri
+    os.environ['ROBOTBLOG_BASE_PROFIL'] = 'temoin' if args.temoin else args.profil
+    if args.lecture:
+        os.environ['ROBOTBLOG_DATABASE_LECTURE_URI'] = uri
+    os.environ['ROBOTBLOG_CACHE_DOSSIER'] = os.path.join(dossier, 'cache')
+
+    app = _preparer(args.profil, args.temoin)
+    app.config['FLUX_DOSSIER'] = os.path.join(dossier, 'flux')
+    from donnees import semer
+    semer(app, args.articles, afficher=lambda m: None)
+    # Les workers partent ensemble, une fois tous importés
+    contexte = multiprocessing.get_context('spawn')
+    file = contexte.Queue()
+    depart = time.time() + 3 + args.workers
+    processus = [contexte.Process(target=travailleur, args=(i, args, depart, file)) for i in range(args.workers)]
+    for p in processus:
+        p.start()
+    resultats = [file.get() for _ in processus]
+    for p in processus:
+        p.join()
+
+    lectures = sorted(d for r in resultats for d in r['lectures'])
+    ecritures = sorted(d for r in resultats for d in r['ecritures'])
+    erreurs = sum((r['erreurs'] for r in resultats), Counter())
+    for erreur, trace in {e: t for r in resultats for e, t in r['traces'].items()}.items():
+        print(f'--- {erreur}\n{trace}', file=sys.stderr)
+
+    def latences(valeurs):
+        return {f'p{p}_ms': round(_percentile(valeurs, p) * 1000, 1) if valeurs else None for p in (50, 95, 99)}
+
+    print(json.dumps({
+        'profil': 'temoin' if args.temoin else args.profil, 'lecture': args.lecture,
+        'workers': args.workers, 'threads': args.threads, 'duree_s': args.duree,
+        'lectures': {'nombre': len(lectures), 'debit_rps': round(len(lectures) / args.duree, 1), **latences(lectures)},
+        'ecritures': {'nombre': len(ecritures), 'debit_rps': round(len(ecritures) / args.duree, 1), **latences(ecritures)},
+        'erreurs': dict(erreurs),
+        'database_is_locked': erreurs.get('database is locked', 0),
+    }, ensure_ascii=False, indent=2))
+    sys.exit(1 if erreurs else 0)
+
+
+if __name__ == '__main__':
+    main()
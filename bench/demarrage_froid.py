@@ -0,0 +1,138 @@
+"""Temps de démarrage à froid d'un worker, avec et sans préchauffage.
+
+    python bench/demarrage_froid.py [--articles 500] [--repetitions 5] [--sortie res.json]
+
+Chaque mesure lance un processus Python neuf, comme un worker WSGI, qui
+importe app.py, construit l'application par create_app(), la passe à
+preparer_worker() puis sert ses premières requêtes.
+Relevés : temps jusqu'à l'application prête (démarrage de l'interpréteur
+compris), durée de chaque phase de demarrage.py, et latence de la première
+requête de quelques pages. Quatre configurations :
+
+- froid : sans préchauffage, cache de bytecode Jinja vide ;
+- bytecode : sans préchauffage, cache de bytecode déjà rempli ;
+- prechauffe_froid : préchauffage, cache vide ;
+- prechauffe : préchauffage, cache rempli (la configuration de wsgi.py).
+
+Résultat en JSON : médianes sur --repetitions processus par configuration.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+sys.path.insert(0, os.path.join(RACINE, 'bench'))
+
+CONFIGURATIONS = {  # nom : (préchauffage, cache de bytecode rempli)
+    'froid': (False, False),
+    'bytecode': (False, True),
+    'prechauffe_froid': (True, False),
+    'prechauffe': (True, True),
+}
+
+
+def enfant(prechauffer, pages):
+    """Processus mesuré : signale qu'il est prêt, puis sert une fois chaque page."""
+    debut = time.perf_counter()
+    import app as module
+    importe = time.perf_counter()
+    application = module.create_app()
+    construite = time.perf_counter()
+    module.preparer_worker(application, prechauffer)
+    pret = time.perf_counter()
+    print('pret', flush=True)
+    client = application.test_client()
+    premieres = {}
+    for page in pages:
+        t0 = time.perf_counter()
+        statut = client.get(page).status_code
+        premieres[page] = {'ms': round((time.perf_counter() - t0) * 1000, 2), 'statut': statut}
+    print(json.dumps({
+        'import_ms': (importe - debut) * 1000,
+        'create_app_ms': (construite - importe) * 1000,
+        'preparer_worker_ms': (pret - construite) * 1000,
+        'phases_ms': {nom: duree * 1000 for nom, duree in module.demarrage.phases.items()},
+        'pages': premieres,
+    }), flush=True)
+
+
+def lancer(prechauffer, pages, env):
+    """(ms jusqu'à « prêt », mesures du processus)."""
+    commande = [sys.executable, os.path.abspath(__file__), '--enfant', '--pages', ','.join(pages)]
+    if prechauffer:
+        commande.append('--prechauffer')
+    t0 = time.perf_counter()
+    processus = subprocess.Popen(commande, env=env, stdout=subprocess.PIPE, text=True)
+    ligne = processus.stdout.readline()
+    pret_ms = (time.perf_counter() - t0) * 1000
+    sortie, _ = processus.communicate()
+    if ligne.strip() != 'pret' or processus.returncode:
+        raise SystemExit(f'Le worker mesuré a échoué (code {processus.returncode})')
+    return pret_ms, json.loads(sortie)
+
+
+def _mediane(valeurs):
+    return round(statistics.median(valeurs), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--articles', type=int, default=500, help='taille de la base temporaire')
+    parser.add_argument('--repetitions', type=int, default=5, help='processus par configuration')
+    parser.add_argument('--sortie', help='fichier JSON de résultats (sinon stdout)')
+    parser.add_argument('--enfant', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--prechauffer', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--pages', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.enfant:
+        return enfant(args.prechauffer, args.pages.split(','))
+
+    dossier = tempfile.mkdtemp(prefix='robotblog-demarrage-')
+    os.environ['ROBOTBLOG_DATABASE_URI'] = 'sqlite:///' + os.path.join(dossier, 'demarrage.db')
+    os.environ['ROBOTBLOG_GABARITS_CACHE'] = os.path.join(dossier, 'gabarits')
+    from app import create_app, db, Article
+    from donnees import semer
+    app = create_app({'FLUX_DOSSIER': os.path.join(dossier, 'flux')})
+    semer(app, args.articles, afficher=lambda m: print(m, file=sys.stderr))
+    with app.app_context():
+        slug = db.session.scalar(db.select(Article.slug).where(Article.publie==True).order_by(Article.id))
+    pages = ['/', '/journal', f'/article/{slug}', '/admin/login']
+
+    resultats = {}
+    for nom, (prechauffer, cache_rempli) in CONFIGURATIONS.items():
+        print(f'{nom}…', file=sys.stderr)
+        mesures = []
+        for i in range(args.repetitions):
+            cache = os.path.join(dossier, 'gabarits' if cache_rempli else f'gabarits-{nom}-{i}')
+            env = {**os.environ, 'ROBOTBLOG_GABARITS_CACHE': cache}
+            if cache_rempli and not os.path.isdir(cache):
+                lancer(True, pages, env)  # remplit le cache, non mesuré
+            mesures.append(lancer(prechauffer, pages, env))
+        phases = list(mesures[0][1]['phases_ms'])  # dans l'ordre du démarrage
+        resultats[nom] = {
+            'pret_ms': _mediane([pret for pret, _ in mesures]),
+            'import_ms': _mediane([m['import_ms'] for _, m in mesures]),
+            'create_app_ms': _mediane([m['create_app_ms'] for _, m in mesures]),
+            'preparer_worker_ms': _mediane([m['preparer_worker_ms'] for _, m in mesures]),
+            'phases_ms': {p: _mediane([m['phases_ms'][p] for _, m in mesures]) for p in phases},
+            'premiere_requete_ms': {page: _mediane([m['pages'][page]['ms'] for _, m in mesures]) for page in pages},
+            'pret_et_premieres_ms': _mediane([pret + sum(p['ms'] for p in m['pages'].values()) for pret, m in mesures]),
+        }
+
+    texte = json.dumps({'articles': args.articles, 'repetitions': args.repetitions,
+                        'configurations': resultats}, ensure_ascii=False, indent=2)
+    if args.sortie:
+        with open(args.sortie, 'w') as f:
+            f.write(texte)
+    else:
+        print(texte)
+
+
+if __name__ == '__main__':
+    main()
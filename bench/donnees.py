@@ -0,0 +1,168 @@
+"""Jeux de données synthétiques pour les mesures de performance.
+
+    ROBOTBLOG_DATABASE_URI=sqlite:////tmp/bench.db python bench/donnees.py --articles 10000 [--vider]
+
+Remplit la base configurée avec des articles réalistes : corps HTML longs
+(sections <h2>, listes, code, images, vidéos intégrées), tags, catégories,
+jours, brouillons, médias, étapes et ressources. La génération est
+déterministe pour une graine donnée. Les lignes sont insérées par lots, avec
+les champs dérivés calculés comme à l'enregistrement ; les corps sont tirés
+d'un répertoire de quelques centaines de variantes pour que 100 000 articles
+restent rapides à préparer.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import (create_app, db, init_db, index_recherche_actif, reindexer_articles, recalculer_similaires,  # noqa: E402
+                 preparer_contenu, normaliser_tags, slugify, similaires, Article, Tag, article_tag, Media, Timeline,
+                 Ressource, CATEGORIES)
+from contenu import LONGUEUR_EXTRAIT, tronquer  # noqa: E402
+
+MOTS = '''
+    robot humanoïde servomoteur couple capteur imu gyroscope accéléromètre batterie lipo tension
+    courant moteur réducteur engrenage articulation genou cheville hanche épaule coude poignet main
+    doigt impression pla petg châssis aluminium vis roulement câble connecteur carte microcontrôleur
+    raspberry esp32 arduino firmware python ros2 nœud topic message vision caméra opencv détection
+    suivi équilibre marche bipède trajectoire cinématique inverse dynamique simulation gazebo pid
+    régulateur calibration mesure essai test prototype itération conception modèle cao fusion
+    filtre kalman bruit latence fréquence boucle commande alimentation régulation thermique
+    ventilation poids centre masse pas démarche chute relevage apprentissage réseau neurones
+'''.split()
+LIAISONS = ['le', 'la', 'les', 'un', 'une', 'du', 'des', 'avec', 'pour', 'sur', 'dans', 'et', 'puis']
+TAGS = sorted({m for m in MOTS if len(m) > 4})[:80]
+REPERTOIRE_CORPS = 300
+LOT = 1000
+
+
+def _phrase(alea, n):
+    mots = [alea.choice(MOTS) if i % 3 else alea.choice(LIAISONS) for i in range(n)]
+    return mots[0].capitalize() + ' ' + ' '.join(mots[1:]) + '.'
+
+
+def _paragraphe(alea):
+    return '<p>' + ' '.join(_phrase(alea, alea.randint(8, 18)) for _ in range(alea.randint(3, 6))) + '</p>'
+
+
+def corps_html(alea, medias):
+    """Un article long : 4 à 8 sections avec paragraphes, listes, code, images et vidéos."""
+    morceaux = []
+    for _ in range(alea.randint(4, 8)):
+        morceaux.append(f'<h2>{_phrase(alea, 4)[:-1]}</h2>')
+        morceaux += [_paragraphe(alea) for _ in range(alea.randint(2, 5))]
+        tirage = alea.random()
+        if tirage < 0.25:
+            morceaux.append('<ul>' + ''.join(f'<li><strong>{alea.choice(MOTS)}</strong> – {_phrase(alea, 6)}</li>'
+                                             for _ in range(alea.randint(3, 6))) + '</ul>')
+        elif tirage < 0.4:
+            morceaux.append('<pre><code>' + '\n'.join(
+                f'{alea.choice(MOTS).replace("œ", "oe")}_{i} = lire_capteur({i}) * {alea.random():.3f}'
+                for i in range(alea.randint(4, 12))) + '</code></pre>')
+        elif tirage < 0.55 and medias:
+            morceaux.append(f'<img src="/static/uploads/{alea.choice(medias)}" alt="{alea.choice(MOTS)}" '
+                            f'style="max-width:100%;border-radius:8px;">')
+        elif tirage < 0.6:
+            morceaux.append('<iframe width="560" height="315" src="https://www.youtube.com/embed/dQw4w9WgXcQ" '
+                            'frameborder="0" allowfullscreen></iframe>')
+    return '\n'.join(morceaux)
+
+
+def semer(app, nb_articles=1000, nb_medias=None, graine=1, vider=False, avec_similaires=False, afficher=print):
+    """Remplit la base de app ; retourne le nombre de lignes créées par table."""
+    alea = random.Random(graine)
+    nb_medias = nb_articles // 10 if nb_medias is None else nb_medias
+    debut = time.perf_counter()
+    with app.app_context():
+        if vider:
+            db.drop_all()
+            db.session.execute(db.text('DROP TABLE IF EXISTS article_fts'))  # hors des modèles
+            db.session.commit()
+        init_db()
+        if db.session.query(Article.id).first() is not None and not vider:
+            raise SystemExit('La base contient déjà des articles : utilisez --vider.')
+
+        medias = [f'{alea.getrandbits(256):064x}.jpg' for _ in range(nb_medias)]
+        with db.engine.begin() as conn:
+            if medias:
+                conn.execute(db.insert(Media), [{
+                    'nom_fichier': nom, 'nom_original': f'photo-{i}.jpg', 'type_media': 'image',
+                    'taille': alea.randint(80_000, 4_000_000), 'largeur': 1920, 'hauteur': 1080,
+                    'empreinte': nom[:64], 'date_upload': datetime(2024, 1, 1) + timedelta(hours=i),
+                } for i, nom in enumerate(medias)])
+            conn.execute(db.insert(Timeline), [{
+                'titre': _phrase(alea, 3)[:-1], 'description': _phrase(alea, 12),
+                'date_event': datetime(2024, 1, 1) + timedelta(days=7 * i),
+                'statut': alea.choice(['complete', 'en-cours', 'planifie']), 'icone': '🔧',
+            } for i in range(30)])
+            conn.execute(db.insert(Ressource), [{
+                'titre': _phrase(alea, 3)[:-1], 'url': f'https://exemple.org/{i}', 'description': _phrase(alea, 15),
+                'categorie': alea.choice(['composants', 'logiciels', 'tutoriels', 'outils']), 'ordre': i,
+            } for i in range(40)])
+
+        # Corps préparés une fois, réutilisés par plusieurs articles
+        corps = []
+        for _ in range(min(nb_articles, REPERTOIRE_CORPS)):
+            html = corps_html(alea, medias)
+            corps.append((html, preparer_contenu(html)))
+
+        tags = {}
+        categories = list(CATEGORIES)
+        depart = datetime(2024, 1, 1)
+        with db.engine.begin() as conn:
+            for lot in range(0, nb_articles, LOT):
+                articles, liens = [], []
+                for i in range(lot, min(lot + LOT, nb_articles)):
+                    html, derives = alea.choice(corps)
+                    titre = f'Jour {i + 1} – {_phrase(alea, alea.randint(3, 7))[:-1]}'
+                    noms = normaliser_tags(', '.join(alea.sample(TAGS, alea.randint(1, 5))))
+                    publie = alea.random() < 0.9
+                    date = depart + timedelta(hours=6 * i, minutes=alea.randint(0, 300))
+                    resume = _phrase(alea, 20) if alea.random() < 0.5 else ''
+                    if resume:
+                        derives = {**derives, 'chapo': resume, 'extrait': tronquer(resume, LONGUEUR_EXTRAIT)}
+                    articles.append({
+                        'id': i + 1, 'titre': titre, 'slug': f'{slugify(titre)}-{i + 1}',
+                        'contenu': html, 'resume': resume,
+                        'image_couverture': alea.choice(medias) if medias and alea.random() < 0.3 else None,
+                        'categorie': alea.choice(categories), 'jour': i + 1 if alea.random() < 0.8 else None,
+                        'publie': publie, 'date_creation': date, 'date_publication': date if publie else None,
+                        'date_modification': date, 'tags': ', '.join(noms), 'vues': alea.randint(0, 5000),
+                        'termes': similaires.termes(titre, ', '.join(noms), derives['texte']),
+                        **{champ: derives[champ] for champ in Article.CHAMPS_DERIVES},
+                    })
+                    for nom in noms:
+                        slug = slugify(nom)
+                        if slug not in tags:
+                            tags[slug] = conn.execute(db.insert(Tag).values(nom=nom, slug=slug)).inserted_primary_key[0]
+                        liens.append({'article_id': i + 1, 'tag_id': tags[slug]})
+                conn.execute(db.insert(Article), articles)
+                conn.execute(article_tag.insert(), liens)
+                afficher(f'  {lot + len(articles)}/{nb_articles} articles')
+            if conn.dialect.name == 'postgresql':
+                # Identifiants explicites : la séquence doit repartir après le dernier
+                conn.execute(db.text("SELECT setval(pg_get_serial_sequence('article', 'id'), "
+                                     "(SELECT max(id) FROM article))"))
+
+        with db.engine.begin() as conn:
+            nb_indexes = reindexer_articles(conn) if index_recherche_actif(conn) else 0
+        if avec_similaires:
+            with db.engine.begin() as conn:
+                recalculer_similaires(conn)
+    afficher(f'Base remplie en {time.perf_counter() - debut:.1f}s ({nb_indexes} articles indexés).')
+    return {'articles': nb_articles, 'medias': nb_medias, 'tags': len(tags), 'timeline': 30, 'ressources': 40}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--articles', type=int, default=1000, help='1000, 10000, 100000...')
+    parser.add_argument('--medias', type=int, default=None, help='défaut : un dixième des articles')
+    parser.add_argument('--graine', type=int, default=1)
+    parser.add_argument('--vider', action='store_true', help='supprime toutes les tables avant de remplir')
+    parser.add_argument('--similaires', action='store_true', help='calcule aussi les articles liés (lent au-delà de 10 000)')
+    args = parser.parse_args()
+    semer(create_app(), args.articles, args.medias, args.graine, args.vider, args.similaires)
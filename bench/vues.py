@@ -0,0 +1,77 @@
+"""Débit de /article/<slug> avec écriture des vues à chaque lecture puis par lots.
+
+    python bench/vues.py [--requetes 2000] [--threads 8]
+
+Chaque mode tourne sur une base SQLite temporaire (fichier) et affiche une
+ligne JSON : requêtes/s, erreurs et vues finalement enregistrées.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+_dossier = tempfile.mkdtemp(prefix='robotblog-bench-')
+os.environ['ROBOTBLOG_DATABASE_URI'] = 'sqlite:///' + os.path.join(_dossier, 'bench.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, Article, compteur_vues  # noqa: E402
+
+NB_ARTICLES = 50
+
+
+def preparer(app):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for i in range(1, NB_ARTICLES + 1):
+            art = Article(
+                titre=f'Jour {i}', slug=f'jour-{i}', contenu='<p>Contenu</p>' * 50,
+                jour=i, publie=True, date_publication=datetime.utcnow())
+            db.session.add(art)
+            art.preparer()
+        db.session.commit()
+
+
+def mesurer(app, intervalle, nb_requetes, nb_threads):
+    preparer(app)
+    app.config['VUES_FLUSH_INTERVALLE'] = intervalle
+    erreurs = []
+
+    def lire(i):
+        client = app.test_client()
+        try:
+            r = client.get(f'/article/jour-{i % NB_ARTICLES + 1}')
+            if r.status_code != 200:
+                erreurs.append(r.status_code)
+        except Exception as e:
+            erreurs.append(repr(e))
+
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(nb_threads) as pool:
+        list(pool.map(lire, range(nb_requetes)))
+    duree = time.perf_counter() - debut
+    compteur_vues.vider()
+    with app.app_context():
+        vues = db.session.query(db.func.sum(Article.vues)).scalar()
+    return {
+        'mode': 'par lots' if intervalle else 'à chaque lecture',
+        'requetes': nb_requetes,
+        'threads': nb_threads,
+        'requetes_par_s': round(nb_requetes / duree, 1),
+        'erreurs': len(erreurs),
+        'vues_enregistrees': vues,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requetes', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+    app = create_app()
+    for intervalle in (0, 10):
+        print(json.dumps(mesurer(app, intervalle, args.requetes, args.threads), ensure_ascii=False))
@@ -0,0 +1,257 @@
+"""Cache des pages publiques rendues, invalidé par étiquettes.
+
+Deux stockages interchangeables :
+- CacheMemoire : LRU propre au processus, borné en nombre d'entrées et en durée ;
+- CacheFichiers : dossier partagé par tous les workers d'une machine, qui joue
+  localement le rôle d'un cache partagé (Redis, memcached...).
+
+Un stockage expose get(cle), set(cle, valeur, ttl=None), clear() et __len__(),
+ainsi que compter(hits, misses) et compteurs() pour les statistiques : avec
+CacheFichiers, elles couvrent tous les workers qui partagent le dossier.
+Chaque étiquette ('articles', 'timeline'...) a une génération stockée à côté
+des pages ; invalider une étiquette change sa génération, ce qui rend
+inaccessibles toutes les pages rendues avec l'ancienne.
+"""
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import os
+import pickle
+import threading
+import time
+import uuid
+
+from flask import Response, request, session
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+COMPTEURS = 'compteurs'  # fichier des statistiques de CacheFichiers ; les entrées ont un nom hexadécimal
+
+
+class CacheMemoire:
+    partage = False
+
+    def __init__(self, taille_max=512, ttl=300):
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self._entrees = OrderedDict()
+        self._hits = self._misses = 0
+        self._verrou = threading.Lock()
+
+    def get(self, cle):
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                return None
+            expire, valeur = entree
+            if expire is not None and expire < time.monotonic():
+                del self._entrees[cle]
+                return None
+            self._entrees.move_to_end(cle)
+            return valeur
+
+    def set(self, cle, valeur, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expire = time.monotonic() + ttl if ttl else None
+        with self._verrou:
+            self._entrees[cle] = (expire, valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def clear(self):
+        with self._verrou:
+            self._entrees.clear()
+
+    def __len__(self):
+        return len(self._entrees)
+
+    def compter(self, hits, misses):
+        with self._verrou:
+            self._hits += hits
+            self._misses += misses
+
+    def compteurs(self):
+        return self._hits, self._misses
+
+
+class CacheFichiers:
+    partage = True
+
+    def __init__(self, dossier, taille_max=2048, ttl=300):
+        self.dossier = dossier
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self._ecritures = 0
+        os.makedirs(dossier, exist_ok=True)
+
+    def _chemin(self, cle):
+        return os.path.join(self.dossier, hashlib.sha1(repr(cle).encode()).hexdigest())
+
+    def get(self, cle):
+        try:
+            with open(self._chemin(cle), 'rb') as f:
+                expire, valeur = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expire is not None and expire < time.time():
+            return None
+        return valeur
+
+    def set(self, cle, valeur, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        chemin = self._chemin(cle)
+        # Nom unique par écriture : deux threads d'un même worker peuvent rendre la même page
+        temporaire = f'{chemin}.{uuid.uuid4().hex}.tmp'
+        try:
+            with open(temporaire, 'wb') as f:
+                pickle.dump((time.time() + ttl if ttl else None, valeur), f)
+            os.replace(temporaire, chemin)
+        except OSError:
+            # clear() d'un autre worker en cours : la page sera simplement rendue la prochaine fois
+            try:
+                os.remove(temporaire)
+            except OSError:
+                pass
+            return
+        self._ecritures += 1
+        if self._ecritures % 64 == 0:
+            self._elaguer()
+
+    def _entrees(self):
+        return [e for e in os.scandir(self.dossier) if not e.name.endswith('.tmp') and e.name != COMPTEURS]
+
+    def _elaguer(self):
+        # Supprime les entrées les moins récemment écrites au-delà de taille_max
+        fichiers = self._entrees()
+        if len(fichiers) > self.taille_max:
+            fichiers.sort(key=lambda e: e.stat().st_mtime)
+            for e in fichiers[:len(fichiers) - self.taille_max]:
+                try:
+                    os.remove(e.path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        for e in os.scandir(self.dossier):
+            try:
+                os.remove(e.path)
+            except OSError:
+                pass
+
+    def __len__(self):
+        return len(self._entrees())
+
+    def compter(self, hits, misses):
+        """Ajoute aux compteurs du dossier, sous verrou : plusieurs workers y écrivent."""
+        descripteur = os.open(os.path.join(self.dossier, COMPTEURS), os.O_RDWR | os.O_CREAT, 0o644)
+        with open(descripteur, 'r+') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            anciens = self._lire(f)
+            f.seek(0)
+            f.truncate()
+            f.write(f'{anciens[0] + hits} {anciens[1] + misses}')
+
+    def compteurs(self):
+        try:
+            with open(os.path.join(self.dossier, COMPTEURS)) as f:
+                return self._lire(f)
+        except OSError:
+            return 0, 0
+
+    @staticmethod
+    def _lire(f):
+        try:
+            hits, misses = map(int, f.read().split())
+        except ValueError:  # fichier neuf
+            return 0, 0
+        return hits, misses
+
+
+class CachePages:
+    def __init__(self, stockage=None, intervalle_compteurs=1.0):
+        self.stockage = stockage if stockage is not None else CacheMemoire()
+        self.actif = True
+        # Hits et misses s'accumulent ici, et ne sont ajoutés aux compteurs du
+        # stockage (un fichier verrouillé pour CacheFichiers) qu'une fois par intervalle
+        self.intervalle_compteurs = intervalle_compteurs
+        self._hits = self._misses = 0
+        self._report = time.monotonic()
+        self._verrou = threading.Lock()
+
+    def _generation(self, etiquette):
+        generation = self.stockage.get(('generation', etiquette))
+        if generation is None:
+            generation = uuid.uuid4().hex
+            self.stockage.set(('generation', etiquette), generation, ttl=0)
+        return generation
+
+    def invalider(self, *etiquettes):
+        for etiquette in etiquettes:
+            self.stockage.set(('generation', etiquette), uuid.uuid4().hex, ttl=0)
+
+    def utilisable(self):
+        """Les pages vues par l'admin ou portant un message flash ne sont jamais mises en cache."""
+        return (self.actif and request.method == 'GET'
+                and not session.get('admin') and not session.get('_flashes'))
+
+    def obtenir(self, cle, etiquettes, rendre, compter=True):
+        """Valeur en cache, ou rendue puis gardée ; compter=False pour une entrée interne (un total), hors statistiques."""
+        cle = (cle, tuple(self._generation(e) for e in etiquettes))
+        valeur = self.stockage.get(cle)
+        if compter:
+            self._compter(valeur is not None)
+        if valeur is None:
+            valeur = rendre()
+            # Les réponses construites (redirections, tuples avec statut) ne sont pas gardées
+            if valeur is not None and not isinstance(valeur, (Response, tuple)):
+                self.stockage.set(cle, valeur)
+        return valeur
+
+    def _compter(self, hit):
+        with self._verrou:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+            if time.monotonic() - self._report < self.intervalle_compteurs:
+                return
+        self.reporter()
+
+    def reporter(self):
+        """Ajoute aux compteurs du stockage les hits et misses pas encore reportés."""
+        with self._verrou:
+            hits, misses, self._hits, self._misses = self._hits, self._misses, 0, 0
+            self._report = time.monotonic()
+        if hits or misses:
+            self.stockage.compter(hits, misses)
+
+    def page(self, *etiquettes):
+        """Décorateur : met en cache le HTML d'une vue, par route et paramètres de requête."""
+        def decorateur(vue):
+            @wraps(vue)
+            def decorated(*args, **kwargs):
+                if not self.utilisable():
+                    return vue(*args, **kwargs)
+                cle = (request.endpoint, request.path, tuple(sorted(request.args.items(multi=True))))
+                return self.obtenir(cle, etiquettes, lambda: vue(*args, **kwargs))
+            return decorated
+        return decorateur
+
+    def stats(self):
+        """Statistiques du stockage : celles de tous les workers avec CacheFichiers, du seul worker sinon."""
+        self.reporter()
+        hits, misses = self.stockage.compteurs()
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'taux_hits': round(hits / total, 3) if total else 0.0,
+            'entrees': len(self.stockage),
+            'stockage': type(self.stockage).__name__,
+            'tous_workers': self.stockage.partage,
+        }
@@ -0,0 +1,273 @@
+"""Traitement du texte des articles, fait une fois à l'enregistrement.
+
+Le HTML saisi dans l'admin est nettoyé (liste blanche de balises et
+d'attributs, balises refermées), les <h2> reçoivent une ancre pour la table
+des matières, et l'on en tire le texte brut, le nombre de mots et un résumé.
+Les pages n'ont plus ensuite qu'à afficher les champs stockés.
+"""
+from html import escape
+from html.parser import HTMLParser
+import math
+import re
+
+
+def replier_accents(text):
+    text = text.lower()
+    text = re.sub(r'[àáâãäå]', 'a', text)
+    text = re.sub(r'[èéêë]', 'e', text)
+    text = re.sub(r'[ìíîï]', 'i', text)
+    text = re.sub(r'[òóôõö]', 'o', text)
+    text = re.sub(r'[ùúûü]', 'u', text)
+    text = re.sub(r'[ç]', 'c', text)
+    return text
+
+def slugify(text):
+    text = replier_accents(text)
+    text = re.sub(r'[^a-z0-9\s-]', '', text)
+    text = re.sub(r'[\s-]+', '-', text).strip('-')
+    return text
+
+def slug_libre(base, pris):
+    """Premier de base, base-1, base-2... absent de l'ensemble pris."""
+    slug, n = base, 1
+    while slug in pris:
+        slug = f'{base}-{n}'
+        n += 1
+    return slug
+
+
+MOTS_PAR_MINUTE = 200
+LONGUEUR_CHAPO = 300
+LONGUEUR_EXTRAIT = 140
+
+BALISES = {
+    'h2', 'h3', 'h4', 'p', 'br', 'hr', 'ul', 'ol', 'li', 'strong', 'b', 'em', 'i', 'u', 's',
+    'a', 'img', 'figure', 'figcaption', 'blockquote', 'pre', 'code', 'div', 'span',
+    'table', 'thead', 'tbody', 'tr', 'th', 'td', 'iframe', 'video', 'source', 'mark', 'sub', 'sup',
+}
+VIDES = {'br', 'hr', 'img', 'source'}
+IGNOREES = {'script', 'style', 'object', 'embed', 'form', 'input', 'button', 'textarea', 'select'}
+BLOCS = {'h2', 'h3', 'h4', 'p', 'br', 'li', 'div', 'blockquote', 'pre', 'tr', 'figcaption'}
+FERMENT_P = {'p', 'div', 'h2', 'h3', 'h4', 'ul', 'ol', 'table', 'blockquote', 'pre', 'figure', 'hr'}  # comme un navigateur
+ATTRIBUTS = {
+    '*': {'class', 'id', 'style', 'title'},
+    'a': {'href', 'target', 'rel'},
+    'img': {'src', 'alt', 'width', 'height', 'loading', 'decoding'},
+    'iframe': {'src', 'width', 'height', 'allow', 'allowfullscreen', 'frameborder', 'loading'},
+    'video': {'src', 'controls', 'width', 'height', 'poster', 'muted', 'loop', 'playsinline', 'preload'},
+    'source': {'src', 'type'},
+    'td': {'colspan', 'rowspan'}, 'th': {'colspan', 'rowspan'},
+}
+_URL_SURE = re.compile(r'^(https?:|mailto:|/|#|\.|[^:]*$)', re.I)
+
+
+class _Nettoyeur(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.sortie = []
+        self.texte = []
+        self.ouvertes = []
+        self.ignorees = 0
+        self.titres = []   # [index dans sortie, texte du <h2>]
+        self.titre = None
+
+    def handle_starttag(self, balise, attrs):
+        if balise in IGNOREES:
+            self.ignorees += balise not in VIDES
+            return
+        if self.ignorees or balise not in BALISES:
+            return
+        if balise in FERMENT_P and 'p' in self.ouvertes:
+            self.handle_endtag('p')
+        if balise == 'li' and self.ouvertes and self.ouvertes[-1] == 'li':
+            self.handle_endtag('li')
+        permis = ATTRIBUTS['*'] | ATTRIBUTS.get(balise, set())
+        propres = {}
+        for nom, valeur in attrs:
+            valeur = valeur or ''
+            if nom not in permis:
+                continue
+            if nom in ('href', 'src', 'poster') and not _URL_SURE.match(valeur.strip()):
+                continue
+            if nom == 'style' and re.search(r'expression|javascript:|url\(', valeur, re.I):
+                continue
+            propres[nom] = valeur
+        if balise in ('img', 'iframe'):
+            propres.setdefault('loading', 'lazy')
+        if balise == 'a' and propres.get('target') == '_blank':
+            propres['rel'] = 'noopener'
+        if balise in BLOCS:
+            self.texte.append('\n')
+        if balise == 'h2':
+            propres.pop('id', None)
+            self.titre = []
+            self.titres.append([len(self.sortie), self.titre])
+        attributs = ''.join(f' {n}="{escape(v)}"' if v else f' {n}' for n, v in propres.items())
+        self.sortie.append(f'<{balise}{attributs}>')
+        if balise not in VIDES:
+            self.ouvertes.append(balise)
+
+    def handle_startendtag(self, balise, attrs):
+        self.handle_starttag(balise, attrs)
+        if balise not in VIDES and self.ouvertes and self.ouvertes[-1] == balise:
+            self.handle_endtag(balise)
+
+    def handle_endtag(self, balise):
+        if balise in IGNOREES:
+            self.ignorees = max(0, self.ignorees - 1)
+            return
+        if self.ignorees or balise not in self.ouvertes:
+            return
+        # Referme aussi les balises laissées ouvertes à l'intérieur
+        while self.ouvertes:
+            ouverte = self.ouvertes.pop()
+            self.sortie.append(f'</{ouverte}>')
+            if ouverte == 'h2':
+                self.titre = None
+            if ouverte == balise:
+                break
+        if balise in BLOCS:
+            self.texte.append('\n')
+
+    def handle_data(self, data):
+        if self.ignorees:
+            return
+        self.sortie.append(escape(data, quote=False))
+        self.texte.append(data)
+        if self.titre is not None:
+            self.titre.append(data)
+
+    def resultat(self):
+        self.close()
+        for ouverte in reversed(self.ouvertes):
+            self.sortie.append(f'</{ouverte}>')
+        table, ancres = [], set()
+        for index, morceaux in self.titres:
+            titre = ' '.join(''.join(morceaux).split())
+            ancre = base = slugify(titre) or 'section'
+            n = 2
+            while ancre in ancres:
+                ancre, n = f'{base}-{n}', n + 1
+            ancres.add(ancre)
+            self.sortie[index] = self.sortie[index].replace('<h2', f'<h2 id="{ancre}"', 1)
+            table.append({'id': ancre, 'titre': titre})
+        texte = re.sub(r'[ \t\r\f\v]+', ' ', ''.join(self.texte))
+        texte = re.sub(r'\s*\n\s*', '\n', texte).strip()
+        return ''.join(self.sortie), texte, table
+
+
+def tronquer(texte, longueur):
+    texte = ' '.join(texte.split())
+    if len(texte) <= longueur:
+        return texte
+    return texte[:longueur].rsplit(' ', 1)[0].rstrip(',;:.!?-–') + '…'
+
+
+def preparer(contenu, resume=None):
+    """Champs dérivés d'un article : contenu_html, texte, chapo, extrait, nb_mots, temps_lecture, table_matieres."""
+    nettoyeur = _Nettoyeur()
+    nettoyeur.feed(contenu or '')
+    html, texte, table = nettoyeur.resultat()
+    nb_mots = len(re.findall(r'\w+', texte))
+    chapo = ' '.join((resume or '').split()) or tronquer(texte, LONGUEUR_CHAPO)
+    return {
+        'contenu_html': html,
+        'texte': texte,
+        'chapo': chapo,
+        'extrait': tronquer(chapo, LONGUEUR_EXTRAIT),
+        'nb_mots': nb_mots,
+        'temps_lecture': max(1, math.ceil(nb_mots / MOTS_PAR_MINUTE)),
+        'table_matieres': table,
+    }
+
+
+def normaliser_tags(tags):
+    """Liste de tags sans doublons (au sens de slugify), dans l'ordre de saisie."""
+    noms, vus = [], set()
+    for tag in (tags or '').split(','):
+        nom = ' '.join(tag.split())[:100]
+        cle = slugify(nom)
+        if cle and cle not in vus:
+            vus.add(cle)
+            noms.append(nom)
+    return noms
+
+
+def _md_en_ligne(texte):
+    # Le code est mis de côté avant les autres règles, qui ne doivent pas s'y appliquer
+    codes = []
+    def garder(m):
+        codes.append(f'<code>{m.group(1)}</code>')
+        return f'\x00{len(codes) - 1}\x00'
+    texte = re.sub(r'`([^`]+)`', garder, escape(texte))
+    texte = re.sub(r'!\[([^\]]*)\]\(([^)\s]+)\)', r'<img src="\2" alt="\1">', texte)
+    texte = re.sub(r'\[([^\]]+)\]\(([^)\s]+)\)', r'<a href="\2">\1</a>', texte)
+    texte = re.sub(r'(\*\*|__)(.+?)\1', r'<strong>\2</strong>', texte)
+    texte = re.sub(r'(?<![\w*])([*_])(?!\s)(.+?)(?<!\s)\1(?![\w*])', r'<em>\2</em>', texte)
+    return re.sub(r'\x00(\d+)\x00', lambda m: codes[int(m.group(1))], texte)
+
+
+def markdown_en_html(texte):
+    """HTML d'un texte Markdown courant : titres, paragraphes, listes, citations, code, liens, images.
+
+    Les titres # et ## deviennent des <h2>, le titre de la page étant celui de l'article.
+    """
+    html, bloc, code = [], [], None
+    type_bloc = None  # 'p', 'ul', 'ol' ou 'blockquote'
+
+    def fermer():
+        nonlocal type_bloc
+        if type_bloc == 'p':
+            html.append('<p>' + _md_en_ligne(' '.join(bloc)) + '</p>')
+        elif type_bloc == 'blockquote':
+            html.append('<blockquote><p>' + _md_en_ligne(' '.join(bloc)) + '</p></blockquote>')
+        elif type_bloc:
+            html.append(f'<{type_bloc}>' + ''.join(f'<li>{_md_en_ligne(e)}</li>' for e in bloc) + f'</{type_bloc}>')
+        bloc.clear()
+        type_bloc = None
+
+    for ligne in (texte or '').splitlines():
+        if code is not None:
+            if ligne.strip().startswith('```'):
+                html.append('<pre><code>' + escape('\n'.join(code)) + '</code></pre>')
+                code = None
+            else:
+                code.append(ligne)
+            continue
+        if ligne.strip().startswith('```'):
+            fermer()
+            code = []
+            continue
+        titre = re.match(r'(#{1,6})\s+(.*?)\s*#*\s*$', ligne)
+        element = re.match(r'\s*(?:([-*+])|\d+[.)])\s+(.*)', ligne)
+        if titre:
+            fermer()
+            niveau = {1: 2, 2: 2, 3: 3}.get(len(titre.group(1)), 4)
+            html.append(f'<h{niveau}>{_md_en_ligne(titre.group(2))}</h{niveau}>')
+        elif re.match(r'\s*([-*_])(\s*\1){2,}\s*$', ligne):
+            fermer()
+            html.append('<hr>')
+        elif element:
+            liste = 'ul' if element.group(1) else 'ol'
+            if type_bloc != liste:
+                fermer()
+                type_bloc = liste
+            bloc.append(element.group(2))
+        elif ligne.startswith('>'):
+            if type_bloc != 'blockquote':
+                fermer()
+                type_bloc = 'blockquote'
+            bloc.append(ligne.lstrip('>').strip())
+        elif not ligne.strip():
+            fermer()
+        elif type_bloc in ('ul', 'ol') and ligne.startswith((' ', '\t')):
+            bloc[-1] += ' ' + ligne.strip()  # suite de l'élément précédent
+        else:
+            if type_bloc != 'p':
+                fermer()
+                type_bloc = 'p'
+            bloc.append(ligne.strip())
+    if code is not None:
+        html.append('<pre><code>' + escape('\n'.join(code)) + '</code></pre>')
+    fermer()
+    return '\n'.join(html)
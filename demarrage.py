@@ -0,0 +1,95 @@
+"""Démarrage d'un worker : phases mesurées, templates précompilés et préchauffage.
+
+Les modèles sont déclarés à l'import de app.py, puis create_app() construit
+l'application en phases chronométrées (configuration, extensions, routes).
+preparer_worker(), appelé par les workers WSGI, y ajoute avec le préchauffage
+ce qu'un worker ferait sinon pendant ses premières requêtes :
+
+- gabarits : tous les templates sont compilés. Le code Python que Jinja en
+  tire est gardé sur disque (GABARITS_CACHE_DOSSIER), partagé entre workers
+  et redémarrages : seul le premier compile vraiment, les suivants chargent
+  le bytecode. Un template modifié change d'empreinte et est recompilé ;
+- connexions : chaque moteur ouvre d'avance ses connexions, pragmas compris ;
+- pages : quelques pages publiques sont rendues par un client de test, ce
+  qui construit la table de routage, remplit le cache des requêtes compilées
+  de SQLAlchemy et le cache des pages.
+
+Les durées sont journalisées et exposées par /admin/metrics.
+"""
+from contextlib import contextmanager
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+
+class Demarrage:
+    def __init__(self, app=None):
+        self.phases = {}
+        self._repere = time.perf_counter()
+        self._moteurs = []
+        os.register_at_fork(after_in_child=self._apres_fork)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        dossier = app.config['GABARITS_CACHE_DOSSIER']
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+            # Avant la première lecture de app.jinja_env, qui crée l'environnement avec ces options
+            app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(dossier)}
+
+    def marquer(self, nom):
+        """Clôt la phase nom, commencée à la marque précédente."""
+        maintenant = time.perf_counter()
+        self.phases[nom] = maintenant - self._repere
+        self._repere = maintenant
+
+    @contextmanager
+    def phase(self, nom):
+        self._repere = time.perf_counter()
+        yield
+        self.marquer(nom)
+
+    def rapport(self):
+        total = sum(self.phases.values())
+        return f'{total * 1000:.0f} ms (' + ', '.join(
+            f'{nom} {duree * 1000:.0f}' for nom, duree in self.phases.items()) + ')'
+
+    def exposer(self):
+        lignes = ['# HELP robotblog_demarrage_secondes Durée des phases de démarrage du worker.',
+                  '# TYPE robotblog_demarrage_secondes gauge']
+        lignes += [f'robotblog_demarrage_secondes{{phase="{nom}"}} {duree:.6f}' for nom, duree in self.phases.items()]
+        return '\n'.join(lignes) + '\n'
+
+    # ─── Préchauffage ───
+    def compiler_gabarits(self, app):
+        """Compile tous les templates (ou charge leur bytecode) ; retourne leur nombre."""
+        env = app.jinja_env
+        noms = env.list_templates()
+        for nom in noms:
+            env.get_template(nom)
+        return len(noms)
+
+    def ouvrir_connexions(self, app, db, nombre):
+        """Remplit le pool de chaque moteur avec jusqu'à nombre connexions prêtes."""
+        with app.app_context():
+            for moteur in db.engines.values():
+                taille = getattr(moteur.pool, 'size', lambda: 1)()
+                connexions = [moteur.connect() for _ in range(max(1, min(nombre, taille)))]
+                for connexion in connexions:
+                    connexion.exec_driver_sql('SELECT 1')
+                    connexion.close()  # rendue au pool, pas fermée
+                if moteur not in self._moteurs:
+                    self._moteurs.append(moteur)
+
+    def _apres_fork(self):
+        # Préchauffé avant un fork (gunicorn --preload) : l'enfant ne doit pas
+        # partager les connexions du parent, il ouvrira les siennes
+        for moteur in self._moteurs:
+            moteur.dispose(close=False)
+
+    def rendre_pages(self, app, urls, url_base):
+        """Rend les pages urls comme un visiteur anonyme ; retourne {url: statut}."""
+        client = app.test_client()
+        return {url: client.get(url, base_url=url_base).status_code for url in urls}
@@ -0,0 +1,210 @@
+"""Export du blog public en HTML statique.
+
+    flask --app app exporter build/ [--complet] [--url-base https://mon-blog.fr/]
+
+Chaque page publique est rendue dans <dossier>/<chemin>/index.html, avec une
+copie des fichiers de /static/ qu'elle référence. Les flux Atom et le sitemap
+sont écrits aux mêmes adresses que sur le site (feed.xml,
+categorie/<cat>/feed.xml, sitemap.xml), à chaque export. Le manifeste .export.json
+garde l'empreinte de chaque article publié : à l'export suivant, seuls les
+articles ajoutés, modifiés ou supprimés, leurs voisins (liens précédent/suivant),
+les listes et les catégories concernées sont re-rendus.
+
+La recherche et l'administration restent dynamiques et ne sont pas exportées.
+"""
+from bisect import bisect_left, bisect_right
+import hashlib
+import json
+import math
+import os
+import posixpath
+import re
+import shutil
+
+from flask import current_app
+
+from app import (db, Article, ArticleSimilaire, CATEGORIES, ARTICLES_PAR_PAGE, cache_pages, _rendre_article,
+                 construire_flux, construire_sitemap)
+
+MANIFESTE = '.export.json'
+_REF_STATIQUE = re.compile(r'/static/([^"\'\s?#,)]+)')
+_REF_CSS = re.compile(r'''url\(\s*['"]?([^'")]+)['"]?\s*\)''')
+
+
+def _etat_articles():
+    lignes = db.session.execute(db.select(
+        Article.id, Article.slug, Article.jour, Article.categorie, Article.titre,
+        Article.contenu, Article.resume, Article.image_couverture, Article.tags,
+        Article.date_publication,
+    ).where(Article.publie==True))
+    # Les articles liés font partie de la page
+    lies = {}
+    for id, voisin in db.session.execute(db.select(ArticleSimilaire.article_id, ArticleSimilaire.voisin_id)
+                                         .order_by(ArticleSimilaire.article_id, ArticleSimilaire.rang)):
+        lies.setdefault(id, []).append(voisin)
+    return {
+        str(l.id): {
+            'empreinte': hashlib.sha1(repr((tuple(l), lies.get(l.id))).encode()).hexdigest(),
+            'slug': l.slug, 'jour': l.jour, 'categorie': l.categorie,
+        }
+        for l in lignes
+    }
+
+
+def _voisins(etat, jour):
+    """Articles dont la page précédent/suivant pointe vers le jour donné."""
+    jours = sorted({a['jour'] for a in etat.values() if a['jour'] is not None})
+    proches = set()
+    i = bisect_left(jours, jour)
+    if i > 0:
+        proches.add(jours[i - 1])
+    j = bisect_right(jours, jour)
+    if j < len(jours):
+        proches.add(jours[j])
+    return {id for id, a in etat.items() if a['jour'] in proches}
+
+
+def _nb_pages(nb_articles):
+    return max(1, math.ceil(nb_articles / ARTICLES_PAR_PAGE))
+
+
+def _pages_listes(etat, categories):
+    """Chemins des pages de liste : journal et catégories, toutes pages comprises."""
+    pages = {'/journal': ('journal', {})}
+    for n in range(1, _nb_pages(len(etat)) + 1):
+        pages[f'/journal/page/{n}'] = ('journal', {'page': n})
+    for cat in categories:
+        pages[f'/categorie/{cat}'] = ('categorie', {'cat': cat})
+        nb = sum(1 for a in etat.values() if a['categorie'] == cat)
+        for n in range(1, _nb_pages(nb) + 1):
+            pages[f'/categorie/{cat}/page/{n}'] = ('categorie', {'cat': cat, 'page': n})
+    return pages
+
+
+def _fichier(dossier, chemin):
+    return os.path.join(dossier, chemin.strip('/'), 'index.html')
+
+
+def _copier_statiques(html, dossier):
+    copies = 0
+    a_copier, vues = set(_REF_STATIQUE.findall(html)), set()
+    while a_copier:
+        ref = a_copier.pop()
+        vues.add(ref)
+        source = os.path.join(current_app.static_folder, ref)
+        cible = os.path.join(dossier, 'static', ref)
+        if not os.path.isfile(source):
+            continue
+        if ref.endswith('.css'):
+            # Polices et @import d'une feuille de style, relatifs à son dossier
+            with open(source, encoding='utf-8') as f:
+                a_copier.update({posixpath.normpath(posixpath.join(posixpath.dirname(ref), url))
+                                 for url in _REF_CSS.findall(f.read())
+                                 if not re.match(r'^([a-z]+:|/|#)', url)} - vues)
+        if os.path.exists(cible) and os.path.getmtime(cible) >= os.path.getmtime(source):
+            continue
+        os.makedirs(os.path.dirname(cible), exist_ok=True)
+        shutil.copy2(source, cible)
+        copies += 1
+    return copies
+
+
+def exporter(dossier, url_base='http://localhost/', complet=False):
+    """Rend les pages publiques dans dossier ; retourne un bilan chiffré."""
+    app = current_app._get_current_object()
+    chemin_manifeste = os.path.join(dossier, MANIFESTE)
+    manifeste = {}
+    if not complet and os.path.exists(chemin_manifeste):
+        with open(chemin_manifeste) as f:
+            manifeste = json.load(f)
+    complet = complet or not manifeste
+    bilan = {'rendues': 0, 'copies': 0, 'supprimees': 0, 'flux': 0}
+
+    # Les pages statiques gardent des numéros de page : les curseurs ?apres= ne
+    # correspondent à aucun fichier
+    cache_actif, cache_pages.actif = cache_pages.actif, False
+    mode, app.config['PAGINATION_MODE'] = app.config['PAGINATION_MODE'], 'pages'
+    try:
+        with app.app_context():
+            etat = _etat_articles()
+            ancien = manifeste.get('articles', {})
+            categories = list(CATEGORIES) + sorted(
+                {a['categorie'] for a in etat.values()} - set(CATEGORIES) - {None})
+            listes = _pages_listes(etat, categories)
+            fixes = {'/': ('index', {}), '/timeline': ('timeline', {}),
+                     '/ressources': ('ressources', {}), '/a-propos': ('a_propos', {})}
+            articles = {f"/article/{a['slug']}": id for id, a in etat.items()}
+
+            # Pages à rendre
+            if complet:
+                a_rendre = set(fixes) | set(listes)
+                ids = set(etat)
+            else:
+                changes = {id for id in etat.keys() | ancien.keys()
+                           if etat.get(id, {}).get('empreinte') != ancien.get(id, {}).get('empreinte')}
+                ids = {id for id in changes if id in etat}
+                cats = set()
+                for id in changes:
+                    for version in (ancien.get(id), etat.get(id)):
+                        if version:
+                            cats.add(version['categorie'])
+                            if version['jour'] is not None:
+                                ids |= _voisins(etat, version['jour'])
+                a_rendre = {'/timeline', '/ressources', '/a-propos'}
+                if changes:
+                    a_rendre |= {'/'} | {c for c, (vue, args) in listes.items()
+                                         if vue == 'journal' or args.get('cat') in cats}
+                    # Nouvelles pages de liste apparues depuis le dernier export
+                    a_rendre |= set(listes) - set(manifeste.get('pages', []))
+
+            for chemin in sorted(a_rendre):
+                vue, args = {**fixes, **listes}[chemin]
+                with app.test_request_context(chemin, base_url=url_base):
+                    html = app.make_response(app.view_functions[vue](**args)).get_data(as_text=True)
+                bilan['copies'] += _ecrire(dossier, chemin, html)
+                bilan['rendues'] += 1
+            for id in sorted(ids, key=int):
+                art = db.session.get(Article, int(id))
+                chemin = f'/article/{art.slug}'
+                with app.test_request_context(chemin, base_url=url_base):
+                    html = _rendre_article(art)
+                bilan['copies'] += _ecrire(dossier, chemin, html)
+                bilan['rendues'] += 1
+            bilan['flux'] = _ecrire_flux(dossier, url_base)
+    finally:
+        cache_pages.actif = cache_actif
+        app.config['PAGINATION_MODE'] = mode
+
+    # Pages disparues : articles supprimés ou dépubliés, pages de liste en trop
+    pages = set(fixes) | set(listes) | set(articles)
+    for chemin in set(manifeste.get('pages', [])) - pages:
+        fichier = _fichier(dossier, chemin)
+        if os.path.exists(fichier):
+            os.remove(fichier)
+            try:
+                os.removedirs(os.path.dirname(fichier))
+            except OSError:
+                pass
+            bilan['supprimees'] += 1
+
+    with open(chemin_manifeste, 'w') as f:
+        json.dump({'articles': etat, 'pages': sorted(pages)}, f)
+    return bilan
+
+
+def _ecrire_flux(dossier, url_base):
+    """Flux Atom et sitemap, que toutes les pages citent ; retourne le nombre de flux Atom écrits."""
+    with current_app.test_request_context(base_url=url_base):
+        construire_flux(chemin=os.path.join(dossier, 'feed.xml'))
+        for cat in CATEGORIES:
+            construire_flux(cat, chemin=os.path.join(dossier, 'categorie', cat, 'feed.xml'))
+        construire_sitemap(dossier)
+    return len(CATEGORIES) + 1
+
+
+def _ecrire(dossier, chemin, html):
+    fichier = _fichier(dossier, chemin)
+    os.makedirs(os.path.dirname(fichier), exist_ok=True)
+    with open(fichier, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return _copier_statiques(html, dossier)
@@ -0,0 +1,71 @@
+"""Flux Atom et sitemap XML, écrits sur disque par morceaux.
+
+Les générateurs ci-dessous produisent le XML morceau par morceau ; ecrire()
+le range dans un fichier temporaire puis le remplace d'un coup, de sorte
+qu'un worker qui sert le fichier au même moment lit l'ancienne ou la nouvelle
+version, jamais un mélange.
+"""
+import os
+import uuid
+from xml.sax.saxutils import escape, quoteattr
+
+LIMITE_SITEMAP = 50000  # URLs par fichier, limite du protocole sitemaps.org
+
+
+def date_w3c(dt):
+    return dt.replace(microsecond=0).isoformat() + 'Z'
+
+
+def atom(titre, lien, lien_flux, entrees, mis_a_jour, auteur):
+    """Flux Atom 1.0.
+
+    entrees : dicts {'titre', 'lien', 'publie', 'modifie', 'resume',
+    'contenu_html', 'categories'}, du plus récent au plus ancien. auteur :
+    nom de l'auteur du flux, que les entrées sans auteur propre reprennent
+    (RFC 4287, 4.1.1).
+    """
+    yield '<?xml version="1.0" encoding="utf-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">\n'
+    yield f'<title>{escape(titre)}</title>\n<id>{escape(lien_flux)}</id>\n'
+    yield f'<author><name>{escape(auteur)}</name></author>\n'
+    yield f'<link href={quoteattr(lien)}/>\n<link rel="self" href={quoteattr(lien_flux)}/>\n'
+    yield f'<updated>{date_w3c(mis_a_jour)}</updated>\n'
+    for e in entrees:
+        yield (f'<entry>\n<title>{escape(e["titre"])}</title>\n<id>{escape(e["lien"])}</id>\n'
+               f'<link href={quoteattr(e["lien"])}/>\n'
+               f'<published>{date_w3c(e["publie"])}</published>\n'
+               f'<updated>{date_w3c(e["modifie"])}</updated>\n')
+        for categorie in e['categories']:
+            yield f'<category term={quoteattr(categorie)}/>\n'
+        if e['resume']:
+            yield f'<summary>{escape(e["resume"])}</summary>\n'
+        yield f'<content type="html">{escape(e["contenu_html"] or "")}</content>\n</entry>\n'
+    yield '</feed>\n'
+
+
+def sitemap(urls):
+    """urls : (adresse, date de modification ou None)."""
+    yield '<?xml version="1.0" encoding="utf-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    for adresse, modif in urls:
+        lastmod = f'<lastmod>{date_w3c(modif)}</lastmod>' if modif else ''
+        yield f'<url><loc>{escape(adresse)}</loc>{lastmod}</url>\n'
+    yield '</urlset>\n'
+
+
+def index_sitemaps(adresses):
+    yield '<?xml version="1.0" encoding="utf-8"?>\n<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    for adresse in adresses:
+        yield f'<sitemap><loc>{escape(adresse)}</loc></sitemap>\n'
+    yield '</sitemapindex>\n'
+
+
+def ecrire(chemin, morceaux):
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    temporaire = f'{chemin}.{uuid.uuid4().hex}.tmp'
+    try:
+        with open(temporaire, 'w', encoding='utf-8') as f:
+            f.writelines(morceaux)
+        os.replace(temporaire, chemin)
+    except BaseException:
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+        raise
@@ -0,0 +1,111 @@
+"""Variantes d'images générées à l'upload.
+
+Pour chaque image : plusieurs largeurs en WebP et dans le format d'origine,
+plus une miniature floue de quelques centaines d'octets (data URI) affichée
+pendant le chargement. Le travail tourne dans un pool de threads pour ne pas
+bloquer la requête d'upload. Pillow est optionnel : sans lui, les images sont
+servies telles qu'uploadées.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import base64
+import importlib.util
+import io
+import os
+import threading
+
+# Pillow n'est importé qu'au premier traitement : les workers qui ne font que servir des pages s'en passent
+DISPONIBLE = importlib.util.find_spec('PIL') is not None
+LARGEURS = (320, 640, 960, 1280, 1920)
+FORMATS = {'jpg': 'JPEG', 'jpeg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP'}  # GIF (animés) exclus
+QUALITE = 80
+DOSSIER_VARIANTES = 'variantes'
+
+_pool = None
+_verrou = threading.Lock()
+
+
+def _reinitialiser_pool():
+    global _pool, _verrou
+    _pool, _verrou = None, threading.Lock()
+
+os.register_at_fork(after_in_child=_reinitialiser_pool)
+
+
+def en_arriere_plan(fonction, *args, workers=2):
+    """Soumet fonction(*args) au pool de traitement d'images du processus."""
+    global _pool
+    with _verrou:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='images')
+        return _pool.submit(fonction, *args)
+
+
+def traitable(nom_fichier):
+    return DISPONIBLE and nom_fichier.rsplit('.', 1)[-1].lower() in FORMATS
+
+
+def generer_variantes(dossier_uploads, nom_fichier, largeurs=LARGEURS):
+    """Écrit les variantes de uploads/nom_fichier dans uploads/variantes/.
+
+    Retourne un dict : largeur, hauteur de l'original, liste des variantes
+    ({'fichier', 'largeur', 'format'}, chemins relatifs à uploads/) et
+    placeholder (data URI JPEG flouté).
+    """
+    from PIL import Image, ImageFilter, ImageOps
+    ext = nom_fichier.rsplit('.', 1)[-1].lower()
+    base = nom_fichier.rsplit('.', 1)[0]
+    os.makedirs(os.path.join(dossier_uploads, DOSSIER_VARIANTES), exist_ok=True)
+    with Image.open(os.path.join(dossier_uploads, nom_fichier)) as source:
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    largeur, hauteur = image.size
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    tailles = [l for l in largeurs if l < largeur] + [min(largeur, max(largeurs))]
+    formats = ['webp'] if ext == 'webp' else ['webp', ext]
+    variantes = []
+    for l in sorted(set(tailles)):
+        reduite = image.resize((l, max(1, round(hauteur * l / largeur))), Image.LANCZOS)
+        for fmt in formats:
+            fichier = f'{DOSSIER_VARIANTES}/{base}-{l}.{fmt}'
+            copie = reduite.convert('RGB') if FORMATS[fmt] == 'JPEG' else reduite
+            copie.save(os.path.join(dossier_uploads, fichier), FORMATS[fmt],
+                       quality=QUALITE, optimize=True)
+            variantes.append({'fichier': fichier, 'largeur': l, 'format': fmt})
+
+    miniature = image.convert('RGB')
+    miniature.thumbnail((16, 16))
+    tampon = io.BytesIO()
+    miniature.filter(ImageFilter.GaussianBlur(1)).save(tampon, 'JPEG', quality=40)
+    placeholder = 'data:image/jpeg;base64,' + base64.b64encode(tampon.getvalue()).decode()
+    return {'largeur': largeur, 'hauteur': hauteur, 'variantes': variantes, 'placeholder': placeholder}
+
+
+def supprimer_variantes(dossier_uploads, variantes):
+    for v in variantes or ():
+        chemin = os.path.join(dossier_uploads, v['fichier'])
+        if os.path.exists(chemin):
+            os.remove(chemin)
+
+
+class ImageResponsive:
+    """Ce dont les templates ont besoin pour écrire srcset et la miniature floue."""
+    def __init__(self, nom_fichier, largeur, hauteur, variantes, placeholder):
+        self.nom_fichier = nom_fichier
+        self.largeur = largeur
+        self.hauteur = hauteur
+        self.variantes = variantes
+        self.placeholder = placeholder
+        ext = nom_fichier.rsplit('.', 1)[-1].lower()
+        self.format = 'webp' if ext == 'webp' else ext
+
+    def srcset(self, fmt, url):
+        return ', '.join(f"{url(v['fichier'])} {v['largeur']}w"
+                         for v in self.variantes if v['format'] == fmt)
+
+    @property
+    def repli(self):
+        """Plus grande variante au format d'origine, pour les navigateurs sans srcset."""
+        return max((v for v in self.variantes if v['format'] == self.format),
+                   key=lambda v: v['largeur'])['fichier']
@@ -0,0 +1,202 @@
+"""Mesures des requêtes, exposées au format texte de Prometheus.
+
+Pour chaque endpoint : histogrammes de la durée totale, du nombre et de la
+durée des requêtes SQL, et du temps de rendu Jinja. Les requêtes plus lentes
+qu'un seuil sont journalisées avec ce détail, et un administrateur peut
+profiler une requête en lui ajoutant ?profiler=1 : un échantillonneur relève
+la pile du thread toutes les quelques millisecondes et écrit les piles
+agrégées (format « collapsed » des flamegraphs) dans un fichier.
+
+Les compteurs sont propres au processus, comme le compteur de vues : avec
+plusieurs workers, chaque collecte Prometheus en voit un seul.
+"""
+from collections import Counter
+import os
+import sys
+import threading
+import time
+
+from flask import current_app, g, has_app_context, request, session, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+BORNES_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BORNES_NOMBRE = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _etiquettes(etiquettes):
+    def echapper(v):
+        return str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{k}="{echapper(v)}"' for k, v in etiquettes)
+
+
+class Histogramme:
+    def __init__(self, nom, aide, bornes):
+        self.nom = nom
+        self.aide = aide
+        self.bornes = bornes
+        self._series = {}  # étiquettes -> [cumuls par borne..., somme, nombre]
+        self._verrou = threading.Lock()
+
+    def observer(self, valeur, **etiquettes):
+        cle = tuple(sorted(etiquettes.items()))
+        with self._verrou:
+            serie = self._series.get(cle)
+            if serie is None:
+                serie = self._series[cle] = [0] * len(self.bornes) + [0, 0]
+            for i, borne in enumerate(self.bornes):
+                if valeur <= borne:
+                    serie[i] += 1
+            serie[-2] += valeur
+            serie[-1] += 1
+
+    def exposer(self):
+        lignes = [f'# HELP {self.nom} {self.aide}', f'# TYPE {self.nom} histogram']
+        with self._verrou:
+            series = {cle: list(serie) for cle, serie in self._series.items()}
+        for cle, serie in sorted(series.items()):
+            for borne, cumul in zip(self.bornes + ('+Inf',), serie[:len(self.bornes)] + [serie[-1]]):
+                lignes.append(f'{self.nom}_bucket{{{_etiquettes(cle + (("le", borne),))}}} {cumul}')
+            lignes.append(f'{self.nom}_sum{{{_etiquettes(cle)}}} {round(serie[-2], 6)}')
+            lignes.append(f'{self.nom}_count{{{_etiquettes(cle)}}} {serie[-1]}')
+        return lignes
+
+
+class Echantillonneur(threading.Thread):
+    """Relève la pile d'un autre thread à intervalle régulier."""
+    def __init__(self, cible, intervalle=0.002):
+        super().__init__(daemon=True, name='profiler')
+        self.cible = cible
+        self.intervalle = intervalle
+        self.piles = Counter()
+        self._arret = threading.Event()
+
+    def run(self):
+        while not self._arret.wait(self.intervalle):
+            frame = sys._current_frames().get(self.cible)
+            pile = []
+            while frame is not None:
+                code = frame.f_code
+                pile.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            if pile:
+                self.piles[';'.join(reversed(pile))] += 1
+
+    def arreter(self):
+        self._arret.set()
+        self.join()
+        return self.piles
+
+
+class Mesures:
+    """Instrumentation optionnelle : rien n'est mesuré tant que MESURES_ACTIVES est faux."""
+    def __init__(self, app=None):
+        self.duree = Histogramme('robotblog_requete_duree_secondes',
+                                 'Durée de traitement des requêtes HTTP.', BORNES_DUREE)
+        self.sql_nombre = Histogramme('robotblog_requete_sql_nombre',
+                                      'Requêtes SQL émises par requête HTTP.', BORNES_NOMBRE)
+        self.sql_duree = Histogramme('robotblog_requete_sql_duree_secondes',
+                                     'Temps passé en SQL par requête HTTP.', BORNES_DUREE)
+        self.rendu_duree = Histogramme('robotblog_requete_rendu_duree_secondes',
+                                       'Temps de rendu des templates Jinja par requête HTTP.', BORNES_DUREE)
+        # Sur la classe Engine : couvre toutes les connexions, présentes et futures
+        event.listen(Engine, 'before_cursor_execute', self._debut_sql)
+        event.listen(Engine, 'after_cursor_execute', self._fin_sql)
+        event.listen(Engine, 'handle_error', self._erreur_sql)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._debut)
+        app.after_request(self._fin)
+        app.teardown_request(self._abandonner)
+        before_render_template.connect(self._debut_rendu, app)
+        template_rendered.connect(self._fin_rendu, app)
+
+    @staticmethod
+    def _courante():
+        return g.get('_mesure') if has_app_context() else None
+
+    def _debut(self):
+        if not current_app.config['MESURES_ACTIVES']:
+            return
+        g._mesure = mesure = {'debut': time.perf_counter(), 'sql': 0, 'sql_duree': 0.0,
+                              'rendu': 0.0, 'rendus': [], 'profil': None}
+        if request.args.get('profiler') and session.get('admin'):
+            mesure['profil'] = Echantillonneur(threading.get_ident())
+            mesure['profil'].start()
+
+    def _fin(self, reponse):
+        mesure = self._courante()
+        if mesure is None:
+            return reponse
+        duree = time.perf_counter() - mesure['debut']
+        endpoint = request.endpoint or 'inconnu'
+        self.duree.observer(duree, endpoint=endpoint)
+        self.sql_nombre.observer(mesure['sql'], endpoint=endpoint)
+        self.sql_duree.observer(mesure['sql_duree'], endpoint=endpoint)
+        self.rendu_duree.observer(mesure['rendu'], endpoint=endpoint)
+        seuil = current_app.config['MESURES_SEUIL_LENT']
+        if seuil and duree >= seuil:
+            current_app.logger.warning(
+                'Requête lente : %s %s %.3fs (SQL : %d requêtes, %.3fs ; rendu : %.3fs)',
+                request.method, request.full_path.rstrip('?'), duree,
+                mesure['sql'], mesure['sql_duree'], mesure['rendu'])
+        if mesure['profil'] is not None:
+            reponse.headers['X-Profil'] = self._ecrire_profil(mesure['profil'].arreter(), endpoint)
+        g._mesure = None
+        return reponse
+
+    def _abandonner(self, exc):
+        # Requête terminée par une exception : after_request n'a pas été appelé
+        mesure = self._courante()
+        if mesure is not None and mesure['profil'] is not None:
+            mesure['profil'].arreter()
+        if mesure is not None:
+            g._mesure = None
+
+    def _ecrire_profil(self, piles, endpoint):
+        dossier = current_app.config['MESURES_PROFILS']
+        os.makedirs(dossier, exist_ok=True)
+        nom = f'{time.strftime("%Y%m%d-%H%M%S")}-{endpoint}-{os.getpid()}.txt'
+        with open(os.path.join(dossier, nom), 'w') as f:
+            for pile, nombre in piles.most_common():
+                f.write(f'{pile} {nombre}\n')
+        current_app.logger.info('Profil écrit : %s (%d échantillons)', nom, sum(piles.values()))
+        return nom
+
+    def _debut_sql(self, conn, cursor, statement, parameters, context, executemany):
+        if self._courante() is not None:
+            conn.info.setdefault('_mesures_debuts', []).append(time.perf_counter())
+
+    def _fin_sql(self, conn, cursor, statement, parameters, context, executemany):
+        mesure = self._courante()
+        debuts = conn.info.get('_mesures_debuts')
+        if mesure is not None and debuts:
+            mesure['sql'] += 1
+            mesure['sql_duree'] += time.perf_counter() - debuts.pop()
+
+    @staticmethod
+    def _erreur_sql(contexte):
+        debuts = contexte.connection.info.get('_mesures_debuts') if contexte.connection else None
+        if debuts:
+            debuts.pop()
+
+    def _debut_rendu(self, app, template, context, **extra):
+        mesure = self._courante()
+        if mesure is not None:
+            mesure['rendus'].append(time.perf_counter())
+
+    def _fin_rendu(self, app, template, context, **extra):
+        mesure = self._courante()
+        if mesure is not None and mesure['rendus']:
+            debut = mesure['rendus'].pop()
+            # Un rendu imbriqué est déjà compté dans celui qui l'englobe
+            if not mesure['rendus']:
+                mesure['rendu'] += time.perf_counter() - debut
+
+    def exposer(self):
+        lignes = []
+        for histogramme in (self.duree, self.sql_nombre, self.sql_duree, self.rendu_duree):
+            lignes += histogramme.exposer()
+        return '\n'.join(lignes) + '\n'
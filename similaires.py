@@ -0,0 +1,99 @@
+"""Articles similaires par TF-IDF.
+
+Chaque article est réduit à un sac de termes (titre, tags et texte, repliés
+comme slugify()), pondérés par champ. Ces termes sont calculés à
+l'enregistrement ; l'index ci-dessous en tire des vecteurs TF-IDF normalisés
+et cherche les plus proches voisins par cosinus, via un index inversé pour ne
+comparer un article qu'à ceux avec qui il partage au moins un terme.
+idf() et vecteur() servent aussi à la mise à jour incrémentale d'app.py, qui
+garde fréquences et vecteurs en base.
+"""
+from collections import Counter, defaultdict
+import heapq
+import math
+import re
+
+from contenu import replier_accents
+
+POIDS = {'titre': 3, 'tags': 3, 'texte': 1}
+SEUIL = 0.05  # en dessous, deux articles ne sont pas considérés comme liés
+TERMES_MAX = 40  # termes gardés par vecteur : les plus discriminants
+MOTS_VIDES = set('''
+    au aux avec ce ces cet cette dans de des du elle en et eux il ils je la le les leur leurs lui ma mais
+    me meme mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi
+    ton tu un une vos votre vous est sont ete etre avoir ai as avons avez ont fait faire plus moins tres
+    tout tous toute toutes comme aussi alors donc ici la puis bien encore deja peu sans sous entre vers
+    chez apres avant cela ca si non oui y a d l j c s n m qu
+'''.split())
+
+
+def mots(texte):
+    return [m for m in re.findall(r'[a-z0-9]+', replier_accents(texte or ''))
+            if len(m) > 1 and m not in MOTS_VIDES]
+
+
+def termes(titre, tags, texte):
+    """Sac de termes pondéré d'un article : {terme: poids}."""
+    compte = Counter()
+    for champ, valeur in (('titre', titre), ('tags', tags), ('texte', texte)):
+        for mot in mots(valeur):
+            compte[mot] += POIDS[champ]
+    return dict(compte)
+
+
+def idf(n, df):
+    """Poids IDF d'un terme présent dans df documents sur n."""
+    return math.log((1 + n) / (1 + df)) + 1
+
+
+def vecteur(sac, idfs):
+    """Vecteur TF-IDF normalisé d'un sac de termes, {terme: poids}."""
+    # Tronqué à ses TERMES_MAX plus forts poids : les mots communs à tout le
+    # corpus n'apportent rien au cosinus mais allongent toutes les listes
+    # de l'index inversé
+    poids = ((t, (1 + math.log(tf)) * idfs[t]) for t, tf in sac.items() if tf > 0)
+    vecteur = dict(heapq.nlargest(TERMES_MAX, poids, key=lambda tp: tp[1]))
+    norme = math.sqrt(sum(p * p for p in vecteur.values())) or 1.0
+    return {t: p / norme for t, p in vecteur.items()}
+
+
+def plus_proches(scores, k):
+    """Les k meilleurs scores au-dessus du SEUIL : [(score, id)], du plus proche au moins proche."""
+    return heapq.nlargest(k, ((s, autre) for autre, s in scores.items() if s >= SEUIL))
+
+
+class Index:
+    """Vecteurs TF-IDF d'un ensemble d'articles, {id: termes}."""
+    def __init__(self, documents):
+        self.frequences = Counter()
+        for sac in documents.values():
+            self.frequences.update(sac.keys())
+        n = len(documents)
+        self.idf = {t: idf(n, df) for t, df in self.frequences.items()}
+        self.vecteurs = {id: vecteur(sac, self.idf) for id, sac in documents.items()}
+        self.inverse = defaultdict(list)
+        for id, vecteur_id in self.vecteurs.items():
+            for terme, poids in vecteur_id.items():
+                self.inverse[terme].append((id, poids))
+
+    def __contains__(self, id):
+        return id in self.vecteurs
+
+    def __iter__(self):
+        return iter(self.vecteurs)
+
+    def __len__(self):
+        return len(self.vecteurs)
+
+    def similarites(self, id):
+        """Cosinus entre id et chaque article qui partage un terme avec lui."""
+        scores = defaultdict(float)
+        for terme, poids in self.vecteurs.get(id, {}).items():
+            for autre, poids_autre in self.inverse[terme]:
+                if autre != id:
+                    scores[autre] += poids * poids_autre
+        return scores
+
+    def voisins(self, id, k, scores=None):
+        """Les k articles les plus proches de id : [(score, id voisin)], du plus proche au moins proche."""
+        return plus_proches(self.similarites(id) if scores is None else scores, k)
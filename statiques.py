@@ -0,0 +1,264 @@
+"""Feuilles de style et polices empreintées, précompressées, et compression des réponses.
+
+`flask construire-statiques` lit les feuilles de static/css/ (celles dont le
+nom commence par _ ne sont qu'incluses), y intègre les @import, les minifie
+et écrit chacune sous un nom tiré de son contenu, static/dist/site.<empreinte>.css,
+à côté de ses versions gzip et, si le module brotli est installé, brotli.
+Les polices de static/fonts/ reçoivent aussi une empreinte. Le manifeste
+associe chaque source à son nom empreinté, et url_for('static', filename='css/site.css')
+donne alors l'URL empreintée : un changement de contenu change l'URL, ces
+fichiers sont donc servis avec un cache immuable d'un an. Sans manifeste, ou
+en debug, les sources sont servies telles quelles. Les anciennes versions
+restent dans static/dist/ pour les pages encore en cache qui les citent.
+
+La construction fait partie du déploiement. Le dépôt ne contient pas les
+fichiers woff2, que --polices télécharge ; une police absente n'est que
+signalée : la feuille construite ne garde que son local() et le navigateur
+se rabat sur une police système. Avec STATIQUES_EXIGEES, un worker refuse en
+revanche de démarrer sans les feuilles de style construites.
+
+Les réponses texte (HTML, XML, JSON) sont compressées en gzip quand le
+client l'accepte.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import urllib.request
+
+from flask import current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+SOURCES = 'css'
+POLICES = 'fonts'
+DIST = 'dist'
+MANIFESTE = 'manifeste.json'
+CACHE_IMMUABLE = 365 * 24 * 3600
+TYPES_COMPRESSIBLES = {'text/html', 'text/css', 'text/plain', 'text/xml', 'application/xml',
+                       'application/atom+xml', 'application/json', 'application/javascript'}
+
+# Axes de graisse en plage : Google Fonts renvoie alors une police variable, un fichier par sous-ensemble
+POLICES_GOOGLE = ('https://fonts.googleapis.com/css2?family=Inter:wght@300..700'
+                  '&family=JetBrains+Mono:wght@400..500&display=swap')
+# woff2 n'est proposé qu'aux navigateurs qui le déclarent
+AGENT_WOFF2 = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+_CHAINES = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+_IMPORT = re.compile(r'''@import\s+(?:url\()?\s*['"]?([^'")\s]+)['"]?\s*\)?\s*;''')
+_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+_EXTERNE = re.compile(r'^([a-z]+:|/|#)')
+
+
+def minifier_css(css):
+    """Retire commentaires et espaces superflus, sans toucher aux chaînes."""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    morceaux = _CHAINES.split(css)
+    for i in range(0, len(morceaux), 2):
+        texte = re.sub(r'\s+', ' ', morceaux[i])
+        texte = re.sub(r'\s*([{};,>])\s*', r'\1', texte)
+        # Pas d'espace retiré avant « : », qui distingue « a :hover » de « a:hover »
+        morceaux[i] = re.sub(r':\s+', ':', texte).replace(';}', '}')
+    return ''.join(morceaux).strip()
+
+
+def _empreinte(donnees):
+    return hashlib.sha256(donnees).hexdigest()[:12]
+
+
+def _nom_empreinte(chemin, donnees):
+    base, ext = posixpath.splitext(chemin)
+    return f'{base}.{_empreinte(donnees)}{ext}'
+
+
+class Statiques:
+    def __init__(self, app=None):
+        self.dossier = None
+        self.manifeste = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.dossier = app.static_folder
+        self.charger()
+        app.url_defaults(self._empreinter)
+        app.view_functions['static'] = self.servir
+        app.after_request(self._compresser)
+
+    @property
+    def chemin_manifeste(self):
+        return os.path.join(self.dossier, DIST, MANIFESTE)
+
+    def charger(self):
+        try:
+            with open(self.chemin_manifeste) as f:
+                self.manifeste = json.load(f)
+        except (OSError, ValueError):
+            self.manifeste = {}
+        return self.manifeste
+
+    def _empreinter(self, endpoint, valeurs):
+        if endpoint == 'static' and current_app.config['STATIQUES_EMPREINTES'] and not current_app.debug:
+            nom = self.manifeste.get(valeurs.get('filename'))
+            if nom:
+                valeurs['filename'] = nom
+
+    # ─── Construction ───
+    def construire(self, afficher=print):
+        """Écrit static/dist/ et son manifeste ; retourne le manifeste."""
+        manifeste, self._absents = {}, set()
+        dossier_polices = os.path.join(self.dossier, POLICES)
+        if os.path.isdir(dossier_polices):
+            for nom in sorted(os.listdir(dossier_polices)):
+                with open(os.path.join(dossier_polices, nom), 'rb') as f:
+                    donnees = f.read()
+                cible = _nom_empreinte(posixpath.join(DIST, POLICES, nom), donnees)
+                self._ecrire(cible, donnees, compresser=False)
+                manifeste[posixpath.join(POLICES, nom)] = cible
+        for nom in sorted(os.listdir(os.path.join(self.dossier, SOURCES))):
+            if not nom.endswith('.css') or nom.startswith('_'):
+                continue
+            source = posixpath.join(SOURCES, nom)
+            css = minifier_css(self._assembler(source, manifeste, afficher)).encode()
+            cible = _nom_empreinte(posixpath.join(DIST, nom), css)
+            self._ecrire(cible, css)
+            manifeste[source] = cible
+            afficher(f'  {source} -> {cible} ({len(css)} octets)')
+        os.makedirs(os.path.dirname(self.chemin_manifeste), exist_ok=True)
+        temporaire = self.chemin_manifeste + '.tmp'
+        with open(temporaire, 'w') as f:
+            json.dump(manifeste, f, indent=2, sort_keys=True)
+        os.replace(temporaire, self.chemin_manifeste)
+        self.manifeste = manifeste
+        return manifeste
+
+    def _assembler(self, source, manifeste, afficher):
+        """CSS de source, @import intégrés et url() pointées vers les fichiers empreintés de dist/."""
+        with open(os.path.join(self.dossier, source), encoding='utf-8') as f:
+            css = f.read()
+        dossier = posixpath.dirname(source)
+
+        def importer(m):
+            return self._assembler(posixpath.normpath(posixpath.join(dossier, m.group(1))), manifeste, afficher)
+
+        def reecrire(m):
+            url = m.group(2)
+            # Les @import sont intégrés ensuite, avec leurs propres url() déjà réécrites
+            if _EXTERNE.match(url) or url.endswith('.css'):
+                return m.group(0)
+            cible = posixpath.normpath(posixpath.join(dossier, url))
+            if cible not in manifeste:
+                if cible not in self._absents:
+                    afficher(f'  attention : {cible} (cité par {source}) introuvable')
+                    self._absents.add(cible)
+                return 'url()'
+            return f"url('{posixpath.relpath(manifeste[cible], DIST)}')"
+
+        css = _URL.sub(reecrire, css)
+        css = _IMPORT.sub(importer, css)
+        # Police absente : seule la source local() reste
+        return re.sub(r',\s*url\(\)\s*format\([^)]*\)', '', css)
+
+    def manquants(self, polices=True):
+        """Feuilles de style et fichiers qu'elles citent (polices) absents du manifeste."""
+        cites = set()
+        for nom in os.listdir(os.path.join(self.dossier, SOURCES)):
+            if not nom.endswith('.css'):
+                continue
+            if not nom.startswith('_'):
+                cites.add(posixpath.join(SOURCES, nom))
+            if not polices:
+                continue
+            with open(os.path.join(self.dossier, SOURCES, nom), encoding='utf-8') as f:
+                css = f.read()
+            cites.update(posixpath.normpath(posixpath.join(SOURCES, m.group(2))) for m in _URL.finditer(css)
+                         if not _EXTERNE.match(m.group(2)) and not m.group(2).endswith('.css'))
+        return sorted(cites - self.manifeste.keys())
+
+    def _ecrire(self, chemin, donnees, compresser=True):
+        complet = os.path.join(self.dossier, *chemin.split('/'))
+        if os.path.exists(complet):
+            return
+        os.makedirs(os.path.dirname(complet), exist_ok=True)
+        variantes = [('', donnees)]
+        if compresser:
+            variantes.append(('.gz', gzip.compress(donnees, compresslevel=9, mtime=0)))
+            if brotli is not None:
+                variantes.append(('.br', brotli.compress(donnees, quality=11)))
+        # Le fichier non compressé en dernier : sa présence marque une version complète
+        for extension, contenu in reversed(variantes):
+            with open(complet + extension + '.tmp', 'wb') as f:
+                f.write(contenu)
+            os.replace(complet + extension + '.tmp', complet + extension)
+
+    def telecharger_polices(self, afficher=print):
+        """Télécharge le sous-ensemble latin des polices dans static/fonts/."""
+        def lire(url):
+            with urllib.request.urlopen(urllib.request.Request(url, headers={'User-Agent': AGENT_WOFF2}),
+                                        timeout=30) as r:
+                return r.read()
+
+        css = lire(POLICES_GOOGLE).decode()
+        dossier = os.path.join(self.dossier, POLICES)
+        os.makedirs(dossier, exist_ok=True)
+        noms = []
+        for bloc in re.findall(r'/\*\s*latin\s*\*/\s*@font-face\s*\{(.*?)\}', css, re.S):
+            famille = re.search(r"font-family:\s*'([^']+)'", bloc).group(1)
+            nom = f"{famille.lower().replace(' ', '-')}-latin.woff2"
+            if nom in noms:
+                continue
+            with open(os.path.join(dossier, nom), 'wb') as f:
+                f.write(lire(_URL.search(bloc).group(2)))
+            noms.append(nom)
+            afficher(f'  {POLICES}/{nom}')
+        return noms
+
+    # ─── Service ───
+    def servir(self, filename):
+        """Vue static : les fichiers de dist/ sont servis précompressés si possible, en cache immuable."""
+        if not filename.startswith(DIST + '/'):
+            return current_app.send_static_file(filename)
+        type_mime = mimetypes.guess_type(filename)[0]
+        reponse = None
+        for encodage, extension in (('br', '.br'), ('gzip', '.gz')):
+            chemin = safe_join(self.dossier, filename + extension)
+            if request.accept_encodings[encodage] and chemin and os.path.isfile(chemin):
+                reponse = send_from_directory(self.dossier, filename + extension, mimetype=type_mime)
+                reponse.headers['Content-Encoding'] = encodage
+                break
+        if reponse is None:
+            reponse = send_from_directory(self.dossier, filename, mimetype=type_mime)
+        reponse.vary.add('Accept-Encoding')
+        reponse.cache_control.no_cache = None
+        reponse.cache_control.public = True
+        reponse.cache_control.max_age = CACHE_IMMUABLE
+        reponse.cache_control.immutable = True
+        return reponse
+
+    def _compresser(self, reponse):
+        config = current_app.config
+        if (not config['COMPRESSION_ACTIVE'] or reponse.mimetype not in TYPES_COMPRESSIBLES
+                or reponse.direct_passthrough or reponse.is_streamed
+                or reponse.status_code < 200 or 'Content-Encoding' in reponse.headers):
+            return reponse
+        # Un 304 porte le même Vary que la réponse complète qu'il valide
+        reponse.vary.add('Accept-Encoding')
+        if reponse.status_code in (204, 206, 304) or not request.accept_encodings['gzip']:
+            return reponse
+        donnees = reponse.get_data()
+        if len(donnees) < config['COMPRESSION_TAILLE_MIN']:
+            return reponse
+        reponse.set_data(gzip.compress(donnees, compresslevel=config['COMPRESSION_NIVEAU'], mtime=0))
+        reponse.headers['Content-Encoding'] = 'gzip'
+        # Le corps envoyé n'est plus celui que désigne l'ETag : il devient faible, comme le fait nginx
+        etag, faible = reponse.get_etag()
+        if etag and not faible:
+            reponse.set_etag(etag, weak=True)
+        return reponse
@@ -0,0 +1,178 @@
+"""Stockage des uploads par contenu.
+
+Les fichiers sont copiés par blocs de taille fixe en calculant leur SHA-256
+au passage, puis rangés sous le nom <sha256>.<ext> : deux uploads identiques
+partagent le même fichier sur disque.
+
+Les gros fichiers (vidéos) peuvent être envoyés en plusieurs morceaux, avec
+reprise : chaque téléversement en cours est un fichier .part (les octets déjà
+reçus) et un .json (nom et taille annoncés) dans uploads/.partiels/, visibles
+de tous les workers. Un morceau s'écrit sous verrou exclusif du .part : deux
+envois au même offset (un client qui réessaie après un délai dépassé) ne
+s'ajoutent pas l'un à l'autre. Les téléversements abandonnés sont supprimés
+après duree_max secondes sans nouveau morceau.
+"""
+import hashlib
+import json
+import os
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+TAILLE_BLOC = 1024 * 1024
+DOSSIER_PARTIELS = '.partiels'
+
+
+class ErreurTeleversement(Exception):
+    """Morceau refusé ; `recu` indique où le client doit reprendre."""
+    def __init__(self, message, recu=None):
+        super().__init__(message)
+        self.recu = recu
+
+
+def copier_par_blocs(flux, sortie, empreinte=None, limite=None):
+    """Copie flux dans sortie bloc par bloc ; retourne le nombre d'octets copiés."""
+    taille = 0
+    while True:
+        bloc = flux.read(TAILLE_BLOC)
+        if not bloc:
+            return taille
+        taille += len(bloc)
+        if limite is not None and taille > limite:
+            raise ErreurTeleversement('Fichier trop volumineux')
+        if empreinte is not None:
+            empreinte.update(bloc)
+        sortie.write(bloc)
+
+
+def empreinte_fichier(chemin):
+    empreinte = hashlib.sha256()
+    with open(chemin, 'rb') as f:
+        for bloc in iter(lambda: f.read(TAILLE_BLOC), b''):
+            empreinte.update(bloc)
+    return empreinte.hexdigest()
+
+
+def _dossier_partiels(dossier):
+    chemin = os.path.join(dossier, DOSSIER_PARTIELS)
+    os.makedirs(chemin, exist_ok=True)
+    return chemin
+
+
+def ranger(dossier, temporaire, empreinte, ext):
+    """Déplace temporaire vers <empreinte>.<ext>, ou le supprime si ce contenu est déjà stocké."""
+    nom = f'{empreinte}.{ext}'
+    cible = os.path.join(dossier, nom)
+    if os.path.exists(cible):
+        os.remove(temporaire)
+    else:
+        os.replace(temporaire, cible)
+    return nom
+
+
+def stocker_flux(dossier, flux, ext, limite=None):
+    """Écrit un flux dans le stockage ; retourne (nom de fichier, empreinte, taille)."""
+    temporaire = os.path.join(_dossier_partiels(dossier), f'{uuid.uuid4().hex}.tmp')
+    empreinte = hashlib.sha256()
+    try:
+        with open(temporaire, 'wb') as sortie:
+            taille = copier_par_blocs(flux, sortie, empreinte, limite)
+    except BaseException:
+        os.remove(temporaire)
+        raise
+    return ranger(dossier, temporaire, empreinte.hexdigest(), ext), empreinte.hexdigest(), taille
+
+
+class Televersements:
+    """Téléversements en plusieurs morceaux, repris là où ils se sont arrêtés."""
+    def __init__(self, dossier, taille_max, duree_max=24 * 3600):
+        self.dossier = dossier
+        self.taille_max = taille_max
+        self.duree_max = duree_max
+
+    def _chemins(self, id):
+        if not id.isalnum():
+            raise ErreurTeleversement('Téléversement inconnu')
+        base = os.path.join(_dossier_partiels(self.dossier), id)
+        return base + '.part', base + '.json'
+
+    def creer(self, nom, taille):
+        if taille <= 0 or taille > self.taille_max:
+            raise ErreurTeleversement('Taille invalide')
+        self.nettoyer()
+        id = uuid.uuid4().hex
+        partiel, meta = self._chemins(id)
+        open(partiel, 'wb').close()
+        with open(meta, 'w') as f:
+            json.dump({'nom': nom, 'taille': taille}, f)
+        return id
+
+    def etat(self, id):
+        partiel, meta = self._chemins(id)
+        try:
+            with open(meta) as f:
+                infos = json.load(f)
+        except OSError:
+            raise ErreurTeleversement('Téléversement inconnu')
+        infos['recu'] = os.path.getsize(partiel)
+        return infos
+
+    def ajouter(self, id, debut, flux):
+        """Ajoute un morceau commençant à l'octet debut ; retourne l'état mis à jour."""
+        infos = self.etat(id)
+        if debut != infos['recu']:
+            raise ErreurTeleversement('Morceau hors séquence', infos['recu'])
+        partiel, meta = self._chemins(id)
+        try:
+            sortie = open(partiel, 'r+b')  # pas 'ab' : ne recrée pas un .part déjà rangé
+        except OSError:
+            raise ErreurTeleversement('Téléversement inconnu')
+        with sortie:
+            if fcntl is not None:
+                # Attend la fin d'un envoi concurrent, puis vérifie à nouveau l'offset
+                fcntl.flock(sortie, fcntl.LOCK_EX)
+            recu = os.fstat(sortie.fileno()).st_size
+            if debut != recu:
+                raise ErreurTeleversement('Morceau hors séquence', recu)
+            sortie.seek(debut)
+            try:
+                copier_par_blocs(flux, sortie, limite=infos['taille'] - debut)
+            except ErreurTeleversement:
+                sortie.truncate(debut)
+                raise ErreurTeleversement('Morceau plus long que annoncé', debut)
+            infos['recu'] = sortie.tell()
+        os.utime(meta)  # activité récente : nettoyer() garde la paire
+        return infos
+
+    def terminer(self, id, ext):
+        """Range le fichier complet ; retourne (nom de fichier, empreinte, taille, nom d'origine)."""
+        infos = self.etat(id)
+        if infos['recu'] != infos['taille']:
+            raise ErreurTeleversement('Téléversement incomplet', infos['recu'])
+        partiel, meta = self._chemins(id)
+        empreinte = empreinte_fichier(partiel)
+        nom = ranger(self.dossier, partiel, empreinte, ext)
+        os.remove(meta)
+        return nom, empreinte, infos['taille'], infos['nom']
+
+    def abandonner(self, id):
+        for chemin in self._chemins(id):
+            if os.path.exists(chemin):
+                os.remove(chemin)
+
+    def nettoyer(self):
+        """Supprime les fichiers partiels sans activité depuis duree_max ; retourne leur nombre."""
+        limite = time.time() - self.duree_max
+        supprimes = 0
+        for entree in os.scandir(_dossier_partiels(self.dossier)):
+            try:
+                if entree.stat().st_mtime < limite:
+                    os.remove(entree.path)
+                    supprimes += 1
+            except OSError:
+                pass
+        return supprimes
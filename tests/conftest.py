@@ -0,0 +1,73 @@
+"""Fixtures communes : une base SQLite neuve par test, cache des pages en mémoire.
+
+Les variables d'environnement sont posées avant create_app(), qui en tire
+la configuration ; l'application est construite une fois pour la session.
+"""
+from datetime import datetime, timedelta
+import os
+import sys
+import tempfile
+
+import pytest
+
+_DOSSIER = tempfile.mkdtemp(prefix='robotblog-tests-')
+_BASE = os.path.join(_DOSSIER, 'robotblog.db')
+os.environ['ROBOTBLOG_DATABASE_URI'] = 'sqlite:///' + _BASE
+os.environ['ROBOTBLOG_BASE_PROFIL'] = 'developpement'
+os.environ['ROBOTBLOG_CACHE_DOSSIER'] = ''
+os.environ['ROBOTBLOG_GABARITS_CACHE'] = ''
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as robotblog  # noqa: E402
+
+_APP = robotblog.create_app({'TESTING': True})
+
+
+@pytest.fixture
+def app(tmp_path):
+    _APP.config['FLUX_DOSSIER'] = str(tmp_path / 'flux')
+    with _APP.app_context():
+        for moteur in robotblog.db.engines.values():
+            moteur.dispose()
+        for suffixe in ('', '-wal', '-shm'):
+            if os.path.exists(_BASE + suffixe):
+                os.remove(_BASE + suffixe)
+        robotblog.init_db()
+    robotblog.cache_pages.stockage.clear()
+    robotblog._images.clear()
+    robotblog._fts_actif.clear()
+    yield _APP
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['admin'] = True
+    return client
+
+
+@pytest.fixture
+def nouvel_article(app):
+    """Fabrique d'articles publiés, enregistrés comme depuis l'admin."""
+    depart = datetime(2024, 1, 1)
+
+    def creer(n, **champs):
+        champs.setdefault('titre', f'Article {n}')
+        champs.setdefault('slug', f'article-{n}')
+        champs.setdefault('contenu', f'<p>Texte de l\'article {n}.</p>')
+        champs.setdefault('categorie', 'journal')
+        champs.setdefault('publie', True)
+        champs.setdefault('date_publication', depart + timedelta(hours=n))
+        with app.app_context():
+            art = robotblog.Article(**champs)
+            art.preparer()
+            robotblog.db.session.add(art)
+            robotblog.db.session.commit()
+            return art.id
+    return creer
@@ -0,0 +1,26 @@
+import app as robotblog
+import archives
+
+
+def _ecrire(dossier, nom, titre, tags):
+    (dossier / nom).write_text(f'---\ntitre: {titre}\ntags: {tags}\n---\nCorps de *{titre}*.\n', encoding='utf-8')
+
+
+def test_import_reprend_les_tags_crees_entre_deux_lots(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(archives, 'LOT', 2)
+    for n in range(5):
+        _ecrire(tmp_path, f'{n}.md', f'Jour {n}', 'Servo, Capteurs' if n < 2 else 'Servo, Lidar')
+
+    def admin_cree_un_tag(*_):
+        # Pendant l'import, l'admin enregistre un article avec un nouveau tag
+        if not robotblog.Tag.query.filter_by(slug='lidar').first():
+            robotblog.Tag.obtenir(['LIDAR'])
+            robotblog.db.session.commit()
+
+    with app.app_context():
+        bilan = archives.importer(str(tmp_path), afficher=admin_cree_un_tag)
+        assert bilan['importes'] == 5 and not bilan['erreurs']
+        tags = dict(robotblog.db.session.execute(robotblog.db.select(robotblog.Tag.slug, robotblog.Tag.nom)).all())
+        assert tags == {'servo': 'Servo', 'capteurs': 'Capteurs', 'lidar': 'LIDAR'}
+        art = robotblog.Article.query.filter_by(slug='jour-4').one()
+        assert sorted(t.slug for t in art.etiquettes) == ['lidar', 'servo']
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import app as robotblog
+from audit_requetes import auditer
+
+
+def _semer(app, nouvel_article):
+    categories = ['journal', 'mecanique', 'electronique']
+    for n in range(1, 41):
+        nouvel_article(n, jour=n, categorie=categories[n % 3], tags='servo, capteur' if n % 2 else 'robot')
+    with app.app_context():
+        robotblog.db.session.add_all(
+            [robotblog.Timeline(titre=f'Étape {n}', statut='planifie', date_event=datetime(2024, n, 1))
+             for n in range(1, 7)]
+            + [robotblog.Ressource(titre=f'Ressource {n}', categorie='outils', ordre=n) for n in range(5)])
+        robotblog.db.session.commit()
+
+
+def test_requetes_des_pages_publiques_indexees(app, nouvel_article):
+    _semer(app, nouvel_article)
+    lignes = []
+    with app.app_context():
+        assert auditer(afficher=lignes.append), '\n'.join(lignes)
+    # Chaque route a bien émis des requêtes, passées à EXPLAIN QUERY PLAN
+    assert sum(ligne.lstrip().startswith('ok') for ligne in lignes) >= 10
+    assert any('USING' in ligne and 'INDEX ix_article_publie_jour' in ligne for ligne in lignes)
+
+
+def test_index_manquant_detecte(app, nouvel_article):
+    _semer(app, nouvel_article)
+    with app.app_context(), robotblog.db.engine.begin() as conn:
+        conn.exec_driver_sql('DROP INDEX ix_article_publie_jour')
+    lignes = []
+    with app.app_context():
+        assert not auditer(afficher=lignes.append)
+    assert any(ligne.lstrip().startswith('ÉCHEC') for ligne in lignes)
@@ -0,0 +1,26 @@
+"""Les scripts de bench/ importent l'application tard, dans leurs fonctions :
+une erreur d'import n'apparaît qu'au lancement. On les importe, puis on
+vérifie chaque nom importé de app, admin ou donnees, où qu'il soit."""
+import ast
+import importlib
+import os
+import sys
+
+import pytest
+
+BENCH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench')
+SCRIPTS = sorted(f[:-3] for f in os.listdir(BENCH) if f.endswith('.py'))
+
+
+@pytest.mark.parametrize('script', SCRIPTS)
+def test_script_de_bench_importable(script):
+    if BENCH not in sys.path:
+        sys.path.insert(0, BENCH)
+    importlib.import_module(script)
+    with open(os.path.join(BENCH, script + '.py'), encoding='utf-8') as f:
+        arbre = ast.parse(f.read())
+    for noeud in ast.walk(arbre):
+        if isinstance(noeud, ast.ImportFrom) and noeud.module in ('app', 'admin', 'donnees'):
+            module = importlib.import_module(noeud.module)
+            for alias in noeud.names:
+                assert hasattr(module, alias.name), f'{script} : {noeud.module}.{alias.name} introuvable'
@@ -0,0 +1,97 @@
+import app as robotblog
+from cache_pages import CacheFichiers, CachePages
+
+
+def test_invalidation_vue_par_les_autres_workers(tmp_path, app):
+    # Deux workers : deux CachePages sur le même dossier
+    premier = CachePages(CacheFichiers(str(tmp_path / 'cache')))
+    second = CachePages(CacheFichiers(str(tmp_path / 'cache')))
+    assert premier.obtenir('page', ('articles',), lambda: 'v1') == 'v1'
+    assert second.obtenir('page', ('articles',), lambda: 'v2') == 'v1'
+    premier.invalider('articles')
+    assert second.obtenir('page', ('articles',), lambda: 'v2') == 'v2'
+    assert premier.obtenir('page', ('articles',), lambda: 'v3') == 'v2'
+
+
+def test_etiquettes_independantes(app):
+    cache = CachePages()
+    cache.obtenir('journal', ('articles',), lambda: 'articles')
+    cache.obtenir('timeline', ('timeline',), lambda: 'timeline')
+    cache.invalider('timeline')
+    assert cache.obtenir('journal', ('articles',), lambda: 'rendu') == 'articles'
+    assert cache.obtenir('timeline', ('timeline',), lambda: 'rendu') == 'rendu'
+
+
+def test_page_modifiee_par_l_admin(client, admin, nouvel_article):
+    id = nouvel_article(1)
+    assert 'Article 1' in client.get('/journal').get_data(as_text=True)
+    reponse = admin.post(f'/admin/article/{id}/modifier', data={
+        'titre': 'Titre corrigé', 'contenu': '<p>Texte</p>', 'categorie': 'journal', 'publie': 'on'})
+    assert reponse.status_code == 302
+    page = client.get('/journal').get_data(as_text=True)
+    assert 'Titre corrigé' in page and 'Article 1' not in page
+
+
+def test_revalidation_apres_modification(client, admin, nouvel_article):
+    id = nouvel_article(1)
+    etag = client.get('/journal').headers['ETag']
+    assert client.get('/journal', headers={'If-None-Match': etag}).status_code == 304
+    admin.post(f'/admin/article/{id}/modifier', data={
+        'titre': 'Autre titre', 'contenu': '<p>Texte</p>', 'categorie': 'journal', 'publie': 'on'})
+    assert client.get('/journal', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_statistiques_des_pages_seules(app, client, nouvel_article):
+    nouvel_article(1)
+    avant = robotblog.cache_pages.stats()
+    client.get('/journal')
+    client.get('/journal')
+    apres = robotblog.cache_pages.stats()
+    # Le total d'articles, gardé dans le même cache, ne compte pas comme une page
+    assert (apres['hits'] - avant['hits'], apres['misses'] - avant['misses']) == (1, 1)
+
+
+def test_statistiques_de_tous_les_workers(tmp_path):
+    premier = CachePages(CacheFichiers(str(tmp_path / 'cache')))
+    second = CachePages(CacheFichiers(str(tmp_path / 'cache')), intervalle_compteurs=0)
+    premier.obtenir('page', (), lambda: 'v1')
+    second.obtenir('page', (), lambda: 'v2')
+    second.obtenir('autre', (), lambda: 'v3')
+    premier.obtenir('page', (), lambda: 'v4')
+    stats = premier.stats()
+    assert (stats['hits'], stats['misses'], stats['entrees'], stats['tous_workers']) == (2, 2, 2, True)
+    assert second.stats()['hits'] == 2
+
+
+def test_last_modified_avance_au_retrait(app, client, admin, nouvel_article):
+    # Sans ETag, le client ne revalide que par la date : un retrait doit l'avancer
+    ancienne = robotblog.datetime(2024, 1, 1)
+    nouvel_article(1, date_modification=ancienne)
+    retire = nouvel_article(2, date_modification=ancienne)
+    depublie = nouvel_article(3, date_modification=ancienne)
+    modif = client.get('/journal').headers['Last-Modified']
+    assert client.get('/journal', headers={'If-Modified-Since': modif}).status_code == 304
+    admin.post(f'/admin/article/{retire}/supprimer')
+    reponse = client.get('/journal', headers={'If-Modified-Since': modif})
+    assert reponse.status_code == 200 and 'Article 2' not in reponse.get_data(as_text=True)
+    with app.app_context():
+        robotblog.db.session.execute(robotblog.db.update(robotblog.Generation).values(date=ancienne))
+        robotblog.db.session.commit()
+    modif = client.get('/journal').headers['Last-Modified']
+    admin.post(f'/admin/article/{depublie}/modifier', data={
+        'titre': 'Article 3', 'contenu': '<p>Texte</p>', 'categorie': 'journal'})
+    reponse = client.get('/journal', headers={'If-Modified-Since': modif})
+    assert reponse.status_code == 200 and 'Article 3' not in reponse.get_data(as_text=True)
+
+
+def test_meme_etag_avec_ou_sans_gzip(client, nouvel_article):
+    for n in range(1, 6):
+        nouvel_article(n)
+    complete = client.get('/journal', headers={'Accept-Encoding': 'gzip'})
+    assert complete.headers['Content-Encoding'] == 'gzip'
+    etag = complete.headers['ETag']
+    assert etag.startswith('W/')
+    assert client.get('/journal').headers['ETag'] == etag
+    validee = client.get('/journal', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert validee.status_code == 304 and validee.headers['ETag'] == etag
+    assert 'Accept-Encoding' in validee.headers['Vary']
@@ -0,0 +1,24 @@
+from contenu import normaliser_tags, preparer, slugify
+
+
+def test_scripts_et_gestionnaires_retires():
+    html = preparer('<p onclick="alert(1)">Salut<script>alert(2)</script></p><style>p{}</style>')['contenu_html']
+    assert 'script' not in html and 'onclick' not in html and 'alert' not in html
+    assert 'Salut' in html
+
+
+def test_urls_dangereuses_retirees():
+    html = preparer('<a href="javascript:alert(1)">lien</a><img src="data:text/html,x">')['contenu_html']
+    assert 'javascript:' not in html and 'data:' not in html
+
+
+def test_balises_refermees_et_ancres():
+    derives = preparer('<h2>Moteurs</h2><p>un <strong>deux')
+    assert derives['contenu_html'].count('<strong>') == derives['contenu_html'].count('</strong>')
+    assert derives['table_matieres'] == [{'id': 'moteurs', 'titre': 'Moteurs'}]
+    assert derives['nb_mots'] == 3
+
+
+def test_tags_normalises():
+    assert normaliser_tags(' Arduino, arduino ,  Moteurs  pas-à-pas,, ') == ['Arduino', 'Moteurs pas-à-pas']
+    assert slugify('Élévation à 90°') == 'elevation-a-90'
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Interpréteur neuf : celui des tests a déjà chargé admin.py
+_SCRIPT = '''
+import sys
+from flask import Flask
+import app
+assert not any(isinstance(v, Flask) for v in vars(app).values()), "application construite à l'import"
+application = app.create_app()
+assert 'admin' not in sys.modules, 'admin importé par create_app()'
+assert list(app.demarrage.phases)[-3:] == ['configuration', 'extensions', 'routes']
+with application.test_request_context():
+    assert app.url_for('admin_modifier_article', id=3) == '/admin/article/3/modifier'
+with application.app_context():
+    app.init_db()
+client = app.preparer_worker(application, prechauffer=False).test_client()
+assert client.get('/').status_code == 200
+assert 'admin' not in sys.modules, 'admin importé par une page publique'
+assert client.get('/admin').headers['Location'].endswith('/admin/login')
+assert 'admin' in sys.modules
+assert app.create_app() is not application
+'''
+
+
+def test_administration_chargee_a_la_premiere_requete(tmp_path):
+    env = dict(os.environ, ROBOTBLOG_DATABASE_URI='sqlite:///' + str(tmp_path / 'robotblog.db'))
+    resultat = subprocess.run([sys.executable, '-c', _SCRIPT], cwd=RACINE, env=env,
+                              capture_output=True, text=True)
+    assert resultat.returncode == 0, resultat.stderr
@@ -0,0 +1,40 @@
+import re
+from xml.etree import ElementTree
+
+from export_statique import exporter
+
+
+def test_flux_et_sitemap_exportes(app, tmp_path, nouvel_article):
+    nouvel_article(1, categorie='mecanique')
+    with app.app_context():
+        bilan = exporter(str(tmp_path), url_base='https://robot.example/')
+    accueil = (tmp_path / 'index.html').read_text(encoding='utf-8')
+    # Chaque lien vers un flux ou le sitemap a son fichier dans l'export
+    liens = set(re.findall(r'href="(?:https://robot\.example)?(/[^"]*\.xml)"', accueil))
+    assert '/feed.xml' in liens
+    for lien in liens | {'/sitemap.xml'}:
+        assert (tmp_path / lien.lstrip('/')).is_file(), lien
+    assert bilan['flux'] >= 2
+    flux = ElementTree.parse(tmp_path / 'categorie' / 'mecanique' / 'feed.xml').getroot()
+    assert len(flux.findall('{http://www.w3.org/2005/Atom}entry')) == 1
+    sitemap = (tmp_path / 'sitemap.xml').read_text(encoding='utf-8')
+    assert '<loc>https://robot.example/article/article-1</loc>' in sitemap
+
+
+def test_liens_internes_exportes(app, tmp_path, nouvel_article):
+    for n in range(1, 21):
+        nouvel_article(n, jour=n, categorie='mecanique' if n % 2 else 'journal')
+    with app.app_context():
+        exporter(str(tmp_path), url_base='https://robot.example/')
+    # Pages dynamiques, non exportées par construction
+    dynamiques = ('/recherche', '/admin')
+    casses = set()
+    for page in tmp_path.rglob('index.html'):
+        html = page.read_text(encoding='utf-8')
+        for lien in re.findall(r'(?:href|src)="(?:https://robot\.example)?(/[^"#?]*)[^"]*"', html):
+            if lien.startswith('//') or lien.startswith(dynamiques):
+                continue
+            cible = tmp_path / lien.strip('/')
+            if not (cible.is_file() or (cible / 'index.html').is_file()):
+                casses.add((str(page.relative_to(tmp_path)), lien))
+    assert not casses
@@ -0,0 +1,16 @@
+from xml.etree import ElementTree
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+def test_flux_atom_valide(app, client, nouvel_article):
+    nouvel_article(1, tags='Servo, Capteurs')
+    nouvel_article(2, categorie='mecanique')
+    for url, nombre in (('/feed.xml', 2), ('/categorie/mecanique/feed.xml', 1)):
+        reponse = client.get(url)
+        assert reponse.status_code == 200 and reponse.mimetype == 'application/atom+xml'
+        racine = ElementTree.fromstring(reponse.data)
+        # RFC 4287 : un auteur au niveau du flux, faute d'auteur dans chaque entrée
+        assert racine.find(f'{ATOM}author/{ATOM}name').text == app.config['FLUX_AUTEUR']
+        assert len(racine.findall(f'{ATOM}entry')) == nombre
+        assert all(racine.find(f'{ATOM}{balise}') is not None for balise in ('id', 'title', 'updated'))
@@ -0,0 +1,49 @@
+from sqlalchemy import event
+
+import app as robotblog
+
+
+def _requetes_media(app, client, url):
+    with app.app_context():
+        moteur = robotblog.db.engine
+    requetes = []
+
+    def compter(conn, curseur, requete, *args):
+        if 'FROM media' in requete:
+            requetes.append(requete)
+
+    event.listen(moteur, 'before_cursor_execute', compter)
+    try:
+        assert client.get(url).status_code == 200
+    finally:
+        event.remove(moteur, 'before_cursor_execute', compter)
+    return len(requetes)
+
+
+def test_couvertures_chargees_en_une_requete(app, admin, nouvel_article):
+    for n in range(5):
+        nouvel_article(n, image_couverture=f'couverture-{n}.jpg')
+    with app.app_context():
+        robotblog.db.session.add(robotblog.Media(nom_fichier='couverture-0.jpg', type_media='image'))
+        robotblog.db.session.commit()
+    # L'admin ne passe pas par le cache des pages : les réponses négatives sont gardées
+    assert _requetes_media(app, admin, '/journal') == 1
+    assert _requetes_media(app, admin, '/journal') == 0
+
+
+def test_variantes_pretes_visibles_par_tous_les_workers(app, admin, nouvel_article):
+    nouvel_article(1, image_couverture='servo.jpg')
+    with app.app_context():
+        media = robotblog.Media(nom_fichier='servo.jpg', type_media='image')
+        robotblog.db.session.add(media)
+        robotblog.db.session.commit()
+    assert 'srcset' not in admin.get('/journal').get_data(as_text=True)
+    with app.app_context():
+        # Comme traiter_variantes() dans un autre worker : seule la génération le signale
+        media = robotblog.Media.query.one()
+        media.largeur, media.hauteur, media.placeholder = 800, 600, 'data:image/gif;base64,R0lGOD'
+        media.variantes = [{'fichier': 'servo-400.webp', 'largeur': 400, 'format': 'webp'},
+                          {'fichier': 'servo-400.jpg', 'largeur': 400, 'format': 'jpg'}]
+        robotblog.avancer_generation('medias')
+        robotblog.db.session.commit()
+    assert 'srcset' in admin.get('/journal').get_data(as_text=True)
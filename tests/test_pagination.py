@@ -0,0 +1,57 @@
+import re
+
+import pytest
+
+import app as robotblog
+
+CLES = (robotblog.Article.jour, robotblog.Article.date_publication, robotblog.Article.id)
+
+
+def _pages(app, sens, premier=None):
+    """Suit les curseurs dans un sens ('apres' ou 'avant') ; retourne les ids page par page."""
+    pages, curseur = [], premier
+    while True:
+        with app.test_request_context('/journal', query_string={sens: curseur} if curseur else {}):
+            requete = robotblog.db.select(robotblog.Article).filter_by(publie=True)
+            page = robotblog.paginer_par_curseur(requete, CLES, par_page=4)
+            pages.append([a.id for a in page.items])
+            curseur = page.curseur_suivant if sens == 'apres' else page.curseur_precedent
+            dernier = page
+        if curseur is None:
+            return pages, dernier
+
+
+@pytest.fixture
+def articles(nouvel_article):
+    # Jours en double et articles sans jour, qui passent en dernier
+    jours = [3, 1, None, 2, 2, None, 5, 4, None, 1, 3]
+    return [nouvel_article(n, jour=jour) for n, jour in enumerate(jours)]
+
+
+def test_curseur_sans_saut_ni_doublon(app, articles):
+    pages, _ = _pages(app, 'apres')
+    ids = [id for page in pages for id in page]
+    assert sorted(ids) == sorted(articles)
+    assert len(ids) == len(set(ids))
+    assert all(len(page) == 4 for page in pages[:-1])
+
+
+def test_curseur_meme_ordre_que_offset(app, client, articles):
+    pages, _ = _pages(app, 'apres')
+    slugs = []
+    for n in range(1, 3):
+        page = client.get(f'/journal?page={n}').get_data(as_text=True)
+        slugs += re.findall(r'class="card-title"><a href="/article/([^"]+)"', page)
+    with app.app_context():
+        par_id = {id: robotblog.db.session.get(robotblog.Article, id).slug for id in articles}
+    assert slugs == [par_id[id] for page in pages for id in page]
+
+
+def test_retour_en_arriere(app, articles):
+    pages, derniere = _pages(app, 'apres')
+    retour, _ = _pages(app, 'avant', derniere.curseur_precedent)
+    assert retour == pages[-2::-1]
+
+
+def test_curseur_invalide_ignore(client, articles):
+    assert client.get('/journal?apres=falsifie').status_code == 200
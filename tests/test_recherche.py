@@ -0,0 +1,32 @@
+import app as robotblog
+
+
+def _sans_index(app):
+    # Base d'avant l'index : ni table FTS, ni migration correspondante
+    with app.app_context(), robotblog.db.engine.begin() as conn:
+        conn.exec_driver_sql('DROP TABLE article_fts')
+        conn.execute(robotblog.schema_version.update().values(
+            version=robotblog.MIGRATIONS.index(robotblog._index_recherche)))
+    robotblog._fts_actif.clear()
+
+
+def test_recherche_plein_texte(client, nouvel_article):
+    nouvel_article(1, titre='Calibration des servos', contenu='<p>Réglage des moteurs</p>')
+    nouvel_article(2, titre='Capteurs', contenu='<p>Lidar</p>')
+    page = client.get('/recherche?q=reglage').get_data(as_text=True)
+    assert '/article/article-1' in page and '/article/article-2' not in page
+    assert '<mark>' in page
+
+
+def test_migration_cree_et_remplit_l_index(app, client, nouvel_article):
+    nouvel_article(1, titre='Calibration des servos')
+    _sans_index(app)
+    with app.app_context():
+        with robotblog.db.engine.connect() as conn:
+            assert not robotblog.index_recherche_actif(conn)
+        assert robotblog.migrer() == len(robotblog.MIGRATIONS) - robotblog.MIGRATIONS.index(robotblog._index_recherche)
+    # Le worker démarré avant la migration voit l'index et le tient à jour
+    nouvel_article(2, titre='Servos et moteurs')
+    page = client.get('/recherche?q=servos').get_data(as_text=True)
+    assert '/article/article-1' in page and '/article/article-2' in page
+    assert '<mark>' in page
@@ -0,0 +1,53 @@
+import app as robotblog
+
+SUJETS = ['servo moteur couple', 'capteur lidar distance', 'batterie lithium autonomie']
+
+
+def _semer(app, nouvel_article):
+    for n in range(1, 13):
+        nouvel_article(n, titre=f'{SUJETS[n % 3]} essai {n}', tags=SUJETS[n % 3].split()[0],
+                       contenu=f'<p>Mesures du {SUJETS[n % 3]}, réglage numéro {n}.</p>')
+    with app.app_context(), robotblog.db.engine.begin() as conn:
+        robotblog.recalculer_similaires(conn)
+
+
+def _complet(app):
+    with app.app_context(), robotblog.db.engine.connect() as conn:
+        index = robotblog._index_similarite(conn)
+        frequences = dict(conn.execute(robotblog.db.select(
+            robotblog.TermeSimilarite.terme, robotblog.TermeSimilarite.documents)).all())
+        listes = {}
+        for id, voisin in conn.execute(robotblog.db.select(
+                robotblog.ArticleSimilaire.article_id, robotblog.ArticleSimilaire.voisin_id)
+                .order_by(robotblog.ArticleSimilaire.article_id, robotblog.ArticleSimilaire.rang)):
+            listes.setdefault(id, []).append(voisin)
+    return index, frequences, listes
+
+
+def test_enregistrement_incremental(app, admin, nouvel_article):
+    _semer(app, nouvel_article)
+    lues = []
+
+    @robotblog.db.event.listens_for(robotblog.db.Engine, 'before_cursor_execute')
+    def _capturer(conn, cursor, statement, *_):
+        if 'article.termes' in statement:
+            lues.append(statement)
+
+    try:
+        admin.post('/admin/article/4/modifier', data={
+            'titre': 'Capteur lidar et servo', 'contenu': '<p>Distance mesurée au lidar</p>',
+            'tags': 'capteur', 'categorie': 'journal', 'publie': 'on'})
+        admin.post('/admin/article/5/supprimer')
+        admin.post('/admin/article/6/modifier', data={'titre': 'Brouillon', 'contenu': '<p>x</p>'})
+    finally:
+        robotblog.db.event.remove(robotblog.db.Engine, 'before_cursor_execute', _capturer)
+    # Chaque enregistrement ne lit que les termes de l'article modifié
+    assert lues and all('WHERE article.id = ?' in sql for sql in lues)
+
+    index, frequences, listes = _complet(app)
+    assert frequences == dict(index.frequences)
+    assert 5 not in listes and 6 not in listes
+    assert all(5 not in voisins and 6 not in voisins for voisins in listes.values())
+    # La liste de l'article modifié est celle d'un calcul complet
+    attendus = [id for _, id in index.voisins(4, app.config['SIMILAIRES_NOMBRE'])]
+    assert attendus and listes[4] == attendus
@@ -0,0 +1,51 @@
+from flask import Flask
+import pytest
+
+from statiques import Statiques
+
+
+def _statiques(dossier):
+    (dossier / 'css').mkdir()
+    (dossier / 'css' / '_polices.css').write_text(
+        "@font-face { font-family: 'Inter'; src: local('Inter'), url('../fonts/inter.woff2') format('woff2'); }")
+    (dossier / 'css' / 'site.css').write_text("@import url('_polices.css');\nbody { font-family: 'Inter'; }")
+    app = Flask(__name__, static_folder=str(dossier))
+    app.config.update(STATIQUES_EMPREINTES=True, COMPRESSION_ACTIVE=False)
+    return Statiques(app)
+
+
+def test_polices_absentes_signalees(tmp_path):
+    statiques = _statiques(tmp_path)
+    assert statiques.manquants() == ['css/site.css', 'fonts/inter.woff2']
+    statiques.construire(afficher=lambda *_: None)
+    assert statiques.manquants() == ['fonts/inter.woff2']
+    assert 'url(' not in (tmp_path / statiques.manifeste['css/site.css']).read_text()
+
+
+def test_construction_complete(tmp_path):
+    statiques = _statiques(tmp_path)
+    (tmp_path / 'fonts').mkdir()
+    (tmp_path / 'fonts' / 'inter.woff2').write_bytes(b'wOF2')
+    statiques.construire(afficher=lambda *_: None)
+    assert statiques.manquants() == []
+    css = (tmp_path / statiques.manifeste['css/site.css']).read_text()
+    assert "url('fonts/inter." in css and '@import' not in css
+
+
+def test_polices_absentes_seulement_signalees(tmp_path):
+    statiques = _statiques(tmp_path)
+    assert statiques.manquants(polices=False) == ['css/site.css']
+    statiques.construire(afficher=lambda *_: None)
+    assert statiques.manquants(polices=False) == []
+
+
+def test_worker_sans_polices_demarre(app, monkeypatch, caplog):
+    import app as robotblog
+    monkeypatch.setitem(app.config, 'STATIQUES_EXIGEES', True)
+    monkeypatch.setattr(robotblog.statiques, 'manifeste', {})
+    feuilles = {nom: nom for nom in robotblog.statiques.manquants(polices=False)}
+    with pytest.raises(RuntimeError):
+        robotblog.preparer_worker(app, prechauffer=False)
+    monkeypatch.setattr(robotblog.statiques, 'manifeste', feuilles)
+    assert robotblog.preparer_worker(app, prechauffer=False) is app
+    assert 'Polices absentes' in caplog.text
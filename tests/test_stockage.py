@@ -0,0 +1,66 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+
+import stockage
+
+
+class FluxLent(io.BytesIO):
+    """Corps de requête qui n'arrive qu'une fois `libre` posé."""
+    def __init__(self, donnees, libre):
+        super().__init__(donnees)
+        self.libre = libre
+
+    def read(self, taille=-1):
+        self.libre.wait(5)
+        return super().read(taille)
+
+
+def test_deux_envois_au_meme_offset(tmp_path):
+    televersements = stockage.Televersements(str(tmp_path), 1024)
+    id = televersements.creer('video.mp4', 100)
+    libre, resultats = threading.Event(), []
+
+    def envoyer():
+        try:
+            resultats.append(televersements.ajouter(id, 0, FluxLent(b'x' * 60, libre))['recu'])
+        except stockage.ErreurTeleversement as e:
+            resultats.append(('refus', e.recu))
+
+    fils = [threading.Thread(target=envoyer) for _ in range(2)]
+    for f in fils:
+        f.start()
+    time.sleep(0.2)  # les deux envois ont passé la première vérification de l'offset
+    libre.set()
+    for f in fils:
+        f.join()
+    assert sorted(resultats, key=str) == [('refus', 60), 60]
+    assert televersements.etat(id)['recu'] == 60
+    televersements.ajouter(id, 60, io.BytesIO(b'y' * 40))
+    nom, _, taille, _ = televersements.terminer(id, 'mp4')
+    assert taille == 100 and os.path.getsize(tmp_path / nom) == 100
+
+
+def test_morceau_apres_terminaison(tmp_path):
+    televersements = stockage.Televersements(str(tmp_path), 1024)
+    id = televersements.creer('video.mp4', 10)
+    televersements.ajouter(id, 0, io.BytesIO(b'z' * 10))
+    televersements.terminer(id, 'mp4')
+    with pytest.raises(stockage.ErreurTeleversement):
+        televersements.ajouter(id, 10, io.BytesIO(b'z'))
+    assert not os.listdir(tmp_path / stockage.DOSSIER_PARTIELS)
+
+
+def test_partiels_abandonnes_supprimes(tmp_path):
+    televersements = stockage.Televersements(str(tmp_path), 1024, duree_max=3600)
+    ancien = televersements.creer('ancien.mp4', 100)
+    televersements.ajouter(ancien, 0, io.BytesIO(b'a' * 10))
+    for chemin in televersements._chemins(ancien):
+        os.utime(chemin, (time.time() - 7200,) * 2)
+    recent = televersements.creer('recent.mp4', 100)  # nettoie au passage
+    with pytest.raises(stockage.ErreurTeleversement):
+        televersements.etat(ancien)
+    assert televersements.etat(recent)['recu'] == 0
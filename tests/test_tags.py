@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
+import sqlite3
+import threading
+
+from sqlalchemy import event
+
+import app as robotblog
+
+
+def _enregistrer(client, id, tags):
+    return client.post(f'/admin/article/{id}/modifier', data={
+        'titre': f'Article {id}', 'contenu': '<p>Texte</p>', 'categorie': 'journal',
+        'tags': tags, 'publie': 'on'}).status_code
+
+
+def test_tag_cree_entre_lecture_et_insertion(app, admin, nouvel_article):
+    # Une autre requête crée le tag juste avant notre INSERT : il est repris, pas recréé
+    id = nouvel_article(1)
+    with app.app_context():
+        moteur = robotblog.db.engine
+    fait = []
+
+    def concurrent(conn, curseur, requete, *args):
+        if requete.startswith('INSERT INTO tag') and not fait:
+            fait.append(True)
+            with sqlite3.connect(moteur.url.database) as autre:
+                autre.execute("INSERT INTO tag (nom, slug) VALUES ('Servo', 'servo')")
+
+    event.listen(moteur, 'before_cursor_execute', concurrent)
+    try:
+        assert _enregistrer(admin, id, 'Servo, Moteurs') == 302
+    finally:
+        event.remove(moteur, 'before_cursor_execute', concurrent)
+    assert fait
+    with app.app_context():
+        art = robotblog.db.session.get(robotblog.Article, id)
+        assert sorted(t.slug for t in art.etiquettes) == ['moteurs', 'servo']
+        assert robotblog.db.session.scalar(robotblog.db.select(robotblog.db.func.count(robotblog.Tag.id))) == 2
+
+
+def test_enregistrements_concurrents_sans_erreur(app, nouvel_article):
+    ids = [nouvel_article(n) for n in range(8)]
+    depart = threading.Barrier(len(ids))
+
+    def enregistrer(id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['admin'] = True
+        depart.wait()
+        return _enregistrer(client, id, 'Arduino, Capteurs, Servo')
+
+    with ThreadPoolExecutor(len(ids)) as executeur:
+        statuts = list(executeur.map(enregistrer, ids))
+    assert statuts == [302] * len(ids)
+    with app.app_context():
+        assert robotblog.db.session.scalar(robotblog.db.select(robotblog.db.func.count(robotblog.Tag.id))) == 3
+
+
+def test_tags_existants_reutilises(app):
+    with app.app_context():
+        premiers = robotblog.Tag.obtenir(['Arduino', 'arduino', 'Servo'])
+        robotblog.db.session.commit()
+        seconds = robotblog.Tag.obtenir(['SERVO', 'Arduino'])
+        assert [t.id for t in seconds] == [premiers[1].id, premiers[0].id]